@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+""" archive libraries behind one interface: infolist(), testall(), extractall(), members streamed
+
+    unrar       RAR through the libunrar functions of python-unrar 0.4 (unrar.unrarlib), the library writes
+                the files itself
+    zip, tar    stdlib zipfile / tarfile
+    libarchive  RAR, zip, 7z and tar through libarchive-c, when installed
+    7z          py7zr, when installed, whole archive at once
+
+open_archive() picks the first available backend of FORMAT_BACKENDS for the format found in the
+first bytes of the file. Streaming backends read buffer_size bytes at a time and call
+progress(member, nbytes) after each read, the others once per member.
+"""
+from pathlib import Path
+from typing import NamedTuple, Optional
+import ctypes
+import logging
+import os
+import tarfile
+import time
+import zipfile
+
+from archive_meta import RHDF_DIRECTORY, RHDF_SPLITBEFORE
+
+try:
+    from unrar import unrarlib
+    from unrar import constants as unrar_constants
+except (ImportError, LookupError):
+    # LookupError: the bindings are installed but libunrar is not
+    unrarlib = None
+try:
+    import libarchive
+except ImportError:
+    libarchive = None
+try:
+    import py7zr
+except ImportError:
+    py7zr = None
+
+logger = logging.getLogger(__name__)
+
+BUFFER_SIZE = 1024 * 1024
+MAGIC = ((b'Rar!\x1a\x07', 'rar'), (b'PK\x03\x04', 'zip'), (b'PK\x05\x06', 'zip'), (b"7z\xbc\xaf'\x1c", '7z'))
+# backends tried in order for each format
+FORMAT_BACKENDS = {
+    'rar': ('unrar', 'libarchive'),
+    'zip': ('zip', 'libarchive'),
+    'tar': ('tar', 'libarchive'),
+    '7z': ('7z', 'libarchive'),
+}
+BACKENDS = {}
+
+
+class ArchiveError(Exception):
+    """ any backend failure: unreadable, corrupt, encrypted or unsafe archive """
+
+
+class Member(NamedTuple):
+    """ directory names end with '/', like in zip files """
+    filename: str
+    compress_size: int
+    file_size: int
+    mtime: Optional[float] = None
+
+    @property
+    def is_dir(self):
+        return self.filename.endswith('/')
+
+
+def register(cls):
+    BACKENDS[cls.backend] = cls
+    return cls
+
+
+def detect_format(path):
+    """ 'rar', 'zip', '7z' or 'tar' from the content of the file, None for anything else """
+    with open(path, 'rb') as f:
+        head = f.read(8)
+    for magic, fmt in MAGIC:
+        if head.startswith(magic):
+            return fmt
+    if tarfile.is_tarfile(path):
+        return 'tar'
+    return None
+
+
+def safe_target(dest, name):
+    """ path of a member inside dest, ArchiveError for absolute names and names leaving dest """
+    parts = Path(name.replace('\\', '/')).parts
+    if not parts or Path(name).is_absolute() or '..' in parts:
+        raise ArchiveError(f"Unsafe member name {name!r}")
+    return dest.joinpath(*parts)
+
+
+def available_backends(fmt=None):
+    return [name for name, cls in BACKENDS.items() if cls.available() and (fmt is None or fmt in cls.formats)]
+
+
+def open_archive(path, backends=None, buffer_size=BUFFER_SIZE, progress=None):
+    """ the archive opened by the first available backend for its format
+    backends: {format: backend names} overriding FORMAT_BACKENDS """
+    fmt = detect_format(path)
+    if fmt is None:
+        raise ArchiveError(f"Unknown archive format {path}")
+    names = (backends or {}).get(fmt) or FORMAT_BACKENDS[fmt]
+    for name in names:
+        cls = BACKENDS.get(name)
+        if cls is not None and fmt in cls.formats and cls.available():
+            return cls(path, buffer_size, progress)
+    raise ArchiveError(f"No backend available for {fmt} among {list(names)}, {path}")
+
+
+class Archive:
+    """ an archive opened by one backend, subclasses give infolist() and stream() """
+    backend = None
+    formats = ()
+    # library exceptions reported as ArchiveError
+    errors = ()
+
+    def __init__(self, path, buffer_size=BUFFER_SIZE, progress=None):
+        self.filename = str(path)
+        self.buffer_size = buffer_size
+        self.progress = progress
+
+    @classmethod
+    def available(cls):
+        return True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        pass
+
+    def infolist(self):
+        raise NotImplementedError
+
+    def stream(self):
+        """ (Member, iterable of its data chunks) in archive order, each consumed before the next """
+        raise NotImplementedError
+
+    def _read(self, f):
+        while True:
+            chunk = f.read(self.buffer_size)
+            if not chunk:
+                return
+            yield chunk
+
+    def _chunks(self, member, chunks):
+        for chunk in chunks:
+            if self.progress is not None:
+                self.progress(member, len(chunk))
+            yield chunk
+
+    def testall(self):
+        """ None when every member reads back fine, else the name of the first bad one """
+        member = None
+        try:
+            for member, chunks in self.stream():
+                for _ in self._chunks(member, chunks):
+                    pass
+        except self.errors as e:
+            if member is None:
+                raise ArchiveError(f"{self.filename}: {e}") from e
+            logger.error(f"{self.filename}: {member.filename} {e}")
+            return member.filename
+        return None
+
+    def extractall(self, path):
+        """ every member under path, ArchiveError on the first failure leaving what was written so far """
+        dest = Path(path)
+        try:
+            for member, chunks in self.stream():
+                target = safe_target(dest, member.filename)
+                if member.is_dir:
+                    target.mkdir(parents=True, exist_ok=True)
+                    continue
+                target.parent.mkdir(parents=True, exist_ok=True)
+                with open(target, 'wb') as out:
+                    for chunk in self._chunks(member, chunks):
+                        out.write(chunk)
+                if member.mtime is not None:
+                    os.utime(target, (member.mtime, member.mtime))
+        except self.errors as e:
+            raise ArchiveError(f"{self.filename}: {e}") from e
+
+
+@register
+class UnrarArchive(Archive):
+    """ libunrar through the ctypes functions of unrar.unrarlib (python-unrar 0.4), not RarFile and its private
+    helpers; the library extracts each member itself, progress comes once per member and buffer_size does
+    not apply """
+    backend = 'unrar'
+    formats = ('rar',)
+    errors = (unrarlib.UnrarException,) if unrarlib is not None else ()
+
+    def __init__(self, path, buffer_size=BUFFER_SIZE, progress=None):
+        super(UnrarArchive, self).__init__(path, buffer_size, progress)
+        self.current = None
+        # fails early on a file libunrar cannot open
+        unrarlib.RARCloseArchive(self._open(unrar_constants.RAR_OM_LIST))
+
+    @classmethod
+    def available(cls):
+        return unrarlib is not None
+
+    def _open(self, mode):
+        archive = unrarlib.RAROpenArchiveDataEx(self.filename, mode=mode)
+        try:
+            return unrarlib.RAROpenArchiveEx(ctypes.byref(archive))
+        except self.errors as e:
+            raise ArchiveError(f"{self.filename}: {e}") from e
+
+    def _headers(self, mode, op, path=None):
+        """ one pass over the volumes applying op to each file header, (flags, Member) of each header
+        the name of the member being processed kept in self.current """
+        self.current = None
+        handle = self._open(mode)
+        header = unrarlib.RARHeaderDataEx()
+        try:
+            while True:
+                try:
+                    unrarlib.RARReadHeaderEx(handle, ctypes.byref(header))
+                except unrarlib.ArchiveEnd:
+                    return
+                name = header.FileNameW
+                is_dir = header.Flags & RHDF_DIRECTORY
+                member = Member(name.rstrip('/') + '/' if is_dir else name,
+                                header.PackSize + (header.PackSizeHigh << 32),
+                                header.UnpSize + (header.UnpSizeHigh << 32))
+                self.current = name
+                unrarlib.RARProcessFileW(handle, op, path, None)
+                yield header.Flags, member
+        finally:
+            unrarlib.RARCloseArchive(handle)
+
+    def infolist(self):
+        """ one Member per file: RAR_OM_LIST_INCSPLIT lists a file split across volumes once per volume, its
+        continuations (RHDF_SPLITBEFORE) only add their packed size """
+        members = []
+        try:
+            for flags, member in self._headers(unrar_constants.RAR_OM_LIST_INCSPLIT, unrar_constants.RAR_SKIP):
+                if flags & RHDF_SPLITBEFORE and members and members[-1].filename == member.filename:
+                    members[-1] = members[-1]._replace(
+                        compress_size=members[-1].compress_size + member.compress_size)
+                else:
+                    members.append(member)
+        except self.errors as e:
+            raise ArchiveError(f"{self.filename}: {e}") from e
+        return members
+
+    def _process(self, op, path=None):
+        for _, member in self._headers(unrar_constants.RAR_OM_EXTRACT, op, path):
+            if self.progress is not None:
+                self.progress(member, member.file_size)
+
+    def testall(self):
+        try:
+            self._process(unrar_constants.RAR_TEST)
+        except self.errors as e:
+            if self.current is None:
+                raise ArchiveError(f"{self.filename}: {e}") from e
+            logger.error(f"{self.filename}: {self.current} {e}")
+            return self.current
+        return None
+
+    def extractall(self, path):
+        try:
+            self._process(unrar_constants.RAR_EXTRACT, str(Path(path).absolute()))
+        except self.errors as e:
+            raise ArchiveError(f"{self.filename}: {e}") from e
+
+
+@register
+class ZipArchive(Archive):
+    """ zipfile checks each member CRC once it is read to the end """
+    backend = 'zip'
+    formats = ('zip',)
+    errors = (zipfile.BadZipFile, zipfile.LargeZipFile, RuntimeError, EOFError, NotImplementedError)
+
+    def __init__(self, path, buffer_size=BUFFER_SIZE, progress=None):
+        super(ZipArchive, self).__init__(path, buffer_size, progress)
+        try:
+            self.zip = zipfile.ZipFile(self.filename)
+        except self.errors as e:
+            raise ArchiveError(f"{self.filename}: {e}") from e
+
+    def close(self):
+        self.zip.close()
+
+    @staticmethod
+    def _member(info):
+        mtime = None
+        try:
+            mtime = time.mktime(info.date_time + (0, 0, -1))
+        except (OverflowError, ValueError):
+            pass
+        return Member(info.filename, info.compress_size, info.file_size, mtime)
+
+    def infolist(self):
+        return [self._member(info) for info in self.zip.infolist()]
+
+    def stream(self):
+        for info in self.zip.infolist():
+            if info.is_dir():
+                yield self._member(info), ()
+                continue
+            with self.zip.open(info) as f:
+                yield self._member(info), self._read(f)
+
+
+@register
+class TarArchive(Archive):
+    """ read as a stream, compressed tarballs are decompressed once; links and devices are skipped """
+    backend = 'tar'
+    formats = ('tar',)
+    errors = (tarfile.TarError, EOFError, OSError)
+
+    @staticmethod
+    def _member(info):
+        return Member(info.name + '/' if info.isdir() else info.name, info.size, info.size, info.mtime)
+
+    def infolist(self):
+        try:
+            with tarfile.open(self.filename, 'r:*') as tar:
+                return [self._member(info) for info in tar.getmembers() if info.isdir() or info.isfile()]
+        except self.errors as e:
+            raise ArchiveError(f"{self.filename}: {e}") from e
+
+    def stream(self):
+        with tarfile.open(self.filename, 'r|*', bufsize=self.buffer_size) as tar:
+            for info in tar:
+                if info.isdir():
+                    yield self._member(info), ()
+                elif info.isfile():
+                    yield self._member(info), self._read(tar.extractfile(info))
+                else:
+                    logger.warning(f"{self.filename}: skipping {info.name}, not a regular file")
+
+
+@register
+class LibarchiveArchive(Archive):
+    """ libarchive-c, compressed sizes are not known per member """
+    backend = 'libarchive'
+    formats = ('rar', 'zip', '7z', 'tar')
+    errors = (libarchive.ArchiveError,) if libarchive is not None else ()
+
+    @classmethod
+    def available(cls):
+        return libarchive is not None
+
+    @staticmethod
+    def _member(entry):
+        name = entry.pathname.rstrip('/') + '/' if entry.isdir else entry.pathname
+        return Member(name, 0, entry.size or 0, entry.mtime)
+
+    def infolist(self):
+        try:
+            with libarchive.file_reader(self.filename) as archive:
+                return [self._member(entry) for entry in archive]
+        except self.errors as e:
+            raise ArchiveError(f"{self.filename}: {e}") from e
+
+    def stream(self):
+        with libarchive.file_reader(self.filename, block_size=self.buffer_size) as archive:
+            for entry in archive:
+                if entry.isdir:
+                    yield self._member(entry), ()
+                elif entry.isfile:
+                    yield self._member(entry), entry.get_blocks(self.buffer_size)
+                else:
+                    logger.warning(f"{self.filename}: skipping {entry.pathname}, not a regular file")
+
+
+@register
+class SevenZipArchive(Archive):
+    """ py7zr decompresses whole folders at once, progress comes once per member after the fact """
+    backend = '7z'
+    formats = ('7z',)
+    errors = (py7zr.exceptions.ArchiveError, EOFError, OSError) if py7zr is not None else ()
+
+    @classmethod
+    def available(cls):
+        return py7zr is not None
+
+    def _open(self):
+        try:
+            return py7zr.SevenZipFile(self.filename, 'r')
+        except self.errors as e:
+            raise ArchiveError(f"{self.filename}: {e}") from e
+
+    def infolist(self):
+        with self._open() as sz:
+            return [Member(info.filename + '/' if info.is_directory else info.filename, info.compressed or 0,
+                           info.uncompressed or 0) for info in sz.list()]
+
+    def _report(self):
+        if self.progress is not None:
+            for member in self.infolist():
+                self.progress(member, member.file_size)
+
+    def testall(self):
+        try:
+            with self._open() as sz:
+                bad = sz.testzip()
+        except self.errors as e:
+            raise ArchiveError(f"{self.filename}: {e}") from e
+        if bad is None:
+            self._report()
+        return bad
+
+    def extractall(self, path):
+        members = self.infolist()
+        for member in members:
+            safe_target(Path(path), member.filename)
+        try:
+            with self._open() as sz:
+                sz.extractall(path=str(path))
+        except self.errors as e:
+            raise ArchiveError(f"{self.filename}: {e}") from e
+        self._report()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+""" archive headers read once: entry count, compressed / uncompressed totals, root folders
+
+Cached in sqlite keyed on the absolute path of the first volume, the total size and the latest mtime of the
+set's volumes, a set changed since is read again.
+"""
+from dataclasses import asdict, dataclass
+from pathlib import Path
+import json
+import os
+import sqlite3
+import time
+
+# RARHeaderDataEx.Flags of libunrar: the file continues from the previous volume, the entry is a directory
+RHDF_SPLITBEFORE = 0x01
+RHDF_DIRECTORY = 0x20
+# bumped when cached values are computed differently, older caches are emptied
+CACHE_VERSION = 1
+
+
+@dataclass(slots=True)
+class ArchiveMeta:
+    entries: int = 0
+    compressed: int = 0
+    uncompressed: int = 0
+    # top level names, folders and loose files
+    roots: tuple = ()
+    # files stored at the top level, outside any folder
+    loose: int = 0
+
+    @property
+    def single_root(self):
+        """ everything inside one top level folder """
+        return len(self.roots) == 1 and not self.loose
+
+    @classmethod
+    def from_infolist(cls, infos):
+        """ from archive_backends Members or RarInfos: filename, compress_size, file_size, and for RarInfo
+        the libunrar flag_bits; a file split across volumes is listed once per volume, its continuations
+        only add their packed size """
+        meta = cls()
+        roots = set()
+        for info in infos:
+            flags = getattr(info, 'flag_bits', 0)
+            meta.compressed += info.compress_size
+            if flags & RHDF_SPLITBEFORE:
+                continue
+            meta.entries += 1
+            meta.uncompressed += info.file_size
+            is_dir = info.filename.endswith(('/', '\\')) or bool(flags & RHDF_DIRECTORY)
+            head, sep, _ = info.filename.replace('\\', '/').strip('/').partition('/')
+            roots.add(head)
+            if not sep and not is_dir:
+                meta.loose += 1
+        meta.roots = tuple(sorted(roots))
+        return meta
+
+    def to_dict(self):
+        return dict(asdict(self), roots=list(self.roots), single_root=self.single_root)
+
+
+class MetaCache:
+    """ ArchiveMeta by set, valid while the (size, mtime_ns) stamp of its volumes is unchanged """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(self.path), timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        if self.db.execute("PRAGMA user_version").fetchone()[0] < CACHE_VERSION:
+            # version 1: split files counted once, libunrar directory flag
+            self.db.execute("DROP TABLE IF EXISTS meta")
+            self.db.execute(f"PRAGMA user_version = {CACHE_VERSION}")
+        self.db.execute("""CREATE TABLE IF NOT EXISTS meta (
+            path TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            entries INTEGER NOT NULL,
+            compressed INTEGER NOT NULL,
+            uncompressed INTEGER NOT NULL,
+            roots TEXT NOT NULL,
+            loose INTEGER NOT NULL,
+            read_at REAL NOT NULL)""")
+        self.db.commit()
+        self.hits = self.misses = 0
+
+    def close(self):
+        self.db.close()
+
+    def get(self, path, size, mtime_ns):
+        row = self.db.execute("""SELECT entries, compressed, uncompressed, roots, loose FROM meta
+            WHERE path = ? AND size = ? AND mtime_ns = ?""", (os.path.abspath(path), size, mtime_ns)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        entries, compressed, uncompressed, roots, loose = row
+        return ArchiveMeta(entries, compressed, uncompressed, tuple(json.loads(roots)), loose)
+
+    def put(self, path, size, mtime_ns, meta):
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO meta VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                            (os.path.abspath(path), size, mtime_ns, meta.entries, meta.compressed, meta.uncompressed,
+                             json.dumps(meta.roots), meta.loose, time.time()))
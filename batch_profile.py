@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+""" unrar_batch --profile: wall/cpu time, bytes read/written and MB/s of every phase of every set
+
+Sets append one JSON line each to <directory>/trace.jsonl, from whichever process ran them, the run
+phases (scan, plan, run, wait, sleep) and the totals per phase go to <directory>/summary.json.
+The bytes of the parent run phase include those of the pool workers, added once they exit.
+With a profiler, cProfile or the stack sampler wraps the parent run and each set run by a pool worker:
+<directory>/<name>.pstats, or <directory>/<name>.folded (flamegraph.pl / speedscope input).
+"""
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import NamedTuple, Optional
+import cProfile
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+PROFILERS = ('cprofile', 'sample')
+SAMPLE_INTERVAL = 0.005
+# cpu/wall above which a phase counts as CPU bound
+CPU_BOUND = 0.7
+# read()/write() bytes below which a phase is waiting rather than doing I/O, reading /proc/self/io included
+IO_MIN_BYTES = 64 * 1024
+IO_FIELDS = ('rchar', 'wchar', 'read_bytes', 'write_bytes')
+
+
+class ProfileOptions(NamedTuple):
+    """ picklable, travels with the jobs to the pool workers """
+    directory: str
+    profiler: Optional[str] = None
+    parent_pid: int = 0
+
+
+def io_counters():
+    """ /proc/self/io: rchar/wchar every read()/write(), read_bytes/write_bytes what reached the storage """
+    try:
+        with open('/proc/self/io') as f:
+            counters = dict(line.split(': ') for line in f.read().splitlines())
+        return {name: int(counters[name]) for name in IO_FIELDS}
+    except (OSError, KeyError, ValueError):
+        return dict.fromkeys(IO_FIELDS, 0)
+
+
+class PhaseRecorder:
+    """ phases of one set, or of the run, nothing recorded when disabled """
+
+    def __init__(self, name, enabled=True):
+        self.name = name
+        self.enabled = enabled
+        self.phases = []
+
+    @contextmanager
+    def phase(self, name, payload_bytes=0):
+        """ the record is yielded, payload_bytes (what the phase processed) can be set inside """
+        record = {'phase': name, 'payload_bytes': payload_bytes}
+        if not self.enabled:
+            yield record
+            return
+        io_before = io_counters()
+        cpu = time.process_time()
+        start = time.monotonic()
+        try:
+            yield record
+        finally:
+            seconds = time.monotonic() - start
+            record['seconds'] = round(seconds, 6)
+            record['cpu_seconds'] = round(time.process_time() - cpu, 6)
+            io_after = io_counters()
+            record.update((field, io_after[field] - io_before[field]) for field in IO_FIELDS)
+            record['MBps'] = round(record['payload_bytes'] / seconds / 1e6, 3) if seconds > 0 else None
+            self.phases.append(record)
+
+    def to_dict(self, **extra):
+        return dict(name=self.name, pid=os.getpid(), phases=self.phases, **extra)
+
+
+class StackSampler:
+    """ sampling profiler: the stack of every other thread of the process every interval seconds """
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.counts = Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name='StackSampler', daemon=True)
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self.stopped.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                self.counts[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def write(self, path):
+        """ folded stacks, one 'frame;frame;frame count' line per distinct stack """
+        path.write_text("".join(f"{stack} {count}\n" for stack, count in self.counts.most_common()))
+
+
+def _file_stem(name):
+    return re.sub(r'[^\w.-]+', '_', str(name))
+
+
+@contextmanager
+def profiled(options, name, worker=False):
+    """ run the block under the profiler of options, worker blocks only in pool workers: the parent
+    profile of a serial run already covers its sets """
+    if options is None or options.profiler is None or (worker and os.getpid() == options.parent_pid):
+        yield
+        return
+    stem = Path(options.directory).joinpath(_file_stem(name))
+    if options.profiler == 'cprofile':
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            profile.dump_stats(f"{stem}.pstats")
+    else:
+        sampler = StackSampler()
+        sampler.start()
+        try:
+            yield
+        finally:
+            sampler.stop()
+            sampler.write(Path(f"{stem}.folded"))
+
+
+def start_trace(options):
+    """ an empty trace for a new run """
+    directory = Path(options.directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    directory.joinpath('trace.jsonl').write_text("")
+
+
+def append_trace(options, record):
+    """ one line per set, a single O_APPEND write so that pool workers never interleave """
+    line = (json.dumps(record, default=str) + "\n").encode('utf8')
+    fd = os.open(Path(options.directory).joinpath('trace.jsonl'), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, line)
+    finally:
+        os.close(fd)
+
+
+def _totals(records):
+    totals = defaultdict(lambda: dict(count=0, seconds=0.0, cpu_seconds=0.0, payload_bytes=0,
+                                      **dict.fromkeys(IO_FIELDS, 0)))
+    for record in records:
+        total = totals[record['phase']]
+        total['count'] += 1
+        for key in ('seconds', 'cpu_seconds', 'payload_bytes') + IO_FIELDS:
+            total[key] += record[key]
+    for total in totals.values():
+        seconds = total['seconds']
+        total['seconds'] = round(seconds, 3)
+        total['cpu_seconds'] = round(total['cpu_seconds'], 3)
+        total['cpu_share'] = round(total['cpu_seconds'] / seconds, 3) if seconds > 0 else None
+        total['MBps'] = round(total['payload_bytes'] / seconds / 1e6, 3) if seconds > 0 else None
+        if total['cpu_share'] is not None and total['cpu_share'] >= CPU_BOUND:
+            total['bound'] = 'cpu'
+        elif total['read_bytes'] or total['write_bytes'] or total['rchar'] + total['wchar'] >= IO_MIN_BYTES:
+            total['bound'] = 'io'
+        else:
+            total['bound'] = 'wait'
+    return dict(totals)
+
+
+def write_summary(options, run):
+    """ totals per set phase across the trace and the run phases, written to summary.json and returned """
+    directory = Path(options.directory)
+    sets = [json.loads(line) for line in directory.joinpath('trace.jsonl').read_text().splitlines() if line]
+    summary = {
+        'sets': len(sets),
+        'run': _totals(run.phases),
+        'phases': _totals(record for s in sets for record in s['phases']),
+        'profiler': options.profiler,
+        'trace': str(directory.joinpath('trace.jsonl').absolute()),
+    }
+    directory.joinpath('summary.json').write_text(json.dumps(summary, indent=2))
+    return summary
+
+
+def format_summary(summary):
+    """ one line per phase, the run phases first """
+    lines = []
+    for scope in ('run', 'phases'):
+        for phase, t in summary[scope].items():
+            mbps = f"{t['MBps']:9.1f} MB/s" if t['MBps'] else f"{'-':>9}     "
+            cpu = f"{t['cpu_share']:4.0%}" if t['cpu_share'] is not None else "   -"
+            lines.append(f"{scope:<6} {phase:<8} x{t['count']:<4} {t['seconds']:10.3f}s cpu {cpu} {mbps} "
+                         f"read {t['read_bytes'] / 1e6:9.1f} MB ({t['rchar'] / 1e6:.1f}) "
+                         f"write {t['write_bytes'] / 1e6:9.1f} MB ({t['wchar'] / 1e6:.1f})  {t['bound']}")
+    return lines
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+""" test and extraction throughput of the archive backends on fixtures written with the stdlib
+
+    python3 benchmarks/bench_backends.py [--files 200] [--file-size 262144] [--buffer-size 65536 ...] [-r 3]
+
+Fixtures (zip stored, zip deflated, tar, tar.gz) are made in a temporary directory from random and
+repetitive data. Every available backend of each format is timed for each buffer size, best of -r runs,
+and the fastest backend per format is printed last, ready for unrar_batch.py --backend.
+"""
+from pathlib import Path
+import argparse
+import io
+import random
+import shutil
+import sys
+import tarfile
+import tempfile
+import time
+import zipfile
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import archive_backends  # noqa: E402
+
+FIXTURES = {'zip-stored': 'fixture-stored.zip', 'zip-deflated': 'fixture-deflated.zip', 'tar': 'fixture.tar',
+            'tar.gz': 'fixture.tar.gz'}
+
+
+def payloads(files, file_size, seed=0):
+    """ (name, data) half random, half compressible """
+    rnd = random.Random(seed)
+    for i in range(files):
+        if i % 2:
+            data = rnd.randbytes(file_size)
+        else:
+            data = (b"%d tutorial chapter %d\n" % (i, rnd.randint(0, 99))) * (file_size // 24 + 1)
+        yield "set/part{:02d}/file{:05d}.bin".format(i % 10, i), data[:file_size]
+
+
+def make_fixtures(directory, files, file_size):
+    paths = {}
+    for fixture, name in FIXTURES.items():
+        path = directory / name
+        if fixture.startswith('zip'):
+            mode = zipfile.ZIP_DEFLATED if fixture == 'zip-deflated' else zipfile.ZIP_STORED
+            with zipfile.ZipFile(path, 'w', mode) as z:
+                for member, data in payloads(files, file_size):
+                    z.writestr(member, data)
+        else:
+            with tarfile.open(path, 'w:gz' if fixture == 'tar.gz' else 'w') as t:
+                for member, data in payloads(files, file_size):
+                    info = tarfile.TarInfo(member)
+                    info.size = len(data)
+                    t.addfile(info, io.BytesIO(data))
+        paths[fixture] = path
+    return paths
+
+
+def timed(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def bench(path, backend, buffer_size, work, repeat):
+    """ (test seconds, extract seconds) of one backend """
+    fmt = archive_backends.detect_format(path)
+    options = {'backends': {fmt: [backend]}, 'buffer_size': buffer_size}
+
+    def test():
+        with archive_backends.open_archive(path, **options) as archive:
+            assert archive.testall() is None
+
+    def extract():
+        shutil.rmtree(work, ignore_errors=True)
+        work.mkdir()
+        with archive_backends.open_archive(path, **options) as archive:
+            archive.extractall(work)
+
+    return timed(test, repeat), timed(extract, repeat)
+
+
+def main(args):
+    total = args.files * args.file_size
+    fastest = {}
+    with tempfile.TemporaryDirectory(prefix='bench_backends-') as tmp:
+        tmp = Path(tmp)
+        paths = make_fixtures(tmp, args.files, args.file_size)
+        print("{} files of {} bytes, {:.1f} MB per fixture".format(args.files, args.file_size, total / 1e6))
+        print("{:<13} {:<11} {:>9} {:>10} {:>12}".format('fixture', 'backend', 'buffer', 'test MB/s', 'extract MB/s'))
+        for fixture, path in paths.items():
+            fmt = archive_backends.detect_format(path)
+            for backend in archive_backends.available_backends(fmt):
+                for buffer_size in args.buffer_size:
+                    test_s, extract_s = bench(path, backend, buffer_size, tmp / 'out', args.repeat)
+                    print("{:<13} {:<11} {:>9} {:>10.1f} {:>12.1f}".format(
+                        fixture, backend, buffer_size, total / test_s / 1e6, total / extract_s / 1e6))
+                    best = fastest.get(fmt)
+                    if best is None or extract_s < best[0]:
+                        fastest[fmt] = (extract_s, backend, buffer_size)
+    for fmt, (_, backend, buffer_size) in sorted(fastest.items()):
+        print("fastest {}: --backend {}={} --buffer-size {}".format(fmt, fmt, backend, buffer_size))
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=200, help="members per fixture")
+    parser.add_argument("--file-size", type=int, default=256 * 1024, help="bytes per member")
+    parser.add_argument("--buffer-size", type=int, nargs='+', default=[16 * 1024, 256 * 1024, 1024 * 1024])
+    parser.add_argument('-r', "--repeat", type=int, default=3, help="runs per measure, the best is kept")
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+""" offline crawl throughput of both spiders against the local stand-in site
+
+    python3 benchmarks/bench_crawl.py [--spider learningdl|scene_rls|all] [--pages 20] [--latency 0.05]
+
+Each spider runs in its own process so peak RSS is reported per spider.
+"""
+from pathlib import Path
+import argparse
+import json
+import multiprocessing
+import resource
+import subprocess
+import sys
+import tempfile
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / 'benchmarks'))
+
+from scrapy.crawler import CrawlerProcess  # noqa: E402
+from metrics import CrawlMetrics  # noqa: E402
+from stand_in_site import serve  # noqa: E402
+
+SPIDERS = ('learningdl', 'scene_rls')
+
+
+def bench_spider_class(name, base, metrics_dir, overrides=None):
+    """ spider subclass pointed at the stand-in site, without feeds and on-disk state, metrics in metrics_dir """
+    if name == 'learningdl':
+        from learningdl import LearningDLSpider as spidercls
+        start_urls = (base + '/learningdl/category/ebooks-tutorials/technical/',)
+    else:
+        from scene_rls import SceneRlsSpider as spidercls
+        start_urls = (base + '/scene/?cat=51', base + '/scene/?cat=52')
+    custom_settings = dict(spidercls.custom_settings)
+    custom_settings.update({
+        'FEEDS': {},
+        'SEEN_INDEX': '',
+        'HTTPCACHE_ENABLED': False,
+        # callback timings come from metrics.CallbackLatencyMiddleware, written once at the end
+        'METRICS_FILE': str(Path(metrics_dir, '%(name)s.json')),
+        'METRICS_INTERVAL': 0,
+        'STORE_PATH': '',
+        'DEDUPE_INDEX': '',
+        'LOG_LEVEL': 'WARNING',
+    })
+    custom_settings.update(overrides or {})
+    return type('Bench' + spidercls.__name__, (spidercls,), {
+        'start_urls': start_urls,
+        'allowed_domains': ['127.0.0.1'],
+        'custom_settings': custom_settings,
+    })
+
+
+def run_one(name, base, overrides=None):
+    with tempfile.TemporaryDirectory(prefix='bench_crawl-') as metrics_dir:
+        spidercls = bench_spider_class(name, base, metrics_dir, overrides)
+        process = CrawlerProcess()
+        crawler = process.create_crawler(spidercls)
+        process.crawl(crawler)
+        process.start()
+    stats = crawler.stats.get_stats()
+    callbacks = CrawlMetrics.for_crawler(crawler).callbacks
+    elapsed = stats.get('elapsed_time_seconds') or 1e-9
+    pages = stats.get('response_received_count', 0)
+    items = stats.get('item_scraped_count', 0)
+    return {
+        'spider': name,
+        'elapsed_s': round(elapsed, 3),
+        'pages': pages,
+        'items': items,
+        'dropped': stats.get('item_dropped_count', 0),
+        'pages_per_s': round(pages / elapsed, 1),
+        'items_per_s': round(items / elapsed, 1),
+        # ru_maxrss is in KiB on Linux
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'callbacks': {
+            cb: {'calls': h.count, 'total_ms': round(h.sum * 1e3, 2), 'per_call_ms': round(h.sum * 1e3 / h.count, 3)}
+            for cb, h in callbacks.items() if h.count
+        },
+    }
+
+
+def print_report(report):
+    print("### {spider}: {pages} pages, {items} items ({dropped} dropped) in {elapsed_s}s".format(**report))
+    print("    pages/sec {pages_per_s}  items/sec {items_per_s}  peak RSS {peak_rss_mb} MB".format(**report))
+    for cb, timing in sorted(report['callbacks'].items()):
+        print("    {:<12} {calls:>6} calls {total_ms:>10} ms {per_call_ms:>8} ms/call".format(cb, **timing))
+
+
+def main(args):
+    ready = multiprocessing.Queue()
+    server = multiprocessing.Process(target=serve, args=(0, args.pages, args.per_page, args.latency, ready, args.span_days), daemon=True)
+    server.start()
+    base = "http://127.0.0.1:{}".format(ready.get(timeout=10))
+    reports = []
+    try:
+        for name in (SPIDERS if args.spider == 'all' else (args.spider,)):
+            out = subprocess.run(
+                [sys.executable, __file__, '--run', name, '--base', base] + [a for kv in args.set for a in ('-s', kv)],
+                check=True, stdout=subprocess.PIPE, universal_newlines=True).stdout
+            reports.append(json.loads(out.splitlines()[-1]))
+    finally:
+        server.terminate()
+    for report in reports:
+        print_report(report)
+    if args.json:
+        args.json.write_text(json.dumps(reports, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--spider", choices=SPIDERS + ('all',), default='all')
+    parser.add_argument("--pages", type=int, default=10, help="list pages per site/category")
+    parser.add_argument("--per-page", type=int, default=10, help="posts per list page")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds the stand-in site waits per response")
+    parser.add_argument("--span-days", type=float, default=1.0, help="age of the oldest generated post")
+    parser.add_argument("--json", type=Path, help="also write the reports to this file")
+    parser.add_argument("-s", "--set", action='append', default=[], metavar='NAME=VALUE',
+                        help="spider setting override, e.g. -s PAGINATION_WINDOW=1")
+    parser.add_argument("--run", choices=SPIDERS, help=argparse.SUPPRESS)
+    parser.add_argument("--base", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.run:
+        print(json.dumps(run_one(args.run, args.base, dict(kv.split('=', 1) for kv in args.set))))
+    else:
+        main(args)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+""" golden check and throughput of the scene_rls filter pipeline chain
+
+    python3 benchmarks/bench_filters.py [-n 1000000] [--alloc-sample 10000]
+
+Exits non zero when a golden title does not get its expected keep/drop decision.
+"""
+from pathlib import Path
+import argparse
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from common import Article  # noqa: E402
+import scene_rls  # noqa: E402
+
+PROVIDERS = ["Udemy", "Pluralsight com", "Linkedin Learning", "Skillshare", "Ask Video", "CreativeLive", "INE",
+             "A Cloud Guru", "Sitepoint com", "CLOUD ACADEMY", "Kelbyone", "Lynda", "Packt", "OReilly", "Gumroad"]
+WORDS = ["Kubernetes", "Fundamentals", "Python", "Advanced", "Masterclass", "Docker", "AWS", "Security", "Networking",
+         "Data", "Science", "Guide", "Complete", "Bootcamp", "React", "Linux", "Administration", "Design", "Audio",
+         "Mixing", "Photography", "Drawing", "Excel", "SQL", "Server", "Cisco", "CCNA", "Exam", "Review", "Project"]
+VERSIONS = ["", "", " v1 7 7", " v2020 7", " v10 0", " 2021"]
+TAGS = ["", "", "", " TUTORiAL", " REPACK", " ISO", " BOOKWARE", " Incl Keygen", " MULTILANGUAGE", " WebRip 10Bit H265"]
+GROUPS = ["SKiLLUP", "XCODE", "ADSR", "STM", "ELOHiM", "iNKiSO", "ViGOROUS", "iLST", "ZH", "BooKWoRM", "SOFTiMAGE",
+          "rG", "AMPED", "CYGNUS", "ENGiNE", "WEB0DAY", "FALLEN", "DVT", "LAXiTY", "6581", "DARKZER0", "CSE-V", "CLASS"]
+
+
+def synthetic_titles(count, seed=0):
+    """ release-like titles: [provider] words [version] [tag]-GROUP """
+    rnd = random.Random(seed)
+    for _ in range(count):
+        provider = rnd.choice(PROVIDERS) + " " if rnd.random() < 0.6 else ""
+        words = " ".join(rnd.choices(WORDS, k=rnd.randint(2, 9)))
+        yield "{}{}{}{}-{}".format(provider, words, rnd.choice(VERSIONS), rnd.choice(TAGS), rnd.choice(GROUPS))
+
+
+def throughput(chain, spider, titles):
+    kept = 0
+    start = time.perf_counter()
+    for title in titles:
+        kept += scene_rls.run_chain(chain, Article(title=title, links=('https://rapidgator.net/file/x',)), spider)
+    return time.perf_counter() - start, kept
+
+
+def allocations(chain, spider, titles):
+    """ mean tracemalloc peak above the baseline while one title goes through the chain """
+    total = 0
+    tracemalloc.start()
+    for title in titles:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        scene_rls.run_chain(chain, Article(title=title, links=('https://rapidgator.net/file/x',)), spider)
+        total += tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+    return total / max(1, len(titles))
+
+
+def main(args):
+    if scene_rls.test():
+        return 1
+    chain = scene_rls.pipeline_chain()
+    spider = scene_rls.SceneRlsSpider()
+    titles = list(synthetic_titles(args.number, args.seed))
+    elapsed, kept = throughput(chain, spider, titles)
+    print("{} synthetic titles in {:.2f}s: {:,.0f} titles/sec, {:.1%} kept".format(
+        len(titles), elapsed, len(titles) / elapsed, kept / len(titles)))
+    print("{:.0f} bytes allocated per title (tracemalloc peak, {} titles)".format(
+        allocations(chain, spider, titles[:args.alloc_sample]), min(len(titles), args.alloc_sample)))
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', "--number", type=int, default=1000000, help="synthetic titles")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--alloc-sample", type=int, default=10000, help="titles traced for allocations")
+    sys.exit(main(parser.parse_args()))
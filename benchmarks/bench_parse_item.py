@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+""" per-page cost of LearningDLSpider.parse_item extraction, legacy xpaths vs single pass
+
+    python3 benchmarks/bench_parse_item.py [saved_article.html ...] [-n 2000]
+"""
+from pathlib import Path
+import argparse
+import sys
+import timeit
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from scrapy.http import HtmlResponse  # noqa: E402
+from learningdl import extract_article  # noqa: E402
+
+FIXTURES = Path(__file__).resolve().parent / 'fixtures'
+
+
+def legacy_extract(response):
+    """ field extraction as done before the single pass plan """
+    return dict(
+        title=response.xpath('//article/header/h1/text()').extract_first(),
+        id=response.xpath('//article//@class').re_first(r'post-(\d+)'),
+        author=response.xpath('//span[@itemprop="author"]/a/span/text()').extract_first(),
+        lang=response.xpath('//article/div[@class="entry-content"]//text()').re_first(r'(.*) \| Size\: .+'),
+        size=response.xpath('//article/div[@class="entry-content"]//text()').re_first(r'.* \| Size\: (.+)'),
+        cat=response.xpath('//article/div[@class="entry-content"]//text()').re_first(r'(?:Genre|Category)\: (.+)'),
+        desc="".join(response.xpath('//div[@style="text-align:center;"]/following-sibling::*/text()').extract()),
+        links=response.xpath('//a[@class="autohyperlink"]/@href').extract()
+    )
+
+
+def single_pass_extract(response):
+    return extract_article(response.selector.root)
+
+
+def main(paths, number):
+    for path in paths:
+        body = path.read_bytes()
+        print("### {} ({} bytes)".format(path.name, len(body)))
+        for func in (legacy_extract, single_pass_extract):
+            # fresh response per call so the parsed tree is part of the measured cost
+            def run():
+                func(HtmlResponse(url='https://learningdl.net/bench/', body=body, encoding='utf8'))
+            best = min(timeit.repeat(run, number=number, repeat=5))
+            print("{:<22} {:>9.1f} us/page".format(func.__name__, best / number * 1e6))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('html', type=Path, nargs='*', help="saved article pages")
+    parser.add_argument('-n', "--number", type=int, default=2000, help="pages per timing run")
+    args = parser.parse_args()
+    main(args.html or sorted(FIXTURES.glob('learningdl_article*.html')), args.number)
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+""" local stand-in for learningdl.net and scene-rls.net serving synthetic list and article pages
+
+    python3 benchmarks/stand_in_site.py --port 8000 --pages 20 --latency 0.05
+
+    learningdl list:    /learningdl/category/ebooks-tutorials/technical/[page/N/]
+    learningdl article: /learningdl/<post id>/
+    scene-rls list:     /scene/?cat=51[&paged=N]
+"""
+from datetime import datetime, timedelta, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from html import escape
+from urllib.parse import urlsplit, parse_qs
+import argparse
+import re
+import time
+
+TITLES = [
+    "A Cloud Guru Kubernetes Fundamentals-SKiLLUP",
+    "Addison Wesley Professional Continuous Encryption on AWS REPACK-XCODE",
+    "Ask Video Behringer 101 DeepMind 12 Explained and Explored TUTORiAL-ADSR",
+    "Combit Relationship Manager v10 0 Enterprise MULTILANGUAGE-CYGNUS",
+    "INE CCIE Service Provider v5 Exam Review-iLST",
+    "Kaizen Software Asset Manager 2019 Enterprise Edition v3 1 1003 0 Incl Keygen-AMPED",
+    "Linkedin Learning PHP for WordPress Online Class-ZH",
+    "Pluralsight com Getting Started with Software Development Using Cisco DevNet 2020-ELOHiM",
+    "PortSwigger Burp Suite Professional v2020 7-WEB0DAY",
+    "Skillshare NLP Master Guide To Achieving Extraordinary Results-ViGOROUS",
+    "Udemy Learn Django 2 for Beginners BOOKWARE-SOFTiMAGE",
+]
+LEARNINGDL_LIST = re.compile(r'^/learningdl/category/ebooks-tutorials/technical/(?:page/(\d+)/)?$')
+LEARNINGDL_ARTICLE = re.compile(r'^/learningdl/(\d+)/$')
+
+LEARNINGDL_PAGE = """<!DOCTYPE html>
+<html><head><title>LearningDL</title></head>
+<body><div class="site-container"><div class="site-inner"><div class="content-sidebar-wrap"><main class="content">
+{articles}
+<div class="archive-pagination pagination"><ul>{next}</ul></div>
+</main></div></div></div></body></html>"""
+LEARNINGDL_ENTRY = """<article class="post-{id} post type-post status-publish entry">
+<header class="entry-header"><h2 class="entry-title"><a href="{url}" rel="bookmark">{title}</a></h2>
+<p class="entry-meta"><time class="entry-time" datetime="{date}">{date}</time></p></header>
+<div class="entry-content"><p>{title}</p><p><a href="{url}" class="more-link">Read more</a></p></div>
+</article>"""
+LEARNINGDL_ARTICLE_PAGE = """<!DOCTYPE html>
+<html><head><title>{title}</title></head>
+<body><div class="site-container"><div class="site-inner"><div class="content-sidebar-wrap"><main class="content">
+<article class="post-{id} post type-post status-publish entry">
+<header class="entry-header"><h1 class="entry-title">{title}</h1>
+<p class="entry-meta"><time class="entry-time" datetime="{date}">{date}</time> by <span class="entry-author" itemprop="author"><a href="/author/admin/"><span class="entry-author-name">admin</span></a></span></p></header>
+<div class="entry-content">
+<div style="text-align:center;"><img src="/cover-{id}.jpg" alt=""></div>
+<p><strong>{title}</strong><br>
+English | Size: {size} MB<br>
+Genre: eLearning</p>
+<p>Synthetic description of post {id} for the crawl benchmark.</p>
+<p><a class="autohyperlink" href="https://rapidgator.net/file/{id:x}/part1.rar.html">https://rapidgator.net/file/{id:x}/part1.rar.html</a><br>
+<a class="autohyperlink" href="https://nitroflare.com/view/{id:X}/part1.rar">https://nitroflare.com/view/{id:X}/part1.rar</a></p>
+</div></article>
+</main></div></div></div></body></html>"""
+
+SCENE_PAGE = """<!DOCTYPE html>
+<html><head><title>scene-rls</title></head>
+<body><div id="content">
+{posts}
+<div class="navigation">{next}</div>
+</div></body></html>"""
+SCENE_POST = """<div class="post">
+<div class="postHeader"><h2 class="postTitle"><a href="{url}" title="{title}">{title}</a></h2>
+<div class="postSubTitle"><span class="postCategories"><a href="/?cat={cat}" rel="category">Apps</a></span></div></div>
+<div class="postContent">
+<p style="text-align: center;">Published on: {date}<br>Size: {size} MB</p>
+<h2 style="text-align: center;"><a href="https://rapidgator.net/file/{id:x}/{slug}.rar.html">Rapidgator</a> <a href="https://nitroflare.com/view/{id:X}/{slug}.rar">Nitroflare</a></h2>
+</div>
+<div class="postFooter"><span class="postTags"><a href="/tag/tutorial/">Tutorial</a> <a href="/tag/elearning/">eLearning</a></span></div>
+</div>"""
+
+
+class StandInSite:
+    """ deterministic synthetic content: page N holds posts (N-1)*per_page .. N*per_page-1 """
+
+    def __init__(self, pages=10, per_page=10, latency=0.0, span=timedelta(days=1)):
+        self.pages = pages
+        self.per_page = per_page
+        self.latency = latency
+        self.now = datetime.now(timezone.utc)
+        # default span keeps every generated post inside the spiders MAX_TIMEDELTA
+        self.step = span / max(1, pages * per_page)
+
+    def post(self, index):
+        return {
+            'id': 100000 + index,
+            'title': TITLES[index % len(TITLES)],
+            'date': self.now - self.step * index,
+            'size': 50 + (index * 37) % 4000,
+        }
+
+    def page_range(self, page):
+        return range((page - 1) * self.per_page, page * self.per_page)
+
+    def learningdl_list(self, base, page):
+        articles = []
+        for index in self.page_range(page):
+            post = self.post(index)
+            articles.append(LEARNINGDL_ENTRY.format(
+                id=post['id'], url="{}/learningdl/{}/".format(base, post['id']), title=escape(post['title']),
+                date=post['date'].strftime('%Y-%m-%dT%H:%M:%S%z')))
+        nxt = ''
+        if page < self.pages:
+            nxt = '<li class="pagination-next"><a href="{}/learningdl/category/ebooks-tutorials/technical/page/{}/">Next Page</a></li>'.format(base, page + 1)
+        return LEARNINGDL_PAGE.format(articles="\n".join(articles), next=nxt)
+
+    def learningdl_article(self, post_id):
+        post = self.post(post_id - 100000)
+        return LEARNINGDL_ARTICLE_PAGE.format(
+            id=post['id'], title=escape(post['title']), size=post['size'],
+            date=post['date'].strftime('%Y-%m-%dT%H:%M:%S%z'))
+
+    def scene_list(self, base, cat, page):
+        posts = []
+        for index in self.page_range(page):
+            post = self.post(index)
+            local = post['date'].astimezone().replace(tzinfo=None)
+            posts.append(SCENE_POST.format(
+                id=post['id'], url="{}/scene/{}/".format(base, post['id']), title=escape(post['title']), cat=cat,
+                date=local.strftime('%b %d, %Y @ %H:%M'), size=post['size'], slug=post['title'].replace(' ', '.')))
+        nxt = ''
+        if page < self.pages:
+            nxt = '<span id="olderEntries"><a href="{}/scene/?cat={}&amp;paged={}">Older Entries</a></span>'.format(base, cat, page + 1)
+        return SCENE_PAGE.format(posts="\n".join(posts), next=nxt)
+
+    def render(self, base, path, query):
+        m = LEARNINGDL_LIST.match(path)
+        if m:
+            page = int(m.group(1) or 1)
+            return self.learningdl_list(base, page) if page <= self.pages else None
+        m = LEARNINGDL_ARTICLE.match(path)
+        if m:
+            return self.learningdl_article(int(m.group(1)))
+        if path == '/scene/' and 'cat' in query:
+            page = int(query.get('paged', ['1'])[0])
+            return self.scene_list(base, query['cat'][0], page) if page <= self.pages else None
+        return None
+
+
+def make_handler(site):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if site.latency:
+                time.sleep(site.latency)
+            url = urlsplit(self.path)
+            body = site.render("http://{}".format(self.headers['Host']), url.path, parse_qs(url.query))
+            if body is None:
+                self.send_error(404)
+                return
+            body = body.encode('utf8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(port=8000, pages=10, per_page=10, latency=0.0, ready=None, span_days=1.0):
+    site = StandInSite(pages, per_page, latency, timedelta(days=span_days))
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(site))
+    server.daemon_threads = True
+    if ready is not None:
+        ready.put(server.server_address[1])
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--pages", type=int, default=10, help="list pages per site/category")
+    parser.add_argument("--per-page", type=int, default=10, help="posts per list page")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds slept before each response")
+    parser.add_argument("--span-days", type=float, default=1.0, help="age of the oldest generated post")
+    args = parser.parse_args()
+    serve(args.port, args.pages, args.per_page, args.latency, span_days=args.span_days)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+""" item, pipelines and log formatter shared by all spiders """
+import logging
+import re
+from dataclasses import dataclass, fields
+from datetime import datetime
+from typing import Optional, Tuple
+
+from scrapy import logformatter
+from scrapy.exceptions import DropItem
+
+from release_name import Release
+
+SIZE_RE = re.compile(r'([\d.,]+)\s*([KMGTP]?)i?B', re.IGNORECASE)
+SIZE_UNITS = {'': 1, 'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30, 'T': 1 << 40, 'P': 1 << 50}
+
+
+def size_to_bytes(size):
+    """ '1.5 GB' -> 1610612736, None when not a size """
+    m = SIZE_RE.search(size or '')
+    if m is None:
+        return None
+    try:
+        value = float(m.group(1).replace(',', '.'))
+    except ValueError:
+        return None
+    return int(value * SIZE_UNITS[m.group(2).upper()])
+
+
+@dataclass(slots=True)
+class Article:
+    url: Optional[str] = None
+    id: Optional[str] = None
+    title: Optional[str] = None
+    date: Optional[datetime] = None
+    author: Optional[str] = None
+    lang: Optional[str] = None
+    size: Optional[int] = None
+    cat: Optional[str] = None
+    desc: Optional[str] = None
+    tags: Tuple[str, ...] = ()
+    links: Tuple[str, ...] = ()
+    release: Optional[Release] = None
+
+
+# exported by the feeds, release is parsed from the title again when needed
+FEED_FIELDS = tuple(f.name for f in fields(Article) if f.name != 'release')
+
+
+class RuleDropItem(DropItem):
+    """ DropItem naming the pipeline and the rule that dropped the item, counted by metrics.CrawlMetrics """
+
+    def __init__(self, message, pipeline, rule):
+        super(RuleDropItem, self).__init__(message)
+        self.pipeline = pipeline if isinstance(pipeline, str) else type(pipeline).__name__
+        self.rule = rule
+
+
+class RapidgatorPipeline:
+    """ remove all not rapidgator links """
+    DOMAIN = "rapidgator.net"
+
+    def process_item(self, item, spider):
+        if item.links:
+            item.links = tuple(link for link in item.links if self.DOMAIN in link)
+            spider.logger.info("{}\t{}".format(self.DOMAIN, item.title))
+            return item
+        else:
+            raise RuleDropItem("Missing rapidgator link {}".format(item), self, self.DOMAIN)
+
+
+class PoliteLogFormatter(logformatter.LogFormatter):
+    def dropped(self, item, exception, response, spider):
+        return {
+            # 'level': logging.DEBUG,
+            # 'msg': logformatter.DROPPEDMSG,
+            'level': logging.INFO,
+            'msg': "Dropped: {} :".format(exception),
+            'exception': exception,
+            'args': {
+                'exception': exception,
+                'item': item,
+            }
+        }
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+from collections import OrderedDict
+from pathlib import Path
+import os
+import shutil
+
+from scrapy.extensions.httpcache import FilesystemCacheStorage, RFC2616Policy
+
+
+class RevalidatePolicy(RFC2616Policy):
+    """ never serve from cache without asking, always send If-None-Match / If-Modified-Since """
+
+    # cached response header -> request header asking the server for a 304
+    VALIDATORS = (('ETag', 'If-None-Match'), ('Last-Modified', 'If-Modified-Since'))
+
+    def is_cached_response_fresh(self, cachedresponse, request):
+        for header, conditional in self.VALIDATORS:
+            value = cachedresponse.headers.get(header)
+            if value is not None:
+                request.headers[conditional] = value
+        return False
+
+    def is_cached_response_valid(self, cachedresponse, response, request):
+        """ flag the cached copy 'not_modified' on a 304, not when it stands in for a server error """
+        valid = super(RevalidatePolicy, self).is_cached_response_valid(cachedresponse, response, request)
+        if valid and response.status == 304:
+            cachedresponse.flags.append('not_modified')
+        return valid
+
+
+class BoundedFilesystemCacheStorage(FilesystemCacheStorage):
+    """ filesystem cache evicting least recently used responses above HTTPCACHE_MAX_SIZE bytes """
+
+    def __init__(self, settings):
+        super(BoundedFilesystemCacheStorage, self).__init__(settings)
+        self.max_size = settings.getint('HTTPCACHE_MAX_SIZE', 64 * 1024 * 1024)
+        self._entries = OrderedDict()
+        self._size = 0
+
+    def open_spider(self, spider):
+        super(BoundedFilesystemCacheStorage, self).open_spider(spider)
+        entries = []
+        for meta in Path(self.cachedir, spider.name).glob('*/*/pickled_meta'):
+            entries.append((meta.stat().st_mtime, str(meta.parent)))
+        for _, rpath in sorted(entries):
+            self._track(rpath)
+        self._evict()
+
+    def retrieve_response(self, spider, request):
+        response = super(BoundedFilesystemCacheStorage, self).retrieve_response(spider, request)
+        if response is not None:
+            rpath = self._get_request_path(spider, request)
+            if rpath in self._entries:
+                self._entries.move_to_end(rpath)
+            os.utime(os.path.join(rpath, 'pickled_meta'))
+        return response
+
+    def store_response(self, spider, request, response):
+        super(BoundedFilesystemCacheStorage, self).store_response(spider, request, response)
+        self._track(self._get_request_path(spider, request))
+        self._evict()
+
+    def _track(self, rpath):
+        self._size -= self._entries.pop(rpath, 0)
+        size = sum(f.stat().st_size for f in Path(rpath).iterdir() if f.is_file())
+        self._entries[rpath] = size
+        self._size += size
+
+    def _evict(self):
+        while self._size > self.max_size and len(self._entries) > 1:
+            rpath, size = self._entries.popitem(last=False)
+            shutil.rmtree(rpath, ignore_errors=True)
+            self._size -= size
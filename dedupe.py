@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+""" duplicate suppression across spiders and runs: bloom filter in memory, exact keys in sqlite """
+from hashlib import blake2b
+from pathlib import Path
+from urllib.parse import urlsplit
+import math
+import re
+import sqlite3
+import time
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+
+from common import RuleDropItem
+from release_name import parse_release
+
+DEDUPE_INDEX = 'data/dedupe.sqlite'
+NON_ALNUM_RE = re.compile(r'[\W_]+')
+TITLE_STOPWORDS = {'com', 'the', 'a', 'an', 'and', 'of'}
+
+
+def normalize_title(title):
+    """ 'Pluralsight com Docker Deep Dive-ELOHiM' -> 'pluralsight docker deep dive' """
+    title = title.strip()
+    group = parse_release(title).group
+    if group:
+        title = title[:-len(group)].rstrip().rstrip('-')
+    words = NON_ALNUM_RE.sub(' ', title.casefold()).split()
+    return " ".join(w for w in words if w not in TITLE_STOPWORDS)
+
+
+def normalize_url(url):
+    u = urlsplit(url.strip())
+    host = u.hostname or ''
+    if host.startswith('www.'):
+        host = host[4:]
+    path = u.path.rstrip('/')
+    return "{}{}{}".format(host, path, '?' + u.query if u.query else '')
+
+
+def key_hash(key):
+    """ signed 64 bit hash, the integer primary key of the sqlite store """
+    return int.from_bytes(blake2b(key.encode('utf8'), digest_size=8).digest(), 'little', signed=True)
+
+
+class BloomFilter:
+    """ fixed size bit array, k positions derived from the two halves of a 64 bit hash """
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, h):
+        h1 = h & 0xffffffff
+        h2 = (h >> 32) & 0xffffffff | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, h):
+        for pos in self._positions(h):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, h):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(h))
+
+
+class DedupeIndex:
+    """ keys seen in the last retention_days, bloom filter for fast negatives, sqlite for exact answers """
+    _opened = {}
+
+    def __init__(self, path, capacity=1000000, error_rate=0.001, retention_days=365, commit_every=100):
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(path), timeout=30)
+        self.db.execute("CREATE TABLE IF NOT EXISTS seen (key INTEGER PRIMARY KEY, ts INTEGER NOT NULL)")
+        self.db.execute("DELETE FROM seen WHERE ts < ?", (int(time.time() - retention_days * 86400),))
+        self.db.commit()
+        self.bloom = BloomFilter(capacity, error_rate)
+        for h, in self.db.execute("SELECT key FROM seen"):
+            self.bloom.add(h)
+        self.commit_every = commit_every
+        self.pending = 0
+        self.users = 0
+
+    @classmethod
+    def open(cls, path, **kwargs):
+        """ one shared index per path, so spiders of the same process see each other's items """
+        index = cls._opened.get(path)
+        if index is None:
+            index = cls._opened[path] = cls(path, **kwargs)
+        index.users += 1
+        return index
+
+    def close(self):
+        self.users -= 1
+        if self.users <= 0:
+            self.db.commit()
+            self.db.close()
+            self._opened.pop(self.path, None)
+
+    def seen(self, h):
+        return h in self.bloom and self.db.execute("SELECT 1 FROM seen WHERE key = ?", (h,)).fetchone() is not None
+
+    def add(self, h):
+        self.bloom.add(h)
+        self.db.execute("INSERT OR IGNORE INTO seen (key, ts) VALUES (?, ?)", (h, int(time.time())))
+        self.pending += 1
+        if self.pending >= self.commit_every:
+            self.db.commit()
+            self.pending = 0
+
+    def contains(self, hashes):
+        return any(self.seen(h) for h in hashes)
+
+    def add_all(self, hashes):
+        for h in hashes:
+            self.add(h)
+
+    def check_and_add(self, keys):
+        """ True when any key was already seen, otherwise records all of them """
+        hashes = [key_hash(key) for key in keys]
+        if self.contains(hashes):
+            return True
+        self.add_all(hashes)
+        return False
+
+
+def item_keys(item):
+    """ normalized title and url keys, no title key for a title made of stopwords and a group only """
+    keys = []
+    title = normalize_title(item.title) if item.title else ''
+    if title:
+        keys.append('t:' + title)
+    if item.url:
+        keys.append('u:' + normalize_url(item.url))
+    return keys
+
+
+class DuplicatesPipeline:
+    """ drop items whose normalized title or url was already scraped, by any spider
+
+    Keys are recorded once the item went through every pipeline (item_scraped), an item dropped or failing
+    afterwards leaves them free for a later copy. Items still in the later pipelines hold their keys meanwhile. """
+
+    def __init__(self, index):
+        self.index = index
+        # key hashes of the items past this pipeline, by id of the item
+        self.in_flight = {}
+        self.pending = set()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        s = crawler.settings
+        path = s.get('DEDUPE_INDEX', DEDUPE_INDEX)
+        if not path:
+            raise NotConfigured("DEDUPE_INDEX is not set")
+        pipeline = cls(DedupeIndex.open(
+            path,
+            capacity=s.getint('DEDUPE_CAPACITY', 1000000),
+            error_rate=s.getfloat('DEDUPE_ERROR_RATE', 0.001),
+            retention_days=s.getint('DEDUPE_RETENTION_DAYS', 365)))
+        crawler.signals.connect(pipeline.item_scraped, signal=signals.item_scraped)
+        crawler.signals.connect(pipeline.item_released, signal=signals.item_dropped)
+        crawler.signals.connect(pipeline.item_released, signal=signals.item_error)
+        return pipeline
+
+    def close_spider(self, spider):
+        self.index.close()
+
+    def process_item(self, item, spider):
+        hashes = [key_hash(key) for key in item_keys(item)]
+        if not hashes:
+            return item
+        if self.pending.intersection(hashes) or self.index.contains(hashes):
+            raise RuleDropItem("Duplicate {}: \t{}".format(spider.name, item.title), self, 'duplicate')
+        self.in_flight[id(item)] = hashes
+        self.pending.update(hashes)
+        return item
+
+    def item_released(self, item, **kwargs):
+        """ dropped by a later pipeline or failed: the keys are free again """
+        hashes = self.in_flight.pop(id(item), None)
+        if hashes is not None:
+            self.pending.difference_update(hashes)
+        return hashes
+
+    def item_scraped(self, item, response, spider):
+        hashes = self.item_released(item)
+        if hashes is not None:
+            self.index.add_all(hashes)
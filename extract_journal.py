@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+""" crash-safe journal of unrar_batch: the state of every archive set, with sizes, durations and errors
+
+    queued -> verified -> extracting -> extracted -> moved, or error
+
+Each state change is committed before the next step starts, so a restarted batch resumes each set at
+the step it had reached. Sets in error are skipped until their volumes change, or retried with
+retry_errors. Pool workers open their own connection, sqlite WAL mode lets them write while the parent
+reads. Sets are keyed on the absolute path of their first volume, whatever the directory the batch
+runs from.
+"""
+from pathlib import Path
+import json
+import os
+import sqlite3
+import time
+
+STATES = ('queued', 'verified', 'extracting', 'extracted', 'moved', 'error')
+# where process_set starts again for each state, None when there is nothing left to do
+RESUME = {'queued': 'queued', 'verified': 'verified', 'extracting': 'verified', 'extracted': 'extracted',
+          'moved': None, 'error': None}
+
+
+def set_key(path):
+    """ journal key of a set: the absolute path of its first volume, whatever the current directory """
+    return os.path.abspath(path)
+
+
+class Journal:
+    """ one row per archive set, keyed on the path of its first volume
+    retry_errors: sets in error resume from the start instead of being skipped """
+
+    def __init__(self, path, retry_errors=False):
+        self.path = Path(path).absolute()
+        self.retry_errors = retry_errors
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(self.path), timeout=30)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("""CREATE TABLE IF NOT EXISTS sets (
+            path TEXT PRIMARY KEY,
+            volumes TEXT NOT NULL,
+            volume_bytes INTEGER NOT NULL,
+            uncompressed INTEGER,
+            state TEXT NOT NULL,
+            error TEXT,
+            durations TEXT NOT NULL DEFAULT '{}',
+            queued_at REAL NOT NULL,
+            updated_at REAL NOT NULL)""")
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+    def get(self, path):
+        row = self.db.execute("SELECT * FROM sets WHERE path = ?", (set_key(path),)).fetchone()
+        return dict(row) if row is not None else None
+
+    def resume_state(self, path, volume_bytes):
+        """ (state to resume from or None when done/failed, journal row), 'queued' for unknown or changed sets """
+        row = self.get(path)
+        if row is None or row['volume_bytes'] != volume_bytes:
+            return 'queued', row
+        if row['state'] == 'error' and self.retry_errors:
+            return 'queued', row
+        return RESUME[row['state']], row
+
+    def queue(self, path, volumes, volume_bytes, uncompressed):
+        now = time.time()
+        with self.db:
+            self.db.execute("""INSERT OR REPLACE INTO sets
+                (path, volumes, volume_bytes, uncompressed, state, error, durations, queued_at, updated_at)
+                VALUES (?, ?, ?, ?, 'queued', NULL, '{}', ?, ?)""",
+                            (set_key(path), json.dumps([set_key(v) for v in volumes]), volume_bytes, uncompressed,
+                             now, now))
+
+    def update(self, path, state, seconds=None, error=None):
+        """ new state of a set, seconds spent reaching it added to its durations """
+        assert state in STATES, state
+        key = set_key(path)
+        with self.db:
+            row = self.db.execute("SELECT durations FROM sets WHERE path = ?", (key,)).fetchone()
+            durations = json.loads(row['durations']) if row is not None else {}
+            if seconds is not None:
+                durations[state] = round(durations.get(state, 0.0) + seconds, 3)
+            self.db.execute("UPDATE sets SET state = ?, error = ?, durations = ?, updated_at = ? WHERE path = ?",
+                            (state, error, json.dumps(durations), time.time(), key))
+
+    def report(self):
+        """ every set of the journal and the number of sets per state, JSON serializable """
+        sets = []
+        for row in self.db.execute("SELECT * FROM sets ORDER BY queued_at, path"):
+            row = dict(row)
+            row['volumes'] = json.loads(row['volumes'])
+            row['durations'] = json.loads(row['durations'])
+            sets.append(row)
+        counts = {state: 0 for state in STATES}
+        for row in sets:
+            counts[row['state']] += 1
+        return {'journal': str(self.path.absolute()), 'states': counts, 'sets': sets}
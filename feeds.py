@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+""" compressed jsonlines feeds per spider and run, with an on-demand CSV projection
+
+    python3 feeds.py data/scene_rls/*.jsonl.gz -f title links -o scene_rls.csv
+"""
+from datetime import datetime, timezone
+from pathlib import Path
+import argparse
+import csv
+import gzip
+import json
+import logging
+import sys
+import zlib
+
+from scrapy.extensions.postprocessing import GzipPlugin
+from twisted.internet import task
+
+from common import FEED_FIELDS
+
+logger = logging.getLogger(__name__)
+
+# one set of files per run, never appended to: a run killed mid-write leaves its own truncated file only
+FEED_URI = 'data/%(name)s/%(name)s_%(run)s_%(batch_id)02d.jsonl.gz'
+
+
+def uri_params(params, spider):
+    """ FEED_URI_PARAMS: adds %(run)s, the UTC start time of the run, the same for all its batches """
+    if 'feed_run' not in spider.__dict__:
+        spider.feed_run = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')
+    params['run'] = spider.feed_run
+    return params
+
+
+def jsonl_gz_feeds(batch_item_count=5000, flush_items=100, flush_interval=60.0):
+    """ FEEDS setting: gzip jsonlines rotated every batch_item_count items, batch numbers restart with every run
+
+    Scrapy starts feed batches on an item count only, there is no size or time based rotation to hook into.
+    What was written is flushed every flush_items items and at least every flush_interval seconds. """
+    return {
+        FEED_URI: {
+            'format': 'jsonlines',
+            'encoding': 'utf8',
+            'overwrite': True,
+            'store_empty': False,
+            'fields': list(FEED_FIELDS),
+            'batch_item_count': batch_item_count,
+            'postprocessing': ['feeds.FlushingGzipPlugin'],
+            'gzip_compresslevel': 6,
+            'gzip_flush_items': flush_items,
+            'gzip_flush_interval': flush_interval,
+        },
+    }
+
+
+class FlushingGzipPlugin(GzipPlugin):
+    """ gzip postprocessing flushing every `gzip_flush_items` items and every `gzip_flush_interval` seconds,
+    so readers can follow a running crawl, a slow one included """
+
+    def __init__(self, file, feed_options):
+        super(FlushingGzipPlugin, self).__init__(file, feed_options)
+        self.flush_items = feed_options.get('gzip_flush_items', 0)
+        self.pending = 0
+        self.task = None
+        interval = feed_options.get('gzip_flush_interval', 0)
+        if interval > 0:
+            self.task = task.LoopingCall(self.flush)
+            self.task.start(interval, now=False)
+
+    def write(self, data):
+        written = super(FlushingGzipPlugin, self).write(data)
+        self.pending += 1
+        if self.flush_items and self.pending >= self.flush_items:
+            self.flush()
+        return written
+
+    def flush(self):
+        """ make the items written so far readable, a no-op when nothing is pending """
+        if self.pending:
+            self.gzipfile.flush()
+            self.pending = 0
+
+    def close(self):
+        if self.task is not None and self.task.running:
+            self.task.stop()
+        super(FlushingGzipPlugin, self).close()
+
+
+def iter_items(paths):
+    """ items of jsonlines feeds, a feed still being written or cut short by a killed crawl ends at its
+    last complete line """
+    for path in paths:
+        opener = gzip.open if path.suffix == '.gz' else open
+        with opener(path, 'rt', encoding='utf8') as f:
+            try:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        item = json.loads(line)
+                    except json.JSONDecodeError:
+                        if line.endswith('\n'):
+                            raise
+                        logger.warning("{}: skipping the incomplete last line".format(path))
+                        break
+                    yield item
+            except (EOFError, zlib.error, gzip.BadGzipFile) as e:
+                logger.warning("{}: truncated feed, read up to the last complete line ({})".format(path, e))
+
+
+def to_csv(paths, fields, out):
+    """ CSV projection of jsonlines feeds, list values joined with ',' like scrapy's CsvItemExporter """
+    writer = csv.writer(out)
+    writer.writerow(fields)
+    for item in iter_items(paths):
+        writer.writerow([",".join(map(str, v)) if isinstance(v, list) else v for v in map(item.get, fields)])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('feeds', type=Path, nargs='+', help="jsonlines feed files (.jsonl or .jsonl.gz)")
+    parser.add_argument('-f', "--fields", nargs='+', default=["title", "links"])
+    parser.add_argument('-o', "--output", type=Path, help="csv file, stdout by default")
+    args = parser.parse_args()
+    if args.output:
+        with args.output.open('w', newline='', encoding='utf8') as out:
+            to_csv(args.feeds, args.fields, out)
+    else:
+        to_csv(args.feeds, args.fields, sys.stdout)
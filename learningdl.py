@@ -1,14 +1,18 @@
 #!/usr/bin/env python3
 
-import logging
-from scrapy import Spider, Request, Item, Field, logformatter
+import dbm
+import re
+from pathlib import Path
+from lxml import etree
+from scrapy import Spider, Request, signals
 from scrapy.crawler import CrawlerProcess
 # from scrapy.loader import ItemLoader
-from scrapy.exceptions import CloseSpider, DropItem
-from pathlib import Path
+from scrapy.exceptions import CloseSpider
 from datetime import datetime, timedelta, timezone
-from itemadapter import ItemAdapter
 from pprint import pprint
+from common import Article, RuleDropItem, size_to_bytes
+from pagination import Paginator
+import feeds
 
 
 class LearningDLSpider(Spider):
@@ -22,24 +26,44 @@ class LearningDLSpider(Spider):
     allowed_domains = ["learningdl.net"]
     custom_settings = {
         'ITEM_PIPELINES': {
-            'learningdl.RapidgatorPipeline': 1,
-            'learningdl.UdemyBlackListPipeline': 10
+            'learningdl.UdemyBlackListPipeline': 10,
+            'dedupe.DuplicatesPipeline': 70,
+            'common.RapidgatorPipeline': 80,
+            'store.StorePipeline': 90,
         },
+        # searchable store of the kept items: python3 store.py query <words>
+        'STORE_PATH': 'data/items.sqlite',
+        # duplicates across spiders and runs, shared index file, '' to disable
+        'DEDUPE_INDEX': 'data/dedupe.sqlite',
+        'DEDUPE_RETENTION_DAYS': 365,
         'LOG_LEVEL': 'INFO',
-        'LOG_FORMATTER': 'learningdl.PoliteLogFormatter',
-        'FEEDS': {
-            'data_%(name)s_%(time)s_.json': {
-                'format': 'jsonlines',
-                'encoding': 'utf8',
-                'store_empty': False,
-                'fields': None,
-                'indent': 0,
-            },
-            Path('data_%(name)s_%(time)s_.csv'): {
-                'format': 'csv',
-                'fields': ["title", "links", "date", "url", "id"],
-            },
-        }
+        'LOG_FORMATTER': 'common.PoliteLogFormatter',
+        # on-disk index of already scraped posts, set to '' to disable
+        'SEEN_INDEX': 'data/seen_learningdl.db',
+        # conditional requests (ETag / Last-Modified) against a size-bounded cache
+        'HTTPCACHE_ENABLED': True,
+        'HTTPCACHE_DIR': 'data/httpcache',
+        'HTTPCACHE_POLICY': 'conditional_cache.RevalidatePolicy',
+        'HTTPCACHE_STORAGE': 'conditional_cache.BoundedFilesystemCacheStorage',
+        'HTTPCACHE_MAX_SIZE': 64 * 1024 * 1024,
+        'HTTPCACHE_SKIP_UNCHANGED': True,
+        # list pages fetched ahead concurrently, 1 follows the next page link only
+        'PAGINATION_WINDOW': 4,
+        'DOWNLOADER_MIDDLEWARES': {
+            'pagination.PageWindowMiddleware': 50,
+        },
+        # gzip jsonlines files per run, CSV on demand: python3 feeds.py data/learningdl/*.jsonl.gz
+        'FEEDS': feeds.jsonl_gz_feeds(),
+        'FEED_URI_PARAMS': 'feeds.uri_params',
+        # latency histograms, items/sec and drops by rule, rewritten every METRICS_INTERVAL seconds
+        'METRICS_FILE': 'data/metrics/%(name)s.prom',
+        'METRICS_INTERVAL': 60,
+        'EXTENSIONS': {
+            'metrics.CrawlMetrics': 500,
+        },
+        'SPIDER_MIDDLEWARES': {
+            'metrics.CallbackLatencyMiddleware': 1000,
+        },
     }
 
     def __init__(self, *args, **kwargs):
@@ -50,9 +74,25 @@ class LearningDLSpider(Spider):
         self.logger.setLevel('INFO')
         self.article = 0
         self.article_parsed = 0
+        self.already_seen_article = 0
         self.too_old_article = 0
         """ 10 articles/page """
         self.too_old_nb_limit = 20
+        self.seen_index = SeenIndex()
+        self.paginator = Paginator()
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super(LearningDLSpider, cls).from_crawler(crawler, *args, **kwargs)
+        spider.seen_index = SeenIndex(crawler.settings.get('SEEN_INDEX'))
+        crawler.signals.connect(spider.item_scraped, signal=signals.item_scraped)
+        crawler.signals.connect(spider.seen_index.close, signal=signals.spider_closed)
+        return spider
+
+    def item_scraped(self, item, response, spider):
+        """ posts are seen once they went through every pipeline, a dropped or failed post is fetched again """
+        if spider is self:
+            self.seen_index.add(item.id, item.url)
 
     def start_requests(self):
         pprint(self.settings.__dict__)
@@ -63,7 +103,15 @@ class LearningDLSpider(Spider):
     def parse(self, response):
         """  parse list of articles  """
         self.logger.debug("response.url : {}".format(response.url))
+        if 'not_modified' in response.flags and self.settings.getbool('HTTPCACHE_SKIP_UNCHANGED'):
+            self.logger.info("### List page not modified, skip: {}".format(response.url))
+            return
+        if self.paginator.cancelled(response):
+            return
+        crossed = False
         articles_xpath = '/html/body/div/div/div/main/article'
+        new_on_page = 0
+        seen_on_page = 0
         for article in response.xpath(articles_xpath):
             date = article.xpath('header/p/time/@datetime').extract_first()
             self.logger.debug("### ARTICLE DATE: {}".format(date))
@@ -77,17 +125,30 @@ class LearningDLSpider(Spider):
                 if article_link is None:
                     article_link = article.xpath('div[@class="entry-content"]/p/a[@class="more-link"]/@href').extract_first()
                 self.logger.debug("### ARTICLE LINK: {}".format(article_link))
+                post_id = article.xpath('@class').re_first(r'post-(\d+)')
+                if self.seen_index.seen(post_id, article_link):
+                    self.logger.debug("### ALREADY SEEN: {}".format(article_link))
+                    self.already_seen_article += 1
+                    seen_on_page += 1
+                    continue
                 self.article += 1
-                yield Request(article_link, callback=self.parse_item, meta={'article_date': date})
+                new_on_page += 1
+                yield Request(article_link, callback=self.parse_item, meta={'article_date': article_date})
             else:
+                crossed = True
                 self.too_old_article += 1
-                if self.too_old_article > self.too_old_nb_limit:
+                # a page window stops on its own at the first page crossing MAX_TIMEDELTA
+                if self.too_old_article > self.too_old_nb_limit and self.settings.getint('PAGINATION_WINDOW') <= 1:
                     raise CloseSpider('Too OLD Content, no need to check older post')
 
+        page_seen = bool(seen_on_page and not new_on_page)
+        if page_seen:
+            self.logger.info("### Whole page already seen, stop paginating: {}".format(response.url))
+
         next_page = response.xpath('//li[@class="pagination-next"]/a/@href').extract_first()
         self.logger.debug("### NEXT_PAGE URLs: {}".format(next_page))
-        if next_page is not None:
-            yield Request(next_page, callback=self.parse)
+        yield from self.paginator.follow(response, next_page, self.parse, self.settings.getint('PAGINATION_WINDOW'),
+                                         crossed=crossed, stop=page_seen)
 
     @staticmethod
     def remove_bad_char(ss):
@@ -95,17 +156,13 @@ class LearningDLSpider(Spider):
 
     def parse_item(self, response):
         """   parse article """
+        fields = extract_article(response.selector.root)
+        if fields['title'] is not None:
+            fields['title'] = self.remove_bad_char(fields['title'])
         item = Article(
             url=response.request.url,
             date=response.meta['article_date'],
-            title=self.remove_bad_char(response.xpath('//article/header/h1/text()').extract_first()),
-            id=response.xpath('//article//@class').re_first(r'post-(\d+)'),
-            author=response.xpath('//span[@itemprop="author"]/a/span/text()').extract_first(),
-            lang=response.xpath('//article/div[@class="entry-content"]//text()').re_first(r'(.*) \| Size\: .+'),
-            size=response.xpath('//article/div[@class="entry-content"]//text()').re_first(r'.* \| Size\: (.+)'),
-            cat=response.xpath('//article/div[@class="entry-content"]//text()').re_first(r'(?:Genre|Category)\: (.+)'),
-            desc="".join(response.xpath('//div[@style="text-align:center;"]/following-sibling::*/text()').extract()),
-            links=response.xpath('//a[@class="autohyperlink"]/@href').extract()
+            **fields
         )
         # self.logger.debug("### ARTICLE Item: {}".format(item))
         # self.article_parsed += 1
@@ -133,45 +190,84 @@ class LearningDLSpider(Spider):
 #
 #         date_in = MapCompose(str.strip)
 #         url_out = Join()
-#
-# @dataclass
-# class Article(Item):
-#     url: Optional[str] = field(default=None)
-#     id: Optional[int] = field(default=None)
-#     title: Optional[str] = field(default=None)
-#     date: Optional[str] = field(default=None)
-#     author: Optional[str] = field(default=None)
-#     lang: Optional[str] = field(default=None)
-#     size: Optional[str] = field(default=None)
-#     cat: Optional[str] = field(default=None)
-#     desc: Optional[str] = field(default=None)
-#     links: Optional[str] = field(default=None)
-
-
-class Article(Item):
-    url = Field()
-    id = Field()
-    title = Field()
-    date = Field()
-    author = Field()
-    lang = Field()
-    size = Field()
-    cat = Field()
-    desc = Field()
-    links = Field()
-
-
-class RapidgatorPipeline:
-    """ remove all not rapidgator links """
-    DOMAIN = "rapidgator.net"
 
-    def process_item(self, item, spider):
-        adapter = ItemAdapter(item)
-        if adapter.get('links'):
-            adapter['links'] = list(filter(lambda x: self.DOMAIN in x, adapter['links']))
-            return item
-        else:
-            raise DropItem("Missing rapidgator link %s" % item)
+
+ARTICLE_XPATH = etree.XPath('(//article)[1]')
+TITLE_XPATH = etree.XPath('header/h1/text()')
+AUTHOR_XPATH = etree.XPath('.//span[@itemprop="author"]/a/span/text()')
+CLASS_XPATH = etree.XPath('.//@class')
+ENTRY_XPATH = etree.XPath('div[@class="entry-content"]')
+DESC_ANCHOR_XPATH = etree.XPath('.//div[@style="text-align:center;"]')
+# text nodes and link hrefs of entry-content, in document order
+ENTRY_WALK_XPATH = etree.XPath('.//text() | .//a[@class="autohyperlink"]/@href')
+POST_ID_RE = re.compile(r'post-(\d+)')
+LANG_SIZE_RE = re.compile(r'(.*) \| Size\: (.+)')
+CAT_RE = re.compile(r'(?:Genre|Category)\: (.+)')
+
+
+def extract_article(root):
+    """ extract article fields, walking the entry-content node only once """
+    fields = dict(title=None, id=None, author=None, lang=None, size=None, cat=None, desc="", links=())
+    article = next(iter(ARTICLE_XPATH(root)), None)
+    if article is None:
+        return fields
+    fields['title'] = next(iter(TITLE_XPATH(article)), None)
+    fields['author'] = next(iter(AUTHOR_XPATH(article)), None)
+    m = POST_ID_RE.search(article.get('class', ''))
+    if m is None:
+        m = next(filter(None, map(POST_ID_RE.search, CLASS_XPATH(article))), None)
+    fields['id'] = m and m.group(1)
+
+    entry = next(iter(ENTRY_XPATH(article)), None)
+    if entry is None:
+        return fields
+    desc_parents = {sibling for anchor in DESC_ANCHOR_XPATH(article) for sibling in anchor.itersiblings()}
+    desc = []
+    links = []
+    for node in ENTRY_WALK_XPATH(entry):
+        if node.is_attribute:
+            links.append(str(node))
+            continue
+        parent = node.getparent()
+        if node.is_tail:
+            parent = parent.getparent()
+        if parent in desc_parents:
+            desc.append(str(node))
+        if fields['lang'] is None:
+            m = LANG_SIZE_RE.search(node)
+            if m is not None:
+                fields['lang'] = m.group(1)
+                fields['size'] = size_to_bytes(m.group(2))
+        if fields['cat'] is None:
+            m = CAT_RE.search(node)
+            if m is not None:
+                fields['cat'] = m.group(1)
+    fields['desc'] = "".join(desc)
+    fields['links'] = tuple(links)
+    return fields
+
+
+class SeenIndex:
+    """ on-disk index of scraped posts, keyed on post id and url """
+
+    def __init__(self, path=None):
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = dbm.open(str(path), 'c') if path else {}
+
+    def seen(self, post_id, url):
+        return (post_id is not None and 'id:{}'.format(post_id) in self._db) \
+            or (url is not None and 'url:{}'.format(url) in self._db)
+
+    def add(self, post_id, url):
+        if post_id is not None:
+            self._db['id:{}'.format(post_id)] = url or ''
+        if url is not None:
+            self._db['url:{}'.format(url)] = post_id or ''
+
+    def close(self):
+        if hasattr(self._db, 'close'):
+            self._db.close()
 
 
 class UdemyBlackListPipeline:
@@ -179,28 +275,10 @@ class UdemyBlackListPipeline:
     BLACKLIST = "UDEMY"
 
     def process_item(self, item, spider):
-        adapter = ItemAdapter(item)
-        if adapter.get('title'):
-            if self.BLACKLIST.upper() in adapter['title'].upper():
-                spider.logger.debug("### Ignoring Udemy Tutoial: {}".format(item))
-                raise DropItem("Ignoring {} Tutorial: \t {}".format(self.BLACKLIST, item['title']))
-            else:
-                return item
-
-
-class PoliteLogFormatter(logformatter.LogFormatter):
-    def dropped(self, item, exception, response, spider):
-        return {
-            # 'level': logging.DEBUG,
-            # 'msg': logformatter.DROPPEDMSG,
-            'level': logging.INFO,
-            'msg': "Dropped: {} :".format(exception),
-            'exception': exception,
-            'args': {
-                'exception': exception,
-                'item': item,
-            }
-        }
+        if item.title and self.BLACKLIST.upper() in item.title.upper():
+            spider.logger.debug("### Ignoring Udemy Tutoial: {}".format(item))
+            raise RuleDropItem("Ignoring {} Tutorial: \t {}".format(self.BLACKLIST, item.title), self, self.BLACKLIST)
+        return item
 
 
 if __name__ == "__main__":
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+""" crawl metrics: callback and download latency histograms, item rates, drops by pipeline and rule
+
+Written to METRICS_FILE at the end of the crawl and every METRICS_INTERVAL seconds while it runs,
+as a Prometheus textfile when the name ends in .prom, as JSON otherwise.
+"""
+from bisect import bisect_left
+from collections import defaultdict
+from pathlib import Path
+import json
+import os
+import time
+import weakref
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.httpobj import urlparse_cached
+from twisted.internet import task
+
+# seconds, upper bounds of the histogram buckets, +Inf is implicit
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# spider attributes exported as counters when present
+SPIDER_COUNTERS = ('article', 'article_parsed', 'already_seen_article', 'too_old_article')
+
+
+class Histogram:
+    """ cumulative on export, one count per bucket while observing """
+
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def buckets(self):
+        """ (upper bound, cumulative count), '+Inf' last """
+        total = 0
+        for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), self.counts):
+            total += count
+            yield bound, total
+
+    def to_dict(self):
+        return {'count': self.count, 'sum': round(self.sum, 6),
+                'buckets': {str(bound): count for bound, count in self.buckets()}}
+
+
+def _labels(**labels):
+    return ",".join('{}="{}"'.format(k, str(v).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n'))
+                    for k, v in labels.items())
+
+
+class CrawlMetrics:
+    """ extension collecting the metrics of one crawler, shared with CallbackLatencyMiddleware """
+    _crawlers = weakref.WeakKeyDictionary()
+
+    def __init__(self, path, interval=60.0):
+        self.path = path
+        self.interval = interval
+        self.spider = None
+        self.started = None
+        self.callbacks = defaultdict(Histogram)
+        self.downloads = defaultdict(Histogram)
+        self.scraped = 0
+        self.dropped = defaultdict(int)
+        self.last_write = None
+        self.task = None
+
+    @classmethod
+    def for_crawler(cls, crawler):
+        """ one instance per crawler, whichever component asks first creates it """
+        metrics = cls._crawlers.get(crawler)
+        if metrics is None:
+            path = crawler.settings.get('METRICS_FILE')
+            if not path:
+                raise NotConfigured("METRICS_FILE is not set")
+            metrics = cls._crawlers[crawler] = cls(path, crawler.settings.getfloat('METRICS_INTERVAL', 60.0))
+        return metrics
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        metrics = cls.for_crawler(crawler)
+        crawler.signals.connect(metrics.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(metrics.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(metrics.response_received, signal=signals.response_received)
+        crawler.signals.connect(metrics.item_scraped, signal=signals.item_scraped)
+        crawler.signals.connect(metrics.item_dropped, signal=signals.item_dropped)
+        return metrics
+
+    def spider_opened(self, spider):
+        self.spider = spider
+        self.path = Path(self.path % {'name': spider.name})
+        self.started = self.last_write = (time.monotonic(), 0)
+        if self.interval > 0:
+            self.task = task.LoopingCall(self.write)
+            self.task.start(self.interval, now=False)
+
+    def spider_closed(self, spider, reason):
+        if self.task is not None and self.task.running:
+            self.task.stop()
+        self.write()
+
+    def response_received(self, response, request, spider):
+        latency = request.meta.get('download_latency')
+        # cached responses never reach the downloader
+        if latency is not None:
+            self.downloads[urlparse_cached(request).hostname].observe(latency)
+
+    def item_scraped(self, item, response, spider):
+        self.scraped += 1
+
+    def item_dropped(self, item, response, exception, spider):
+        pipeline = getattr(exception, 'pipeline', 'unknown')
+        rule = getattr(exception, 'rule', type(exception).__name__)
+        self.dropped[pipeline, rule] += 1
+
+    def observe_callback(self, name, seconds):
+        self.callbacks[name].observe(seconds)
+
+    def snapshot(self):
+        """ metrics as plain data, items/sec over the whole crawl and since the previous write """
+        now = time.monotonic()
+        elapsed = now - self.started[0]
+        interval = now - self.last_write[0]
+        recent = (self.scraped - self.last_write[1]) / interval if interval > 0 else 0.0
+        self.last_write = (now, self.scraped)
+        counters = {name: getattr(self.spider, name) for name in SPIDER_COUNTERS
+                    if isinstance(getattr(self.spider, name, None), int)}
+        return {
+            'spider': self.spider.name,
+            'elapsed_s': round(elapsed, 3),
+            'items_scraped': self.scraped,
+            'items_per_s': round(self.scraped / elapsed, 3) if elapsed > 0 else 0.0,
+            'items_per_s_recent': round(recent, 3),
+            'dropped': [{'pipeline': pipeline, 'rule': rule, 'count': count}
+                        for (pipeline, rule), count in sorted(self.dropped.items())],
+            'callbacks': {name: h.to_dict() for name, h in sorted(self.callbacks.items())},
+            'downloads': {domain: h.to_dict() for domain, h in sorted(self.downloads.items())},
+            'spider_counters': counters,
+        }
+
+    def prometheus(self, snap):
+        spider = snap['spider']
+        lines = []
+
+        def histogram(metric, doc, label, histograms):
+            lines.extend(("# HELP {} {}".format(metric, doc), "# TYPE {} histogram".format(metric)))
+            for key, h in sorted(histograms.items()):
+                labels = _labels(spider=spider, **{label: key})
+                for bound, count in h.buckets():
+                    lines.append('{}_bucket{{{},le="{}"}} {}'.format(metric, labels, bound, count))
+                lines.append('{}_sum{{{}}} {:.6f}'.format(metric, labels, h.sum))
+                lines.append('{}_count{{{}}} {}'.format(metric, labels, h.count))
+
+        def sample(metric, kind, doc, values):
+            lines.extend(("# HELP {} {}".format(metric, doc), "# TYPE {} {}".format(metric, kind)))
+            lines.extend('{}{{{}}} {}'.format(metric, _labels(**labels), value) for labels, value in values)
+
+        histogram('tutodl_callback_seconds', "time spent in spider callbacks", 'callback', self.callbacks)
+        histogram('tutodl_download_seconds', "download latency by domain", 'domain', self.downloads)
+        sample('tutodl_items_scraped_total', 'counter', "items exported", [({'spider': spider}, self.scraped)])
+        sample('tutodl_items_per_second', 'gauge', "items exported per second since the crawl started",
+               [({'spider': spider}, snap['items_per_s'])])
+        sample('tutodl_items_dropped_total', 'counter', "items dropped by pipeline and rule",
+               [({'spider': spider, 'pipeline': d['pipeline'], 'rule': d['rule']}, d['count'])
+                for d in snap['dropped']])
+        sample('tutodl_spider_counter', 'gauge', "spider article counters",
+               [({'spider': spider, 'counter': name}, value) for name, value in snap['spider_counters'].items()])
+        return "\n".join(lines) + "\n"
+
+    def write(self):
+        """ replace the metrics file atomically, a textfile collector never reads half of it """
+        snap = self.snapshot()
+        text = self.prometheus(snap) if self.path.suffix == '.prom' else json.dumps(snap, indent=2)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + '.tmp')
+        tmp.write_text(text)
+        os.replace(tmp, self.path)
+
+
+class CallbackLatencyMiddleware:
+    """ spider middleware timing each callback, keep it the closest to the spider """
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(CrawlMetrics.for_crawler(crawler))
+
+    @staticmethod
+    def _name(response):
+        return getattr(response.request.callback, '__name__', 'parse')
+
+    def process_spider_output(self, response, result, spider):
+        elapsed = 0.0
+        it = iter(result)
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    out = next(it)
+                except StopIteration:
+                    break
+                finally:
+                    elapsed += time.perf_counter() - start
+                yield out
+        finally:
+            # a callback raising is timed too
+            self.metrics.observe_callback(self._name(response), elapsed)
+
+    async def process_spider_output_async(self, response, result, spider):
+        elapsed = 0.0
+        it = result.__aiter__()
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    out = await it.__anext__()
+                except StopAsyncIteration:
+                    break
+                finally:
+                    elapsed += time.perf_counter() - start
+                yield out
+        finally:
+            # a callback raising is timed too
+            self.metrics.observe_callback(self._name(response), elapsed)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+import re
+
+from scrapy import Request
+from scrapy.exceptions import IgnoreRequest
+
+PAGE_PATTERNS = (
+    re.compile(r'/page/(\d+)'),
+    re.compile(r'[?&]paged=(\d+)'),
+)
+
+
+def _escape(s):
+    return s.replace('{', '{{').replace('}', '}}')
+
+
+def page_template(url):
+    """ 'https://x/page/3/' -> ('https://x/page/{}/', 3), (None, None) for unknown patterns """
+    for pattern in PAGE_PATTERNS:
+        m = pattern.search(url)
+        if m is not None:
+            head, tail = url[:m.start(1)], url[m.end(1):]
+            return _escape(head) + '{}' + _escape(tail), int(m.group(1))
+    return None, None
+
+
+class PageWindow:
+    """ pages of one listing requested ahead of the parsed ones """
+
+    def __init__(self, template, requested):
+        self.template = template
+        self.requested = requested
+        self.last = None
+
+    def advance(self, page, size):
+        if self.last is not None:
+            return range(0)
+        first = self.requested + 1
+        self.requested = max(self.requested, page + size)
+        return range(first, self.requested + 1)
+
+    def close(self, page):
+        self.last = page if self.last is None else min(self.last, page)
+
+    def cancelled(self, page):
+        return self.last is not None and page > self.last
+
+
+class Paginator:
+    """ follow the next page link, or predict the next `size` pages and fetch them concurrently """
+
+    def __init__(self):
+        self.windows = {}
+
+    def cancelled(self, request):
+        """ request/response of a window page lying past the cutoff page """
+        key = request.meta.get('page_window')
+        return key is not None and self.windows[key].cancelled(request.meta['page'])
+
+    def follow(self, response, next_page, callback, size=1, crossed=False, stop=False):
+        """ crossed: the page reached the cutoff date, stop: nothing more to fetch """
+        key = response.meta.get('page_window')
+        if key is None:
+            template, next_no = page_template(next_page) if next_page else (None, None)
+            if size <= 1 or template is None:
+                if next_page is not None and not stop:
+                    yield Request(next_page, callback=callback)
+                return
+            key = template
+            page = next_no - 1
+            self.windows.setdefault(key, PageWindow(template, page))
+        else:
+            page = response.meta['page']
+        window = self.windows[key]
+        if crossed or stop or next_page is None:
+            window.close(page)
+            return
+        for no in window.advance(page, size):
+            yield Request(window.template.format(no), callback=callback, meta={'page_window': key, 'page': no})
+
+
+class PageWindowMiddleware:
+    """ drop queued list pages once their window is cancelled """
+
+    def process_request(self, request, spider):
+        paginator = getattr(spider, 'paginator', None)
+        if paginator is not None and paginator.cancelled(request):
+            spider.crawler.stats.inc_value('pagination/cancelled')
+            raise IgnoreRequest("Page past the cutoff: {}".format(request.url))
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+""" scene release title -> structured fields, parsed once per title """
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional, Tuple
+import re
+
+RELEASE_CACHE_SIZE = 65536
+
+# provider prefixes known to the parser, callers add their own with parse_release(title, providers)
+PROVIDERS = frozenset({"A Cloud Guru", "Addison Wesley", "Ask Video", "Cbt Nuggets", "Cloud Academy", "Coursera", "CreativeLive",
+             "Cybrary", "Domestika", "Groove3", "INE", "Kelbyone", "Linkedin Learning", "Lynda", "Manning", "Masterclass",
+             "OReilly", "Packt", "Pluralsight", "Pluralsight com", "Producertech", "Sitepoint com", "Skillshare",
+             "StoneRivereLearning", "Udemy"})
+TAGS = {"TUTORiAL", "TUTORIAL", "ISO", "REPACK", "BOOKWARE", "PROPER", "RETAIL", "INTERNAL", "READNFO", "DOX",
+        "MULTILANGUAGE", "MULTILINGUAL", "HYBRID", "KEYGEN", "PATCH", "PDF", "EPUB", "WEBRIP", "1080P", "720P"}
+PLATFORMS = {"LINUX", "WIN", "WIN32", "WIN64", "X64", "X86", "MACOS", "MACOSX", "OSX", "IOS", "ANDROID", "UNIX"}
+
+VERSION_RE = re.compile(r'\bv\d+(?:[ ._]\d+)*\b', re.IGNORECASE)
+
+
+@dataclass(slots=True)
+class Release:
+    """ shared by the parse_release cache, never modified """
+    group: Optional[str] = None
+    # last word of the title, holds groups containing '-' like CSE-V
+    tail: Optional[str] = None
+    version: Optional[str] = None
+    platform: Optional[str] = None
+    tags: Tuple[str, ...] = ()
+    provider: Optional[str] = None
+
+
+@lru_cache(maxsize=64)
+def provider_regex(providers):
+    """ one compiled alternation per provider set, longest first """
+    alternation = "|".join(map(re.escape, sorted(providers, key=len, reverse=True)))
+    return re.compile(r'(?:{})\b'.format(alternation), re.IGNORECASE)
+
+
+@lru_cache(maxsize=RELEASE_CACHE_SIZE)
+def parse_release(title, providers=PROVIDERS):
+    """ 'Udemy Learn Django 2 v1 0 BOOKWARE-SOFTiMAGE' -> Release(group='SOFTiMAGE', provider='Udemy', ...)
+    providers is a frozenset, part of the cache key """
+    title = title.strip()
+    tail = title.rpartition(' ')[2] or None
+    head, sep, group = title.rpartition('-')
+    if not sep or not group or ' ' in group.strip():
+        head, group = title, None
+    else:
+        group = group.strip()
+    m = provider_regex(providers).match(title)
+    provider = m.group(0) if m else None
+    m = VERSION_RE.search(head)
+    version = m.group(0) if m else None
+    tags = []
+    platform = None
+    for word in head.replace('-', ' ').split():
+        upper = word.upper()
+        if upper in TAGS:
+            tags.append(word)
+        elif platform is None and upper in PLATFORMS:
+            platform = word
+    return Release(group=group, tail=tail, version=version, platform=platform, tags=tuple(tags), provider=provider)
+
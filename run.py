@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+""" run several spiders in one CrawlerProcess, each with its own politeness settings
+
+    python3 run.py [site ...] [-s NAME=VALUE] [--summary data/run_summary.json]
+
+Site settings are applied above the spider custom_settings, -s above both.
+One JSON summary covering every crawler is written when all of them are done.
+"""
+from datetime import datetime, timezone
+from pathlib import Path
+import argparse
+import json
+import sys
+
+from scrapy.crawler import Crawler, CrawlerProcess
+from scrapy.utils.misc import load_object
+
+USER_AGENT = 'Mozilla/4.0 (compatible; MSIE 7.0; Windows NT 5.1)'
+
+# spider class and per domain concurrency / delay / autothrottle, one crawler each
+SITES = {
+    'learningdl': ('learningdl.LearningDLSpider', {
+        'CONCURRENT_REQUESTS_PER_DOMAIN': 4,
+        'DOWNLOAD_DELAY': 0.5,
+        'AUTOTHROTTLE_ENABLED': True,
+        'AUTOTHROTTLE_START_DELAY': 0.5,
+        'AUTOTHROTTLE_MAX_DELAY': 10,
+        'AUTOTHROTTLE_TARGET_CONCURRENCY': 2.0,
+    }),
+    'scene_rls': ('scene_rls.SceneRlsSpider', {
+        'CONCURRENT_REQUESTS_PER_DOMAIN': 2,
+        'DOWNLOAD_DELAY': 1.0,
+        'AUTOTHROTTLE_ENABLED': True,
+        'AUTOTHROTTLE_START_DELAY': 1.0,
+        'AUTOTHROTTLE_MAX_DELAY': 30,
+        'AUTOTHROTTLE_TARGET_CONCURRENCY': 1.0,
+    }),
+}
+
+SUMMARY_STATS = ('finish_reason', 'elapsed_time_seconds', 'item_scraped_count', 'item_dropped_count',
+                 'downloader/request_count', 'response_received_count', 'httpcache/hit', 'log_count/ERROR')
+
+
+def site_crawler(process, site, overrides=None, init_reactor=False):
+    """ crawler for one site, site settings at 'cmdline' priority so they win over custom_settings """
+    spider_path, site_settings = SITES[site]
+    settings = process.settings.copy()
+    settings.setdict(site_settings, priority='cmdline')
+    settings.setdict(overrides or {}, priority='cmdline')
+    return Crawler(load_object(spider_path), settings, init_reactor=init_reactor)
+
+
+def summary(crawlers, started):
+    """ per crawler stats worth keeping, without the datetime values """
+    spiders = {}
+    for site, crawler in crawlers.items():
+        stats = crawler.stats.get_stats()
+        spiders[site] = {key: stats[key] for key in SUMMARY_STATS if key in stats}
+        spiders[site]['status'] = {key.rpartition('/')[2]: value for key, value in stats.items()
+                                   if key.startswith('downloader/response_status_count/')}
+    finished = datetime.now(timezone.utc)
+    return {
+        'started': started.isoformat(),
+        'finished': finished.isoformat(),
+        'elapsed_s': round((finished - started).total_seconds(), 3),
+        'spiders': spiders,
+    }
+
+
+def main(args):
+    started = datetime.now(timezone.utc)
+    process = CrawlerProcess({'USER_AGENT': USER_AGENT})
+    overrides = dict(kv.split('=', 1) for kv in args.set)
+    # the first crawler installs the reactor, like CrawlerProcess.crawl() does
+    crawlers = {site: site_crawler(process, site, overrides, init_reactor=not i)
+                for i, site in enumerate(dict.fromkeys(args.sites or SITES))}
+    for crawler in crawlers.values():
+        process.crawl(crawler)
+    # the script will block here until every crawl is finished
+    process.start()
+    report = summary(crawlers, started)
+    args.summary.parent.mkdir(parents=True, exist_ok=True)
+    args.summary.write_text(json.dumps(report, indent=2))
+    print(json.dumps(report, indent=2))
+    return 0 if all('finish_reason' in s for s in report['spiders'].values()) else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("sites", nargs='*', metavar='site',
+                        help="sites to crawl, all by default: {}".format(", ".join(SITES)))
+    parser.add_argument("-s", "--set", action='append', default=[], metavar='NAME=VALUE',
+                        help="setting override for every site, e.g. -s LOG_LEVEL=DEBUG")
+    parser.add_argument("--summary", type=Path, default=Path('data/run_summary.json'),
+                        help="combined run summary written at the end")
+    args = parser.parse_args()
+    unknown = set(args.sites) - set(SITES)
+    if unknown:
+        parser.error("unknown site: {}".format(", ".join(sorted(unknown))))
+    sys.exit(main(args))
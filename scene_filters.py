@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+""" scene release filter rules, matched on parsed release fields or one compiled regex per rule list
+
+scene_rules.json:
+    learning_platforms  drop, case-insensitive, whole words anywhere in the title, tried as a prefix first
+    keywords            drop, case-insensitive, anywhere in the title, a trailing space also matches its end
+    group_whitelist     keep, case-sensitive, equal to the release group, only skips group_blacklist
+    group_blacklist     drop, case-sensitive, equal to the release group or last word
+"""
+from pathlib import Path
+import json
+import logging
+import re
+import time
+
+from release_name import PROVIDERS, parse_release
+
+logger = logging.getLogger(__name__)
+
+RULES_FILE = Path(__file__).with_name('scene_rules.json')
+RULE_LISTS = ('learning_platforms', 'keywords', 'group_whitelist', 'group_blacklist')
+IGNORE_CASE = ('learning_platforms', 'keywords')
+
+
+class Matcher:
+    """ alternation of literal rules, longest first, reporting the rule that matched """
+
+    def __init__(self, rules, ignore_case=False):
+        self.ignore_case = ignore_case
+        self.rules = {}
+        for rule in rules:
+            self.rules.setdefault(rule.lower() if ignore_case else rule, rule)
+        if self.rules:
+            alternation = "|".join(map(re.escape, sorted(self.rules, key=len, reverse=True)))
+            flags = re.IGNORECASE if ignore_case else 0
+            self.regex = re.compile(alternation, flags)
+            self.prefix_regex = re.compile(r'(?:{})(?!\w)'.format(alternation), flags)
+            self.word_regex = re.compile(r'(?<!\w)(?:{})(?!\w)'.format(alternation), flags)
+        else:
+            self.regex = self.prefix_regex = self.word_regex = None
+
+    def exact(self, value):
+        """ rule equal to value or None """
+        if value is None:
+            return None
+        return self.rules.get(value.lower() if self.ignore_case else value)
+
+    def prefix(self, text):
+        """ rule text starts with, followed by a word boundary, or None """
+        if self.prefix_regex is None:
+            return None
+        m = self.prefix_regex.match(text.lstrip())
+        if m is None:
+            return None
+        return self.rules[m.group(0).lower() if self.ignore_case else m.group(0)]
+
+    def word(self, text):
+        """ rule found anywhere in text as whole words, or None """
+        if self.word_regex is None:
+            return None
+        m = self.word_regex.search(text)
+        if m is None:
+            return None
+        return self.rules[m.group(0).lower() if self.ignore_case else m.group(0)]
+
+    def search(self, text):
+        """ matched rule or None """
+        if self.regex is None:
+            return None
+        m = self.regex.search(text)
+        if m is None:
+            return None
+        return self.rules[m.group(0).lower() if self.ignore_case else m.group(0)]
+
+
+class RuleSet:
+    """ scene filter rules, reloaded when the rules file changes """
+    _loaded = {}
+
+    def __init__(self, path=RULES_FILE, reload_interval=30.0):
+        self.path = Path(path)
+        self.reload_interval = reload_interval
+        self.mtime = None
+        self.checked = 0.0
+        self.matchers = {}
+        self.providers = PROVIDERS
+        self.reload()
+
+    @classmethod
+    def load(cls, path=RULES_FILE, reload_interval=30.0):
+        """ one shared RuleSet per rules file """
+        path = Path(path).resolve()
+        if path not in cls._loaded:
+            cls._loaded[path] = cls(path, reload_interval)
+        return cls._loaded[path]
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls.load(settings.get('SCENE_RULES') or RULES_FILE,
+                        settings.getfloat('SCENE_RULES_RELOAD_INTERVAL', 30.0))
+
+    def reload(self):
+        mtime = self.path.stat().st_mtime
+        with self.path.open(encoding='utf8') as f:
+            rules = json.load(f)
+        self.matchers = {name: Matcher(rules.get(name, ()), name in IGNORE_CASE) for name in RULE_LISTS}
+        # the blacklisted platforms are provider prefixes too, for this rules file only
+        self.providers = PROVIDERS | frozenset(rules.get('learning_platforms', ()))
+        self.mtime = mtime
+        logger.info("Loaded scene rules {} ({})".format(
+            self.path, ", ".join("{} {}".format(len(m.rules), name) for name, m in self.matchers.items())))
+
+    def refresh(self):
+        """ reload the rules file if it changed, checked at most every reload_interval seconds """
+        now = time.monotonic()
+        if now - self.checked < self.reload_interval:
+            return
+        self.checked = now
+        try:
+            if self.path.stat().st_mtime != self.mtime:
+                self.reload()
+        except (OSError, ValueError) as e:
+            logger.error("Keeping previous scene rules, cannot reload {}: {}".format(self.path, e))
+
+    def release(self, title):
+        """ parsed title, with the learning platforms of these rules as provider prefixes """
+        self.refresh()
+        return parse_release(title, self.providers)
+
+    def learning_platform(self, title):
+        self.refresh()
+        platforms = self.matchers['learning_platforms']
+        return platforms.prefix(title) or platforms.word(title)
+
+    def keyword(self, title):
+        self.refresh()
+        return self.matchers['keywords'].search(title + ' ')
+
+    def banned_group(self, release):
+        """ blacklisted release group, unless the group is whitelisted """
+        self.refresh()
+        if self.matchers['group_whitelist'].exact(release.group):
+            return None
+        blacklist = self.matchers['group_blacklist']
+        return blacklist.exact(release.group) or blacklist.exact(release.tail)
+
+    def evaluate(self, title):
+        """ (list name, rule) dropping the title, in pipeline order, or None to keep it """
+        release = self.release(title)
+        for name, check, value in (('learning_platforms', self.learning_platform, title),
+                                   ('group_blacklist', self.banned_group, release),
+                                   ('keywords', self.keyword, title)):
+            rule = check(value)
+            if rule is not None:
+                return name, rule
+        return None
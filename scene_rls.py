@@ -1,12 +1,20 @@
 #!/usr/bin/env python3
-from scrapy import Spider, Request, Item, Field, logformatter
+from functools import lru_cache
+import re
+from lxml import etree
+from scrapy import Spider, Request
 from scrapy.crawler import CrawlerProcess
 # from scrapy.loader import ItemLoader
 from scrapy.exceptions import CloseSpider, DropItem
-from pathlib import Path
+from scrapy.utils.misc import load_object
 from datetime import datetime, timedelta
-from itemadapter import ItemAdapter
+from pathlib import Path
 from pprint import pprint
+import sys
+from common import Article, RuleDropItem, size_to_bytes
+from scene_filters import RuleSet, RULES_FILE
+from pagination import Paginator
+import feeds
 
 
 class SceneRlsSpider(Spider):
@@ -19,38 +27,63 @@ class SceneRlsSpider(Spider):
     allowed_domains = ["scene-rls.net"]
     custom_settings = {
         'ITEM_PIPELINES': {
+            'scene_rls.ReleaseNamePipeline': 5,
             'scene_rls.LearningPlatformBlackListPipeline': 10,
             'scene_rls.WarezGroupsFilterPipeline': 20,
             'scene_rls.KeyWordBlackListPipeline': 30,
-            'scene_rls.RapidgatorPipeline': 80
+            'dedupe.DuplicatesPipeline': 70,
+            'common.RapidgatorPipeline': 80,
+            'store.StorePipeline': 90,
         },
+        # searchable store of the kept items: python3 store.py query <words>
+        'STORE_PATH': 'data/items.sqlite',
+        # duplicates across spiders and runs, shared index file, '' to disable
+        'DEDUPE_INDEX': 'data/dedupe.sqlite',
+        'DEDUPE_RETENTION_DAYS': 365,
         'LOG_LEVEL': 'INFO',
-        'LOG_FORMATTER': 'learningdl.PoliteLogFormatter',
+        'LOG_FORMATTER': 'common.PoliteLogFormatter',
         'ROBOTSTXT_OBEY': False,
-        'FEEDS': {
-            'data_%(name)s_%(time)s_.json': {
-                'format': 'jsonlines',
-                'encoding': 'utf8',
-                'store_empty': False,
-                'fields': None,
-                'indent': 0,
-            },
-            Path('data_%(name)s_%(time)s_.csv'): {
-                'format': 'csv',
-                'fields': ["title", "links"],
-            },
-        }
+        # blacklist/whitelist rules, reloaded when the file changes
+        'SCENE_RULES': str(RULES_FILE),
+        'SCENE_RULES_RELOAD_INTERVAL': 30,
+        # conditional requests (ETag / Last-Modified) against a size-bounded cache
+        'HTTPCACHE_ENABLED': True,
+        'HTTPCACHE_DIR': 'data/httpcache',
+        'HTTPCACHE_POLICY': 'conditional_cache.RevalidatePolicy',
+        'HTTPCACHE_STORAGE': 'conditional_cache.BoundedFilesystemCacheStorage',
+        'HTTPCACHE_MAX_SIZE': 64 * 1024 * 1024,
+        'HTTPCACHE_SKIP_UNCHANGED': True,
+        # list pages fetched ahead concurrently, 1 follows the next page link only
+        'PAGINATION_WINDOW': 4,
+        'DOWNLOADER_MIDDLEWARES': {
+            'pagination.PageWindowMiddleware': 50,
+        },
+        # gzip jsonlines files per run, CSV on demand: python3 feeds.py data/scene_rls/*.jsonl.gz
+        'FEEDS': feeds.jsonl_gz_feeds(),
+        'FEED_URI_PARAMS': 'feeds.uri_params',
+        # latency histograms, items/sec and drops by rule, rewritten every METRICS_INTERVAL seconds
+        'METRICS_FILE': 'data/metrics/%(name)s.prom',
+        'METRICS_INTERVAL': 60,
+        'EXTENSIONS': {
+            'metrics.CrawlMetrics': 500,
+        },
+        'SPIDER_MIDDLEWARES': {
+            'metrics.CallbackLatencyMiddleware': 1000,
+        },
     }
 
     def __init__(self, *args, **kwargs):
         super(SceneRlsSpider, self).__init__(*args, **kwargs)
         self.__now = datetime.now()
+        # posts published before the cutoff are too old
+        self.cutoff = self.__now - self.MAX_TIMEDELTA
         self.logger.setLevel('INFO')
         # self.logger.setLevel('DEBUG')
         self.article = 0
         self.too_old_article = 0
         # 10 articles/page
         self.too_old_nb_limit = 20
+        self.paginator = Paginator()
 
     def start_requests(self):
         pprint(self.settings.__dict__)
@@ -61,173 +94,233 @@ class SceneRlsSpider(Spider):
     def parse(self, response):
         """ parse articles """
         self.logger.debug("response.url : {}".format(response.url))
-        for article in response.xpath('//div[@class="post"]'):
-            tmp_date = article.xpath('div[@class="postContent"]/p[@style="text-align: center;"]//text()').re_first(r'Published on: (.+)')
-            article_date = datetime.strptime(tmp_date, '%b %d, %Y @ %H:%M')
-            delta = self.__now - article_date
-            self.logger.debug("### ARTICLE DELTA TIME: {}".format(delta))
-            if delta <= self.MAX_TIMEDELTA:
-                item = Article()
-                item['url'] = article.xpath('div[@class="postHeader"]/h2[@class="postTitle"]/a/@href').extract_first()
-                item['id'] = response.xpath('//article//@class').re_first(r'post-(\d+)')
-                item['title'] = article.xpath('div[@class="postHeader"]/h2[@class="postTitle"]/a/text()').extract_first()
-                item['cat'] = response.xpath('div[@class="postHeader"]/div[class="postSubTitle"]/span[@class="postCategories"]/a/@rel').extract_first()
-                item['size'] = article.xpath('div[@class="postContent"]/p[@style="text-align: center;"]//text()').re_first(r'([\.\d]+ \wB)')
-                item['date'] = article_date
-                item['links'] = article.xpath('div[@class="postContent"]/h2[@style="text-align: center;"]//a/@href').extract()
-                item['tags'] = article.xpath('div[@class="postFooter"]/span[@class="postTags"]//a/text()').extract()
-                # self.logger.info("### ARTICLE LINK: {}".format(item['title']))
-                self.logger.debug("### ARTICLE LINK: {}".format(item))
-                self.article += 1
-                yield item
-            else:
-                self.too_old_article += 1
-                if self.too_old_article > self.too_old_nb_limit:
-                    raise CloseSpider('Too OLD Content, no need too check older post')
-
-        next_page = response.xpath('//span[@id="olderEntries"]/a/@href').extract_first()
+        if 'not_modified' in response.flags and self.settings.getbool('HTTPCACHE_SKIP_UNCHANGED'):
+            self.logger.info("### List page not modified, skip: {}".format(response.url))
+            return
+        if self.paginator.cancelled(response):
+            return
+        root = response.selector.root
+        posts = POST_XPATH(root)
+        crossed = False
+        for i, post in enumerate(posts):
+            info = INFO_TEXT_XPATH(post)
+            article_date = published_date(info)
+            if article_date is None:
+                self.logger.warning("### No publication date, skip post {} of {}".format(i, response.url))
+                continue
+            if article_date < self.cutoff:
+                # posts are listed newest first, the rest of the page is older still
+                crossed = True
+                self.too_old_article += len(posts) - i
+                break
+            item = Article(date=article_date, **extract_post(post, info))
+            self.logger.debug("### ARTICLE LINK: %s", item)
+            self.article += 1
+            yield item
+        # a page window stops on its own at the first page crossing MAX_TIMEDELTA
+        if self.too_old_article > self.too_old_nb_limit and self.settings.getint('PAGINATION_WINDOW') <= 1:
+            raise CloseSpider('Too OLD Content, no need too check older post')
+
+        next_page = next(iter(NEXT_PAGE_XPATH(root)), None)
         self.logger.debug("### NEXT_PAGE URLs: {}".format(next_page))
-        if next_page is not None:
-            yield Request(next_page, callback=self.parse)
+        yield from self.paginator.follow(response, next_page, self.parse, self.settings.getint('PAGINATION_WINDOW'),
+                                         crossed=crossed)
+
+
+# compiled once, evaluated on the lxml tree of the list page and on each div.post
+POST_XPATH = etree.XPath('//div[@class="post"]')
+TITLE_LINK_XPATH = etree.XPath('div[@class="postHeader"]/h2[@class="postTitle"]/a')
+CAT_XPATH = etree.XPath(
+    'div[@class="postHeader"]/div[@class="postSubTitle"]/span[@class="postCategories"]/a/text()', smart_strings=False)
+# publication date and size
+INFO_TEXT_XPATH = etree.XPath('div[@class="postContent"]/p[@style="text-align: center;"]//text()', smart_strings=False)
+LINKS_XPATH = etree.XPath('div[@class="postContent"]/h2[@style="text-align: center;"]//a/@href', smart_strings=False)
+TAGS_XPATH = etree.XPath('div[@class="postFooter"]/span[@class="postTags"]//a/text()', smart_strings=False)
+NEXT_PAGE_XPATH = etree.XPath('//span[@id="olderEntries"]/a/@href', smart_strings=False)
+POST_ID_RE = re.compile(r'\bpost-(\d+)\b')
+# wordpress permalink, ?p=123 or .../123/
+PERMALINK_ID_RE = re.compile(r'[?&]p=(\d+)|/(\d+)/?$')
+PUBLISHED_RE = re.compile(r'Published on: (\w{3}) (\d{1,2}), (\d{4}) @ (\d{1,2}):(\d{2})')
+SIZE_RE = re.compile(r'([\.\d]+ \wB)')
+MONTHS = {m: i for i, m in enumerate(('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+                                      'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'), 1)}
+
+
+def post_id(post, url):
+    """ id of one div.post: its post-123 id or class, else the number of its permalink, None when missing """
+    m = POST_ID_RE.search(' '.join((post.get('id', ''), post.get('class', ''))))
+    if m is not None:
+        return m.group(1)
+    m = PERMALINK_ID_RE.search(url or '')
+    return m and (m.group(1) or m.group(2))
+
+
+@lru_cache(maxsize=4096)
+def _published(month, day, year, hour, minute):
+    return datetime(int(year), MONTHS[month], int(day), int(hour), int(minute))
+
+
+def published_date(info):
+    """ 'Published on: Oct 18, 2026 @ 12:05' text node -> datetime, None when missing """
+    for text in info:
+        m = PUBLISHED_RE.search(text)
+        if m is not None:
+            try:
+                return _published(*m.groups())
+            except (KeyError, ValueError):
+                return None
+    return None
+
+
+def extract_post(post, info):
+    """ fields of one div.post, each of its parts queried once """
+    link = next(iter(TITLE_LINK_XPATH(post)), None)
+    size = next(filter(None, map(SIZE_RE.search, info)), None)
+    url = link.get('href') if link is not None else None
+    return dict(
+        id=post_id(post, url),
+        url=url,
+        title=link.text if link is not None else None,
+        cat=next(iter(CAT_XPATH(post)), None),
+        size=size_to_bytes(size.group(1)) if size is not None else None,
+        links=tuple(LINKS_XPATH(post)),
+        tags=tuple(TAGS_XPATH(post)),
+    )
+
 
+class RulesPipeline:
+    """ base for the pipelines filtering on scene_rules.json """
 
-class Article(Item):
-    url = Field()
-    id = Field()
-    title = Field()
-    date = Field()
-    author = Field()
-    lang = Field()
-    size = Field()
-    cat = Field()
-    desc = Field()
-    tags = Field()
-    links = Field()
+    def __init__(self, rules=None):
+        self.rules = rules or RuleSet.load()
 
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(RuleSet.from_settings(crawler.settings))
 
-class RapidgatorPipeline:
-    """ remove all not rapidgator links """
-    DOMAIN = "rapidgator.net"
+
+class ReleaseNamePipeline(RulesPipeline):
+    """ attach the parsed release name, later pipelines match on its fields """
 
     def process_item(self, item, spider):
-        adapter = ItemAdapter(item)
-        if adapter.get('links'):
-            adapter['links'] = list(filter(lambda x: self.DOMAIN in x, adapter['links']))
-            spider.logger.info("{}\t{}".format(self.DOMAIN, adapter['title']))
-            return item
-        else:
-            raise DropItem("Missing rapidgator link {}".format(item))
+        if item.title:
+            item.release = self.rules.release(item.title)
+        return item
 
 
-class LearningPlatformBlackListPipeline:
-    """ remove remove tutorial from learning platform or that contains badkeyword """
-    blacklist_learning_platform = ["Kelbyone", "Groove3", "Producertech", "CreativeLive", "Ask Video", "Udemy"]
+class LearningPlatformBlackListPipeline(RulesPipeline):
+    """ remove tutorial from learning platform """
 
     def process_item(self, item, spider):
-        adapter = ItemAdapter(item)
-        if adapter.get('title'):
-            for blacklistLearnPlatform in self.blacklist_learning_platform:
-                if blacklistLearnPlatform.upper() in adapter['title'].upper():
-                    raise DropItem("Ignoring {} Tutorial: \t{}".format(blacklistLearnPlatform, item['title']))
-            return item
+        if item.title:
+            platform = self.rules.learning_platform(item.title)
+            if platform is not None:
+                raise RuleDropItem("Ignoring {} Tutorial: \t{}".format(platform, item.title), self, platform)
+        return item
 
 
-class KeyWordBlackListPipeline:
-    """ remove remove tutorial from learning platform or that contains badkeyword """
-    blacklist_keyword = ["keygen", "KeyMaker", "Incl Cracked", "Incl Keygen", "incl Patch", "registration code", "MULTILANGUAGE", "-ROBOTS", "-TRUMP", "StarryNight", "WAV-EXPANSION ", "ISO-SOFTiMAGE", "-DawgFather"]
+class KeyWordBlackListPipeline(RulesPipeline):
+    """ remove tutorial that contains badkeyword """
 
     def process_item(self, item, spider):
-        adapter = ItemAdapter(item)
-        if adapter.get('title'):
-            for keyword in self.blacklist_keyword:
-                if keyword.upper() in adapter['title'].upper():
-                    raise DropItem("Ignoring {} keyword: \t{}".format(keyword, item['title']))
-            return item
+        if item.title:
+            keyword = self.rules.keyword(item.title)
+            if keyword is not None:
+                raise RuleDropItem("Ignoring {} keyword: \t{}".format(keyword, item.title), self, keyword)
+        return item
 
 
-class WarezGroupsFilterPipeline:
+class WarezGroupsFilterPipeline(RulesPipeline):
     """ remove tutorial from certain warez groups """
-    whitelst_wrz_grps = ["ADSR", "APoLLo", "BiFiSO", "BooKWoRM", "CONSORTiUM", "ELOHiM", "EXPANSION", "iLST", "iNKiSO", "JGTiSO", "KNiSO", "LiBRiCiDE", "NOLEDGE", "QUASAR", "REBAR", "RiDWARE", "RPBISO", "SKiLLUP", "SOFTiMAGE", "SoSISO" "STM", "TUTOR", "ViGOROUS", "XCODE", "XQZT", "ZH"]
-    blklst_wrz_grps = ["3ARLY", "6581", "ACTiVATED", "ALiAS", "AMPED", "APEX", "B4tman", "BLiZZARD", "BRD", "CaviaR", "CiO", "CLASS", "CLC", "CODEX", "Cracked", "CRD", "CSE-V", "CYGiSO", "CYGNUS", "Darbujan", "DARKSiDERS", "DARKZER0", "DELiGHT", "DEViANCE", "DINOByTES", "DVN", "DVT", "ENGiNE", "EViLiSO", "EXPANSION", "F4CG", "FAiRLiGHT", "FALLEN", "FFF", "HOODLUM", "HR", "iNCiDENT", "iND", "LAXiTY", "LiGHTFORCE", "LND", "MAGNiTUDE", "MASCHiNE", "MAZE", "Mephisto", "NAViGON", "NGEN", "Orion", "OUTLAWS", "PARADOX", "PH", "Playable", "PLAZA", "QUARTEX", "R2R", "Ratiborus", "RAZOR", "Razor1911", "RELOADED", "rG", "rGPDA", "RINDVIEH", "RiTUEL", "RoZ", "SiMPLEX", "SKIDROW", "SOFTiMAGE", "SoSISO", "SSM", "SUXXORS", "TiNYiSO", "Unleashed", "V.R", "VACE", "VENOM", "ViTALiTY", "WEB0DAY", "WEBiSO", "WiiERD", "XFORCE"]
 
     def process_item(self, item, spider):
-        adapter = ItemAdapter(item)
-        if adapter.get('title'):
-            # warezFroup_regex = "^.+-(.*)$"
-            tt = adapter['title'].split('-')[-1].strip()
-            for wrzGrp_allow in self.whitelst_wrz_grps:
-                if wrzGrp_allow in tt:
-                    return item
-            for wrzGrp_ban in self.blklst_wrz_grps:
-                # if wrzGrp_ban in tt and wrzGrp_ban in adapter['title']:
-                if wrzGrp_ban in adapter['title']:
-                    spider.logger.debug("### Ignoring {} Tutoial: \t{}".format(wrzGrp_ban, item))
-                    raise DropItem("Ignoring {} Tutorial: \t{}".format(wrzGrp_ban, item['title']))
-            return item
-
-
-class PoliteLogFormatter(logformatter.LogFormatter):
-    def dropped(self, item, exception, response, spider):
-        return {
-            # 'level': logging.DEBUG,
-            # 'msg': logformatter.DROPPEDMSG,
-            'level': logging.INFO,
-            'msg': "Dropped: {} :".format(exception),
-            'exception': exception,
-            'args': {
-                'exception': exception,
-                'item': item,
-            }
-        }
-
-
-def test():
-    s = [
-        ("A Cloud Guru Kubernetes Fundamentals-SKiLLUP", True),
-        ("A Short Hike v1 7 7 Linux-rG", False),
-        ("Addison Wesley Professional Continuous Encryption on AWS The DevSecOps on AWS Series REPACK-XCODE", True),
-        ("Ask Video Arturia V 103 The Buchla Easel V Explored TUTORiAL-ADSR", True),
-        ("Ask Video Behringer 101 DeepMind 12 Explained and Explored TUTORiAL-ADSR", True),
-        ("CLOUD ACADEMY ALIBABA FUNDAMENTALS ELASTIC COMPUTE SERVICE ECS-STM", True),
-        ("CLOUD ACADEMY CLASSES-STM", True),
-        ("Combit Relationship Manager v10 0 Enterprise MULTILANGUAGE-CYGNUS", False),
-        ("CreativeLive Sony A9 Fast Start TUTORIAL-SoSISO", True),
-        ("Daz3D Sci-fi Police Officer Textures for Genesis 8 Males ISO-SOFTiMAGE", False),
-        ("GRAPHISOFT ARCHICAD V24 3008 INT-ENGiNE", False),
-        ("Gumroad HDR Caustics ISO-SOFTiMAGE", False),
-        ("Head First PMP: A Learners Companion to Passing the Project Management Professional Exam 4th Edition PDF", True),
-        ("INE CCIE Service Provider v5 Exam Review-iLST", True),
-        ("Kaizen Software Asset Manager 2019 Enterprise Edition v3 1 1003 0 Incl Keygen-AMPED", False),
-        ("Kelbyone Using Light to Bring Emotion into Your Images-BooKWoRM", True),
-        ("Launcher v4 0 Multilanguage-LAXiTY", False),
-        ("Linkedin Learning PHP for WordPress Online Class-ZH", True),
-        ("MASTERCLASS – Brandon McMillan Teaches Dog Training 1080p WebRip 10Bit H265-DawgFather", True),
-        ("McAfee Client Proxy v3 10 16TH BIRTHDAY-DVT", False),
-        ("Pluralsight com Building APEX Applications with Different Data Formats-ELOHiM", True),
-        ("Pluralsight com Getting Started with Software Development Using Cisco DevNet 2020-ELOHiM", True),
-        ("Pluralsight Play By Play Everything You Always Wanted To Know About Salesforce Logs But Were Afraid To Ask-REBAR", True),
-        ("PortSwigger Burp Suite Professional v2020 7-WEB0DAY", False),
-        ("Serato DJ Pro Suite v2 3 8 CSE-V", False),
-        ("Sitepoint com Learn Database and Security Techniques with PHP-iNKiSO", True),
-        ("Sitepoint com Learn the Principles of Object-Oriented Programming in PHP-iNKiSO", True),
-        ("Sitepoint com PHP and MySQL Programming Principles-iNKiSO", True),
-        ("Skillshare How to use Ansible to automate deployment of ELK stack 7 x-XCODE", True),
-        ("Skillshare NLP Master Guide To Achieving Extraordinary Results-ViGOROUS", True),
-        ("Skillshare Zend Framework 3 for beginners Learn to master the PHP framework ZF3 to make web applications-XCODE", True),
-        ("Soundbox Jackin House and Tech WAV-EXPANSION", False),
-        ("StoneRivereLearning DevOps Fundamentals Gain Solid Understanding-CONSORTiUM", True),
-        ("StudiolinkedVST Mediocre Kit Drum Pro Expansion-6581", False),
-        ("Tornado Driver-DARKZER0", False),
-        ("Udemy Learn Django 2 for Beginners BOOKWARE-SOFTiMAGE", True),
-        ("WinImage Pro v10 0 Win64 Incl Keygen-FALLEN", False)
-        ]
-
-    a = WarezGroupsFilterPipeline()
-    for line in iter(s.splitlines()):
-        print(a.process_item({'title': line}))
+        if item.title:
+            group = self.rules.banned_group(item.release or self.rules.release(item.title))
+            if group is not None:
+                spider.logger.debug("### Ignoring {} Tutoial: \t{}".format(group, item))
+                raise RuleDropItem("Ignoring {} Tutorial: \t{}".format(group, item.title), self, group)
+        return item
+
+
+GOLDEN_TITLES = Path(__file__).resolve().parent / 'benchmarks' / 'fixtures' / 'scene_titles_golden.tsv'
+GOLDEN_DIVERGENCES = GOLDEN_TITLES.with_name('scene_titles_divergences.tsv')
+
+
+def load_golden(path=GOLDEN_TITLES):
+    """ (title, keep, rule list, rule) rows of the golden corpus """
+    with open(path, encoding='utf8') as f:
+        for line in f:
+            if line.startswith('#') or not line.strip():
+                continue
+            decision, rule_list, rule, title = line.rstrip('\n').split('\t')
+            yield title, decision == 'keep', rule_list or None, rule or None
+
+
+def load_divergences(path=GOLDEN_DIVERGENCES):
+    """ {title: reason} of the golden titles the chain knowingly decides against their label """
+    with open(path, encoding='utf8') as f:
+        return dict(line.rstrip('\n').split('\t') for line in f if line.strip() and not line.startswith('#'))
+
+
+def pipeline_chain(skip=('dedupe.DuplicatesPipeline', 'store.StorePipeline')):
+    """ scene_rls item pipelines in ITEM_PIPELINES order, without the ones keeping state across runs """
+    pipelines = sorted(SceneRlsSpider.custom_settings['ITEM_PIPELINES'].items(), key=lambda kv: kv[1])
+    return [load_object(path)() for path, _ in pipelines if path not in skip]
+
+
+def run_chain(chain, item, spider):
+    """ True when the item goes through every pipeline """
+    try:
+        for pipeline in chain:
+            item = pipeline.process_item(item, spider)
+    except DropItem:
+        return False
+    return True
+
+
+def check_golden(path=GOLDEN_TITLES, divergences=GOLDEN_DIVERGENCES):
+    """ run every golden title through the pipeline chain
+    -> (title, expected, got, known divergence reason or None) of the titles not decided as labelled,
+    got is None for a known divergence decided as labelled again """
+    rules = RuleSet.load()
+    chain = pipeline_chain()
+    spider = SceneRlsSpider()
+    known = load_divergences(divergences)
+    for title, keep, rule_list, rule in load_golden(path):
+        item = Article(title=title, links=('https://rapidgator.net/file/golden',))
+        kept = run_chain(chain, item, spider)
+        dropped_by = rules.evaluate(title)
+        expected = "{} {}".format('keep' if keep else 'drop', rule or '').rstrip()
+        if kept == keep and (keep or dropped_by == (rule_list, rule)):
+            if title in known:
+                yield title, expected, None, known[title]
+            continue
+        got = "{} {}".format('keep' if kept else 'drop', dropped_by or '').rstrip()
+        yield title, expected, got, known.get(title)
+
+
+def test(path=GOLDEN_TITLES, divergences=GOLDEN_DIVERGENCES):
+    """ check every golden title gets its expected keep/drop decision, returns the failures
+    known divergences are reported but do not fail """
+    failed = []
+    diverged = 0
+    for title, expected, got, reason in check_golden(path, divergences):
+        if got is None:
+            print("FIXED known divergence, remove it from {}\t{}".format(divergences.name, title))
+        elif reason is not None:
+            diverged += 1
+            print("KNOWN expected {} got {} ({})\t{}".format(expected, got, reason, title))
+        else:
+            failed.append(title)
+            print("FAIL expected {} got {}\t{}".format(expected, got, title))
+    print("{} golden titles, {} failed, {} known divergences".format(
+        sum(1 for _ in load_golden(path)), len(failed), diverged))
+    return failed
 
 
 if __name__ == "__main__":
+    if sys.argv[1:] == ['test']:
+        sys.exit(1 if test() else 0)
     process = CrawlerProcess(
         {'USER_AGENT': 'Mozilla/4.0 (compatible; MSIE 7.0; Windows NT 5.1)'}
     )
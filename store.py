@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+""" searchable store of every scraped item: sqlite, full text on title/desc/tags, indexes on date, size, site
+
+    python3 store.py query docker kubernetes [--site scene_rls] [--since 2021-01-01] [--min-size 1GB] [-n 20]
+    python3 store.py ingest data/*/*.jsonl.gz data_learningdl_*_.json data_scene_rls_*_.csv
+    python3 store.py stats
+
+StorePipeline upserts the items of a crawl, ingest backfills them from feed files.
+"""
+from datetime import datetime, timezone
+from pathlib import Path
+import argparse
+import csv
+import json
+import re
+import sqlite3
+import sys
+import time
+
+from itemadapter import ItemAdapter
+from scrapy.exceptions import NotConfigured
+
+from common import size_to_bytes
+from dedupe import normalize_url
+import feeds
+
+STORE_PATH = 'data/items.sqlite'
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+# data_<name>_<%(time)s>_.json / .csv, the feeds before data/<name>/*.jsonl.gz
+LEGACY_FEED_RE = re.compile(r'^data_(?P<name>.+?)_\d{4}-\d\d-\d\dT')
+FTS_TOKEN_RE = re.compile(r'\w+')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    rowid INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    site TEXT NOT NULL,
+    url TEXT,
+    id TEXT,
+    title TEXT,
+    date TEXT,
+    size INTEGER,
+    cat TEXT,
+    author TEXT,
+    lang TEXT,
+    desc TEXT,
+    tags TEXT,
+    links TEXT,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS items_date ON items (date);
+CREATE INDEX IF NOT EXISTS items_size ON items (size);
+CREATE INDEX IF NOT EXISTS items_site_date ON items (site, date);
+CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5 (
+    title, desc, tags, content='items', content_rowid='rowid', tokenize='unicode61 remove_diacritics 2');
+CREATE TRIGGER IF NOT EXISTS items_ai AFTER INSERT ON items BEGIN
+    INSERT INTO items_fts (rowid, title, desc, tags) VALUES (new.rowid, new.title, new.desc, new.tags);
+END;
+CREATE TRIGGER IF NOT EXISTS items_ad AFTER DELETE ON items BEGIN
+    INSERT INTO items_fts (items_fts, rowid, title, desc, tags)
+        VALUES ('delete', old.rowid, old.title, old.desc, old.tags);
+END;
+CREATE TRIGGER IF NOT EXISTS items_au AFTER UPDATE OF title, desc, tags ON items
+    WHEN old.title IS NOT new.title OR old.desc IS NOT new.desc OR old.tags IS NOT new.tags BEGIN
+    INSERT INTO items_fts (items_fts, rowid, title, desc, tags)
+        VALUES ('delete', old.rowid, old.title, old.desc, old.tags);
+    INSERT INTO items_fts (rowid, title, desc, tags) VALUES (new.rowid, new.title, new.desc, new.tags);
+END;
+"""
+
+COLUMNS = ('key', 'site', 'url', 'id', 'title', 'date', 'size', 'cat', 'author', 'lang', 'desc', 'tags', 'links')
+# a field missing from a later copy of an item, a CSV projection for instance, keeps its stored value
+UPSERT = """INSERT INTO items ({columns}, first_seen, last_seen) VALUES ({values}, :seen, :seen)
+    ON CONFLICT (key) DO UPDATE SET {updates}, first_seen = min(first_seen, excluded.first_seen),
+    last_seen = max(last_seen, excluded.last_seen)""".format(
+    columns=", ".join(COLUMNS), values=", ".join(':' + c for c in COLUMNS),
+    updates=", ".join("{0} = coalesce(excluded.{0}, {0})".format(c) for c in COLUMNS[2:]))
+
+
+def _text(value):
+    if value is None or value == '':
+        return None
+    return str(value)
+
+
+def _date(value):
+    """ datetime or feed string -> 'YYYY-MM-DD HH:MM:SS', the format of scrapy's JSON exporter: times with a UTC
+    offset in UTC, naive times as published """
+    if isinstance(value, datetime):
+        return _utc(value).strftime(DATE_FORMAT)
+    value = _text(value)
+    if value is None:
+        return None
+    try:
+        return _utc(datetime.fromisoformat(value.replace('Z', '+00:00'))).strftime(DATE_FORMAT)
+    except ValueError:
+        return value.replace('T', ' ', 1)
+
+
+def _utc(value):
+    return value if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def _size(value):
+    if value is None or value == '':
+        return None
+    if isinstance(value, int):
+        return value
+    try:
+        return int(value)
+    except ValueError:
+        return size_to_bytes(value)
+
+
+def _list(value):
+    """ tuple/list of an item, or the ',' joined value of a CSV feed """
+    if not value:
+        return ()
+    if isinstance(value, str):
+        return tuple(v for v in value.split(',') if v)
+    return tuple(value)
+
+
+def item_row(item, site, seen=None):
+    """ items table row of an Article, or of an item read back from a feed """
+    d = ItemAdapter(item).asdict() if not isinstance(item, dict) else item
+    url = _text(d.get('url'))
+    title = _text(d.get('title'))
+    tags = _list(d.get('tags'))
+    links = _list(d.get('links'))
+    if url:
+        key = "{}:{}".format(site, normalize_url(url))
+    else:
+        key = "{}:id:{}".format(site, d['id']) if d.get('id') else "{}:title:{}".format(site, title)
+    return {
+        'key': key, 'site': site, 'url': url, 'id': _text(d.get('id')), 'title': title, 'date': _date(d.get('date')),
+        'size': _size(d.get('size')), 'cat': _text(d.get('cat')), 'author': _text(d.get('author')),
+        'lang': _text(d.get('lang')), 'desc': _text(d.get('desc')), 'tags': ", ".join(tags) or None,
+        'links': json.dumps(links) if links else None, 'seen': seen or time.time(),
+    }
+
+
+def fts_query(text):
+    """ words -> FTS5 query matching all of them, each as a prefix: 'dock kube' -> '"dock"* "kube"*' """
+    return " ".join('"{}"*'.format(token) for token in FTS_TOKEN_RE.findall(text))
+
+
+class ItemStore:
+    """ items keyed on site and normalized url, shared by the spiders of a process like DedupeIndex """
+    _opened = {}
+
+    def __init__(self, path, commit_every=100):
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(path), timeout=30)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("PRAGMA cache_size=-65536")
+        self.db.executescript(SCHEMA)
+        self.commit_every = commit_every
+        self.pending = 0
+        self.users = 0
+
+    @classmethod
+    def open(cls, path, **kwargs):
+        store = cls._opened.get(path)
+        if store is None:
+            store = cls._opened[path] = cls(path, **kwargs)
+        store.users += 1
+        return store
+
+    def close(self):
+        self.users -= 1
+        if self.users <= 0:
+            self.db.commit()
+            self.db.close()
+            self._opened.pop(self.path, None)
+
+    def upsert(self, row):
+        self.db.execute(UPSERT, row)
+        self.pending += 1
+        if self.pending >= self.commit_every:
+            self.db.commit()
+            self.pending = 0
+
+    def ingest(self, rows, batch=5000):
+        """ bulk upsert, one transaction per batch rows, returns the number of rows """
+        count = 0
+        chunk = []
+        with self.db:
+            for row in rows:
+                chunk.append(row)
+                if len(chunk) >= batch:
+                    self.db.executemany(UPSERT, chunk)
+                    count += len(chunk)
+                    chunk = []
+            self.db.executemany(UPSERT, chunk)
+            count += len(chunk)
+        return count
+
+    def search(self, text=None, site=None, since=None, until=None, min_size=None, max_size=None, limit=20,
+               raw=False):
+        """ best full text matches first, the most recent first without text """
+        where, params = [], []
+        if text:
+            where.append("items_fts MATCH ?")
+            params.append(text if raw else fts_query(text))
+        for clause, value in (("items.site = ?", site), ("items.date >= ?", since), ("items.date < ?", until),
+                              ("items.size >= ?", min_size), ("items.size <= ?", max_size)):
+            if value is not None:
+                where.append(clause)
+                params.append(value)
+        sql = "SELECT items.* FROM {} {} ORDER BY {} LIMIT ?".format(
+            "items_fts JOIN items ON items.rowid = items_fts.rowid" if text else "items",
+            "WHERE " + " AND ".join(where) if where else "",
+            "bm25(items_fts, 10.0, 1.0, 5.0), items.date DESC" if text else "items.date DESC")
+        params.append(limit)
+        return [dict(row) for row in self.db.execute(sql, params)]
+
+    def stats(self):
+        return {
+            'items': self.db.execute("SELECT count(*) FROM items").fetchone()[0],
+            'sites': {site: (count, first, last) for site, count, first, last in self.db.execute(
+                "SELECT site, count(*), min(date), max(date) FROM items GROUP BY site")},
+            'path': str(Path(self.path).absolute()),
+        }
+
+
+class StorePipeline:
+    """ upsert every item reaching it into the ItemStore, keep it last so only kept items are stored """
+
+    def __init__(self, store):
+        self.store = store
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        path = crawler.settings.get('STORE_PATH', STORE_PATH)
+        if not path:
+            raise NotConfigured("STORE_PATH is not set")
+        return cls(ItemStore.open(path))
+
+    def close_spider(self, spider):
+        self.store.close()
+
+    def process_item(self, item, spider):
+        self.store.upsert(item_row(item, spider.name))
+        return item
+
+
+def feed_site(path):
+    """ spider name of a feed file: data/<name>/..., or data_<name>_<time>_.json / .csv """
+    m = LEGACY_FEED_RE.match(path.name)
+    return m.group('name') if m else path.parent.name
+
+
+def iter_feed(path):
+    """ items of a jsonlines (.jsonl, .jsonl.gz, and the .json feeds written as jsonlines), JSON array (.json
+    starting with '[') or CSV feed """
+    if path.suffix == '.json':
+        with path.open(encoding='utf8') as f:
+            array = f.read(4096).lstrip().startswith('[')
+            if array:
+                f.seek(0)
+                yield from json.load(f)
+        if not array:
+            yield from feeds.iter_items([path])
+    elif path.suffix == '.csv':
+        with path.open(newline='', encoding='utf8') as f:
+            yield from csv.DictReader(f)
+    else:
+        yield from feeds.iter_items([path])
+
+
+def ingest(store, paths, site=None):
+    """ backfill the store from feed files, the first_seen of their items is the file mtime """
+    total = 0
+    for path in paths:
+        seen = path.stat().st_mtime
+        name = site or feed_site(path)
+        count = store.ingest(item_row(item, name, seen) for item in iter_feed(path))
+        print("{}\t{} items\t{}".format(name, count, path), file=sys.stderr)
+        total += count
+    return total
+
+
+def print_rows(rows):
+    for row in rows:
+        size = "{:.1f}G".format(row['size'] / (1 << 30)) if row['size'] else "-"
+        print("{}\t{}\t{:>7}\t{}\t{}".format(row['date'] or '-', row['site'], size, row['title'], row['url'] or ''))
+
+
+def main(args):
+    store = ItemStore(args.store)
+    try:
+        if args.command == 'ingest':
+            start = time.perf_counter()
+            total = ingest(store, args.feeds, args.site)
+            print("{} items ingested in {:.2f}s".format(total, time.perf_counter() - start), file=sys.stderr)
+        elif args.command == 'stats':
+            print(json.dumps(store.stats(), indent=2))
+        else:
+            start = time.perf_counter()
+            rows = store.search(" ".join(args.words) or None, args.site, args.since, args.until,
+                                size_to_bytes(args.min_size) if args.min_size else None,
+                                size_to_bytes(args.max_size) if args.max_size else None, args.number, args.raw)
+            elapsed = time.perf_counter() - start
+            if args.json:
+                print(json.dumps(rows, indent=2))
+            else:
+                print_rows(rows)
+            print("{} results in {:.1f} ms".format(len(rows), elapsed * 1000), file=sys.stderr)
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--store", default=STORE_PATH, help="sqlite store, the STORE_PATH of the spiders")
+    commands = parser.add_subparsers(dest='command', required=True)
+    query = commands.add_parser('query', help="full text search, filtered by site, date and size")
+    query.add_argument('words', nargs='*', help="all of them must match title, desc or tags, as prefixes")
+    query.add_argument("--raw", action='store_true', help="words are an FTS5 query: OR, NOT, \"phrase\", title:")
+    query.add_argument("--site")
+    query.add_argument("--since", help="date, e.g. 2021-01-01")
+    query.add_argument("--until", help="date, excluded")
+    query.add_argument("--min-size", help="e.g. 500MB")
+    query.add_argument("--max-size", help="e.g. 4GB")
+    query.add_argument('-n', "--number", type=int, default=20)
+    query.add_argument("--json", action='store_true')
+    ingest_parser = commands.add_parser('ingest', help="backfill from feed files")
+    ingest_parser.add_argument('feeds', type=Path, nargs='+', help=".jsonl(.gz), .json or .csv feed files")
+    ingest_parser.add_argument("--site", help="spider name, from the file path by default")
+    commands.add_parser('stats', help="items per site and their date range")
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,120 @@
+import io
+import tarfile
+import zipfile
+
+import pytest
+
+from archive_backends import (ArchiveError, Member, TarArchive, ZipArchive, detect_format, open_archive,
+                              safe_target)
+
+FILES = {'course/01 intro.txt': b'intro\n' * 1000, 'course/02 setup.txt': b'setup\n' * 500, 'notes.txt': b'x'}
+
+
+def _zip(path, files=FILES):
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr('course/', b'')
+        for name, data in files.items():
+            zf.writestr(name, data)
+    return path
+
+
+def _tar(path, files=FILES, mode='w:gz'):
+    with tarfile.open(path, mode) as tar:
+        for name, data in files.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = 1600000000
+            tar.addfile(info, io.BytesIO(data))
+        link = tarfile.TarInfo('course/link')
+        link.type = tarfile.SYMTYPE
+        link.linkname = '/etc/passwd'
+        tar.addfile(link)
+    return path
+
+
+def _read_tree(root):
+    return {str(p.relative_to(root)): p.read_bytes() for p in root.rglob('*') if p.is_file()}
+
+
+@pytest.mark.parametrize('name', ['../evil.txt', 'course/../../evil.txt', '/etc/passwd', '..\\evil.txt', ''])
+def test_safe_target_rejects_names_leaving_dest(tmp_path, name):
+    with pytest.raises(ArchiveError):
+        safe_target(tmp_path, name)
+
+
+def test_safe_target(tmp_path):
+    assert safe_target(tmp_path, 'course/01 intro.txt') == tmp_path / 'course' / '01 intro.txt'
+    assert safe_target(tmp_path, 'course\\02.txt') == tmp_path / 'course' / '02.txt'
+
+
+def test_detect_format(tmp_path):
+    assert detect_format(_zip(tmp_path / 'a.zip')) == 'zip'
+    assert detect_format(_tar(tmp_path / 'a.tar.gz')) == 'tar'
+    assert detect_format(_tar(tmp_path / 'a.tar', mode='w')) == 'tar'
+    rar = tmp_path / 'a.part1.rar'
+    rar.write_bytes(b'Rar!\x1a\x07\x01\x00' + b'\0' * 64)
+    assert detect_format(rar) == 'rar'
+    other = tmp_path / 'a.txt'
+    other.write_bytes(b'hello world' * 100)
+    assert detect_format(other) is None
+    with pytest.raises(ArchiveError):
+        open_archive(other)
+
+
+@pytest.mark.parametrize('build, cls', [(_zip, ZipArchive), (_tar, TarArchive)])
+def test_stream_extract(tmp_path, build, cls):
+    path = build(tmp_path / ('a.zip' if cls is ZipArchive else 'a.tar.gz'))
+    progress = []
+    with open_archive(path, buffer_size=1024, progress=lambda member, n: progress.append((member.filename, n))) as a:
+        assert isinstance(a, cls)
+        members = {m.filename: m for m in a.infolist()}
+        assert {name: members[name].file_size for name in FILES} == {k: len(v) for k, v in FILES.items()}
+        assert a.testall() is None
+        # read buffer_size bytes at a time
+        assert max(n for _, n in progress) <= 1024
+        assert sum(n for _, n in progress) == sum(map(len, FILES.values()))
+        a.extractall(tmp_path / 'out')
+    assert _read_tree(tmp_path / 'out') == FILES
+    # the symlink of the tarball is skipped
+    assert not (tmp_path / 'out' / 'course' / 'link').exists()
+
+
+def test_tar_mtime_kept(tmp_path):
+    with open_archive(_tar(tmp_path / 'a.tar.gz')) as a:
+        a.extractall(tmp_path / 'out')
+    assert (tmp_path / 'out' / 'notes.txt').stat().st_mtime == 1600000000
+
+
+def test_zip_bad_crc(tmp_path):
+    path = tmp_path / 'a.zip'
+    # stored uncompressed to corrupt the content, not the headers
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_STORED) as zf:
+        zf.writestr('notes.txt', b'abcdefgh' * 100)
+    path.write_bytes(path.read_bytes().replace(b'abcdefgh', b'abcdefgX', 1))
+    with open_archive(path) as a:
+        assert a.testall() == 'notes.txt'
+        with pytest.raises(ArchiveError):
+            a.extractall(tmp_path / 'out')
+
+
+def test_member_leaving_dest_is_not_written(tmp_path):
+    path = tmp_path / 'evil.zip'
+    with zipfile.ZipFile(path, 'w') as zf:
+        zf.writestr('../evil.txt', b'evil')
+    with open_archive(path) as a:
+        with pytest.raises(ArchiveError):
+            a.extractall(tmp_path / 'out')
+    assert not (tmp_path / 'evil.txt').exists()
+
+
+def test_backend_override(tmp_path):
+    path = _zip(tmp_path / 'a.zip')
+    with pytest.raises(ArchiveError):
+        open_archive(path, backends={'zip': ['nope']})
+    with open_archive(path, backends={'zip': ['zip']}) as a:
+        assert a.backend == 'zip'
+
+
+def test_member_is_dir():
+    assert Member('course/', 0, 0).is_dir
+    assert not Member('course/a.txt', 1, 1).is_dir
@@ -0,0 +1,75 @@
+from collections import namedtuple
+import os
+import zipfile
+
+from archive_backends import Member
+from archive_meta import RHDF_DIRECTORY, RHDF_SPLITBEFORE, ArchiveMeta, MetaCache
+from unrar_batch import index_sets, set_meta, set_stamp
+
+# what RarFile.infolist() gives
+RarInfo = namedtuple('RarInfo', 'filename compress_size file_size flag_bits')
+
+
+def test_from_infolist_members():
+    meta = ArchiveMeta.from_infolist([
+        Member('course/', 0, 0), Member('course/01.mp4', 90, 100), Member('course/02.mp4', 45, 50)])
+    assert (meta.entries, meta.compressed, meta.uncompressed) == (3, 135, 150)
+    assert meta.roots == ('course',)
+    assert meta.single_root
+    assert meta.to_dict()['single_root'] is True
+
+
+def test_from_infolist_loose_files_and_roots():
+    meta = ArchiveMeta.from_infolist([Member('a/1.txt', 1, 1), Member('b\\2.txt', 1, 1), Member('readme.nfo', 1, 1)])
+    assert meta.roots == ('a', 'b', 'readme.nfo')
+    assert meta.loose == 1
+    assert not meta.single_root
+
+
+def test_from_infolist_split_files_counted_once():
+    meta = ArchiveMeta.from_infolist([
+        RarInfo('course', 0, 0, RHDF_DIRECTORY),
+        RarInfo('course/big.mp4', 100, 250, 0),
+        RarInfo('course/big.mp4', 100, 250, RHDF_SPLITBEFORE),
+        RarInfo('course/big.mp4', 40, 250, RHDF_SPLITBEFORE),
+    ])
+    assert (meta.entries, meta.compressed, meta.uncompressed) == (2, 240, 250)
+    assert meta.single_root
+
+
+def test_cache_invalidated_on_size_or_mtime(tmp_path):
+    meta = ArchiveMeta(2, 10, 20, ('course',), 0)
+    cache = MetaCache(tmp_path / 'meta.sqlite')
+    try:
+        cache.put('set.part1.rar', 100, 5, meta)
+        assert cache.get('set.part1.rar', 100, 5) == meta
+        # the key is the absolute path
+        assert cache.get(os.path.abspath('set.part1.rar'), 100, 5) == meta
+        assert cache.get('set.part1.rar', 101, 5) is None
+        assert cache.get('set.part1.rar', 100, 6) is None
+        assert (cache.hits, cache.misses) == (2, 2)
+    finally:
+        cache.close()
+    cache = MetaCache(tmp_path / 'meta.sqlite')
+    try:
+        assert cache.get('set.part1.rar', 100, 5) == meta
+    finally:
+        cache.close()
+
+
+def test_set_meta_reads_headers_once_while_unchanged(tmp_path):
+    path = tmp_path / 'course.zip'
+    with zipfile.ZipFile(path, 'w') as zf:
+        zf.writestr('course/01.txt', b'x' * 100)
+    vs, = index_sets([(path, path.stat().st_size)], ('zip',))
+    cache = MetaCache(tmp_path / 'meta.sqlite')
+    try:
+        assert set_meta(vs, cache).uncompressed == 100
+        assert set_meta(vs, cache).uncompressed == 100
+        assert (cache.hits, cache.misses) == (1, 1)
+        size, mtime_ns = set_stamp(vs)
+        os.utime(path, ns=(mtime_ns + 10 ** 9, mtime_ns + 10 ** 9))
+        assert set_meta(vs, cache).entries == 1
+        assert cache.misses == 2
+    finally:
+        cache.close()
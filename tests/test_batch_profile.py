@@ -0,0 +1,89 @@
+import json
+import threading
+import time
+
+import pytest
+
+from batch_profile import (IO_FIELDS, PhaseRecorder, ProfileOptions, StackSampler, append_trace, format_summary,
+                           io_counters, profiled, start_trace, write_summary)
+
+# /proc/self/io is missing outside Linux and in some containers
+HAS_IO = any(io_counters().values())
+
+
+def _busy(seconds):
+    end = time.process_time() + seconds
+    while time.process_time() < end:
+        pass
+
+
+def test_phase_recorder(tmp_path):
+    rec = PhaseRecorder('set.part1.rar')
+    with rec.phase('test', 1000000):
+        _busy(0.02)
+    with rec.phase('extract') as phase:
+        tmp_path.joinpath('out').write_bytes(b'x' * 100000)
+        phase['payload_bytes'] = 100000
+    record = rec.to_dict(status='success')
+    assert record['name'] == 'set.part1.rar' and record['status'] == 'success'
+    test, extract = record['phases']
+    assert [test['phase'], extract['phase']] == ['test', 'extract']
+    assert test['seconds'] > 0 and test['cpu_seconds'] > 0
+    assert test['MBps'] == pytest.approx(1000000 / test['seconds'] / 1e6, rel=0.01)
+    assert extract['payload_bytes'] == 100000
+    assert set(IO_FIELDS) <= set(extract)
+    if HAS_IO:
+        assert extract['wchar'] >= 100000
+
+
+def test_disabled_recorder_records_nothing():
+    rec = PhaseRecorder('set', enabled=False)
+    with rec.phase('test') as phase:
+        phase['payload_bytes'] = 1
+    assert rec.phases == []
+
+
+def test_trace_and_summary(tmp_path):
+    options = ProfileOptions(str(tmp_path / 'profile'))
+    start_trace(options)
+    for name in ('a.part1.rar', 'b.part1.rar'):
+        rec = PhaseRecorder(name)
+        with rec.phase('test', 1000):
+            _busy(0.01)
+        with rec.phase('move'):
+            pass
+        append_trace(options, rec.to_dict(status='success'))
+    run = PhaseRecorder('main')
+    with run.phase('scan'):
+        pass
+    summary = write_summary(options, run)
+    assert summary['sets'] == 2
+    assert list(summary['run']) == ['scan']
+    test = summary['phases']['test']
+    assert test['count'] == 2 and test['payload_bytes'] == 2000
+    assert {'seconds', 'cpu_seconds', 'cpu_share', 'MBps', 'bound'} <= set(test)
+    assert json.loads(tmp_path.joinpath('profile', 'summary.json').read_text()) == summary
+    lines = format_summary(summary)
+    assert [line.split()[:3] for line in lines] == [['run', 'scan', 'x1'], ['phases', 'test', 'x2'],
+                                                    ['phases', 'move', 'x2']]
+
+
+def test_stack_sampler(tmp_path):
+    sampler = StackSampler(interval=0.001)
+    sampler.start()
+    worker = threading.Thread(target=_busy, args=(0.1,))
+    worker.start()
+    worker.join()
+    sampler.stop()
+    assert any('_busy' in stack for stack in sampler.counts)
+    path = tmp_path / 'main.folded'
+    sampler.write(path)
+    assert all(line.rsplit(' ', 1)[1].isdigit() for line in path.read_text().splitlines())
+
+
+@pytest.mark.parametrize('profiler, suffix', [('cprofile', '.pstats'), ('sample', '.folded')])
+def test_profiled(tmp_path, profiler, suffix):
+    options = ProfileOptions(str(tmp_path), profiler)
+    with profiled(options, 'set/part1.rar'):
+        _busy(0.01)
+    assert tmp_path.joinpath('set_part1.rar' + suffix).exists()
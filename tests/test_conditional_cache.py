@@ -0,0 +1,64 @@
+from scrapy import Request
+from scrapy.http import Response
+from scrapy.settings import Settings
+
+from conditional_cache import RevalidatePolicy
+
+URL = 'https://learningdl.net/category/ebooks-tutorials/technical/'
+LAST_MODIFIED = 'Sun, 18 Oct 2026 10:00:00 GMT'
+
+
+def _revalidate(status):
+    policy = RevalidatePolicy(Settings())
+    request = Request(URL)
+    cached = Response(URL, status=200, headers={'ETag': '"abc"'}, flags=['cached'])
+    assert not policy.is_cached_response_fresh(cached, request)
+    assert request.headers.get('If-None-Match') == b'"abc"'
+    assert 'If-Modified-Since' not in request.headers
+    return policy.is_cached_response_valid(cached, Response(URL, status=status), request), cached
+
+
+def test_not_modified_is_flagged():
+    valid, cached = _revalidate(304)
+    assert valid
+    assert 'not_modified' in cached.flags
+
+
+def test_server_error_serves_the_cached_copy_unflagged():
+    valid, cached = _revalidate(503)
+    assert valid
+    assert 'not_modified' not in cached.flags
+
+
+def test_changed_page_is_not_served_from_cache():
+    valid, cached = _revalidate(200)
+    assert not valid
+    assert 'not_modified' not in cached.flags
+
+
+def test_last_modified_is_sent_as_if_modified_since():
+    policy = RevalidatePolicy(Settings())
+    request = Request(URL)
+    cached = Response(URL, status=200, headers={'Last-Modified': LAST_MODIFIED}, flags=['cached'])
+    assert not policy.is_cached_response_fresh(cached, request)
+    assert request.headers.get('If-Modified-Since') == LAST_MODIFIED.encode()
+    assert 'If-None-Match' not in request.headers
+    assert policy.is_cached_response_valid(cached, Response(URL, status=304), request)
+    assert 'not_modified' in cached.flags
+
+
+def test_both_validators_are_sent():
+    policy = RevalidatePolicy(Settings())
+    request = Request(URL)
+    cached = Response(URL, status=200, headers={'ETag': '"abc"', 'Last-Modified': LAST_MODIFIED})
+    policy.is_cached_response_fresh(cached, request)
+    assert request.headers.get('If-None-Match') == b'"abc"'
+    assert request.headers.get('If-Modified-Since') == LAST_MODIFIED.encode()
+
+
+def test_no_validator_sends_a_plain_request():
+    policy = RevalidatePolicy(Settings())
+    request = Request(URL)
+    assert not policy.is_cached_response_fresh(Response(URL, status=200), request)
+    assert 'If-None-Match' not in request.headers
+    assert 'If-Modified-Since' not in request.headers
@@ -0,0 +1,84 @@
+import pytest
+
+from common import Article, RuleDropItem
+from dedupe import BloomFilter, DedupeIndex, DuplicatesPipeline, key_hash, normalize_title, normalize_url
+
+
+@pytest.mark.parametrize('title, expected', [
+    ('Pluralsight com Docker Deep Dive-ELOHiM', 'pluralsight docker deep dive'),
+    # trailing space, another group or separators give the same key
+    ('Pluralsight com Docker Deep Dive-ELOHiM ', 'pluralsight docker deep dive'),
+    ('PLURALSIGHT.COM - Docker: Deep Dive-XCODE', 'pluralsight docker deep dive'),
+    ('Head First PMP 4th Edition PDF', 'head first pmp 4th edition pdf'),
+])
+def test_normalize_title(title, expected):
+    assert normalize_title(title) == expected
+
+
+def test_normalize_url():
+    assert normalize_url(' https://www.learningdl.net/docker-deep-dive/ ') == 'learningdl.net/docker-deep-dive'
+    assert normalize_url('http://learningdl.net/?p=12') == 'learningdl.net?p=12'
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(1000)
+    hashes = [key_hash(str(i)) for i in range(1000)]
+    for h in hashes:
+        bloom.add(h)
+    assert all(h in bloom for h in hashes)
+    assert sum(key_hash('other {}'.format(i)) in bloom for i in range(1000)) < 20
+
+
+def test_index_survives_reopen(tmp_path):
+    path = str(tmp_path / 'data' / 'dedupe.sqlite')
+    index = DedupeIndex.open(path, capacity=1000)
+    assert not index.check_and_add(['t:docker deep dive', 'u:learningdl.net/docker'])
+    assert index.check_and_add(['u:learningdl.net/docker'])
+    index.close()
+    index = DedupeIndex.open(path, capacity=1000)
+    try:
+        assert index.check_and_add(['t:docker deep dive'])
+        assert not index.check_and_add(['t:kubernetes'])
+    finally:
+        index.close()
+
+
+class _Spider:
+    name = 'learningdl'
+
+
+@pytest.fixture
+def pipeline(tmp_path):
+    pipeline = DuplicatesPipeline(DedupeIndex.open(str(tmp_path / 'dedupe.sqlite'), capacity=1000))
+    yield pipeline
+    pipeline.close_spider(_Spider())
+
+
+def test_pipeline_drops_duplicates_across_sites(pipeline):
+    item = Article(title='Pluralsight com Docker Deep Dive-ELOHiM', url='https://www.learningdl.net/docker/')
+    assert pipeline.process_item(item, _Spider()) is item
+    # still in the later pipelines
+    with pytest.raises(RuleDropItem):
+        pipeline.process_item(Article(title='Pluralsight com Docker Deep Dive-XCODE'), _Spider())
+    pipeline.item_scraped(item, None, _Spider())
+    with pytest.raises(RuleDropItem):
+        pipeline.process_item(Article(title='Pluralsight com Docker Deep Dive-XCODE'), _Spider())
+
+
+def test_items_dropped_later_leave_their_keys(pipeline):
+    # RapidgatorPipeline drops the copy without links
+    linkless = Article(title='Pluralsight com Docker Deep Dive-ELOHiM')
+    assert pipeline.process_item(linkless, _Spider()) is linkless
+    pipeline.item_released(linkless, response=None, exception=RuleDropItem('no link', 'RapidgatorPipeline', 'x'),
+                           spider=_Spider())
+    item = Article(title='Pluralsight com Docker Deep Dive-XCODE', links=('https://rapidgator.net/file/a',))
+    assert pipeline.process_item(item, _Spider()) is item
+    assert not pipeline.pending - set(pipeline.in_flight[id(item)])
+
+
+def test_stopword_titles_have_no_title_key(pipeline):
+    first = Article(title='The-GRP')
+    assert pipeline.process_item(first, _Spider()) is first
+    pipeline.item_scraped(first, None, _Spider())
+    second = Article(title='A-OTHER')
+    assert pipeline.process_item(second, _Spider()) is second
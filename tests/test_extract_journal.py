@@ -0,0 +1,113 @@
+import json
+import zipfile
+
+import pytest
+
+from extract_journal import RESUME, Journal
+from unrar_batch import index_sets, main, plan_jobs, process_set
+
+FILES = {'course/01 intro.txt': b'intro\n' * 1000, 'course/02 setup.txt': b'setup\n' * 500}
+
+
+@pytest.fixture
+def zip_set(tmp_path):
+    """ input directory holding one stdlib-built zip set, and the working directory of the batch """
+    crt_dir = tmp_path / 'in'
+    crt_dir.mkdir()
+    path = crt_dir / 'course.zip'
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for name, data in FILES.items():
+            zf.writestr(name, data)
+    return path, crt_dir / '_peon'
+
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = Journal(tmp_path / 'journal.sqlite')
+    yield journal
+    journal.close()
+
+
+def _plan(path, working_path, journal):
+    vs, = index_sets([(path, path.stat().st_size)], ('zip',))
+    return plan_jobs([vs], working_path, journal=journal)
+
+
+def _extracted(working_path):
+    return {str(p.relative_to(working_path)): p.read_bytes() for p in working_path.rglob('*.txt')}
+
+
+def test_resume_mapping():
+    assert RESUME['extracting'] == 'verified'
+    assert RESUME['moved'] is None and RESUME['error'] is None
+
+
+def test_set_goes_through_every_state(zip_set, journal):
+    path, working_path = zip_set
+    working_path.mkdir()
+    (job,), skipped = _plan(path, working_path, journal)
+    assert skipped == [] and job.state == 'queued'
+    assert journal.get(path)['state'] == 'queued'
+    assert process_set(*job) == 'success'
+    row = journal.get(path)
+    assert row['state'] == 'moved'
+    assert set(json.loads(row['durations'])) >= {'verified', 'extracted', 'moved'}
+    assert _extracted(working_path) == FILES
+    assert working_path.joinpath('course.zip').exists() and not path.exists()
+
+
+def test_interrupted_extraction_resumes_from_verified(zip_set, journal):
+    path, working_path = zip_set
+    working_path.mkdir()
+    (job,), _ = _plan(path, working_path, journal)
+    # the batch died while extracting, after the set was tested
+    journal.update(path, 'verified', 1.0)
+    journal.update(path, 'extracting')
+    (job,), skipped = _plan(path, working_path, journal)
+    assert skipped == [] and job.state == 'verified'
+    assert process_set(*job) == 'success'
+    row = journal.get(path)
+    assert row['state'] == 'moved'
+    # not tested again
+    assert json.loads(row['durations'])['verified'] == 1.0
+    assert _extracted(working_path) == FILES
+
+
+def test_error_is_skipped_then_retried(zip_set, journal, tmp_path):
+    path, working_path = zip_set
+    working_path.mkdir()
+    _plan(path, working_path, journal)
+    journal.update(path, 'error', error="testall: course/01 intro.txt")
+    jobs, skipped = _plan(path, working_path, journal)
+    assert jobs == [] and skipped == [(path, 'error')]
+
+    retry = Journal(journal.path, retry_errors=True)
+    try:
+        (job,), skipped = _plan(path, working_path, retry)
+    finally:
+        retry.close()
+    assert skipped == [] and job.state == 'queued'
+    assert process_set(*job) == 'success'
+    assert journal.get(path)['state'] == 'moved'
+
+
+def test_unopenable_set_is_an_error(zip_set, journal):
+    path, working_path = zip_set
+    working_path.mkdir()
+    (job,), _ = _plan(path, working_path, journal)
+    journal.update(path, 'verified', 1.0)
+    # overwritten with garbage of the same size before the resumed run opens it
+    path.write_bytes(b'\0' * path.stat().st_size)
+    (job,), _ = _plan(path, working_path, journal)
+    assert process_set(*job) == 'error'
+    assert journal.get(path)['state'] == 'error'
+    jobs, skipped = _plan(path, working_path, journal)
+    assert jobs == [] and skipped == [(path, 'error')]
+
+
+def test_unreadable_set_is_reported(tmp_path, journal):
+    crt_dir = tmp_path / 'in'
+    crt_dir.mkdir()
+    path = crt_dir / 'broken.part1.rar'
+    path.write_bytes(b'not an archive' * 10)
+    assert main(crt_dir, journal=journal)['error'] == [path]
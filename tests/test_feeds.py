@@ -0,0 +1,32 @@
+import json
+
+from feeds import FlushingGzipPlugin, iter_items
+
+
+def _plugin(file, **options):
+    return FlushingGzipPlugin(file, dict({'gzip_flush_items': 100, 'gzip_flush_interval': 60.0}, **options))
+
+
+def test_flush_makes_pending_items_readable(tmp_path):
+    path = tmp_path / 'scene_rls_20210301T000000_01.jsonl.gz'
+    with path.open('wb') as f:
+        plugin = _plugin(f)
+        for i in range(3):
+            plugin.write(json.dumps({'title': str(i)}).encode('utf8') + b'\n')
+        assert list(iter_items([path])) == []
+        # as the flush timer does on a slow crawl
+        plugin.flush()
+        assert [item['title'] for item in iter_items([path])] == ['0', '1', '2']
+        plugin.close()
+    assert not plugin.task.running
+
+
+def test_flush_every_n_items(tmp_path):
+    path = tmp_path / 'scene_rls_20210301T000000_01.jsonl.gz'
+    with path.open('wb') as f:
+        plugin = _plugin(f, gzip_flush_items=2, gzip_flush_interval=0)
+        for i in range(3):
+            plugin.write(json.dumps({'title': str(i)}).encode('utf8') + b'\n')
+        assert [item['title'] for item in iter_items([path])] == ['0', '1']
+        plugin.close()
+    assert plugin.task is None
@@ -0,0 +1,17 @@
+import scene_rls
+
+
+def test_golden_titles():
+    unexpected = [(title, expected, got) for title, expected, got, reason in scene_rls.check_golden()
+                  if got is not None and reason is None]
+    assert unexpected == []
+
+
+def test_known_divergences_still_diverge():
+    fixed = [title for title, expected, got, reason in scene_rls.check_golden() if got is None]
+    assert fixed == [], "decided as labelled, remove from {}".format(scene_rls.GOLDEN_DIVERGENCES.name)
+
+
+def test_known_divergences_are_golden_titles():
+    titles = {title for title, *_ in scene_rls.load_golden()}
+    assert set(scene_rls.load_divergences()) <= titles
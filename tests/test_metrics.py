@@ -0,0 +1,37 @@
+import pytest
+from scrapy import Request
+from scrapy.http import Response
+
+from metrics import CallbackLatencyMiddleware, CrawlMetrics
+
+
+def _response(callback):
+    url = 'https://learningdl.net/category/ebooks-tutorials/technical/'
+    return Response(url, request=Request(url, callback=callback))
+
+
+def parse(response):
+    yield 1
+    yield 2
+
+
+def parse_item(response):
+    yield 1
+    raise ValueError("broken page")
+
+
+def test_callback_is_timed():
+    metrics = CrawlMetrics('metrics.json')
+    middleware = CallbackLatencyMiddleware(metrics)
+    response = _response(parse)
+    assert list(middleware.process_spider_output(response, parse(response), None)) == [1, 2]
+    assert metrics.callbacks['parse'].count == 1
+
+
+def test_raising_callback_is_timed():
+    metrics = CrawlMetrics('metrics.json')
+    middleware = CallbackLatencyMiddleware(metrics)
+    response = _response(parse_item)
+    with pytest.raises(ValueError):
+        list(middleware.process_spider_output(response, parse_item(response), None))
+    assert metrics.callbacks['parse_item'].count == 1
@@ -0,0 +1,61 @@
+import pytest
+from scrapy import Request
+from scrapy.http import Response
+
+from pagination import PageWindow, Paginator, page_template
+
+
+@pytest.mark.parametrize('url, expected', [
+    ('https://learningdl.net/category/technical/page/3/', ('https://learningdl.net/category/technical/page/{}/', 3)),
+    ('http://apps.scene-rls.net/?cat=51&paged=2', ('http://apps.scene-rls.net/?cat=51&paged={}', 2)),
+    ('http://apps.scene-rls.net/?paged=12&cat=51', ('http://apps.scene-rls.net/?paged={}&cat=51', 12)),
+    # braces of the url are kept as such by str.format
+    ('https://x/{a}/page/2', ('https://x/{{a}}/page/{}', 2)),
+    ('http://apps.scene-rls.net/?cat=51', (None, None)),
+])
+def test_page_template(url, expected):
+    assert page_template(url) == expected
+    template, page = expected
+    if template is not None:
+        assert template.format(page) == url
+
+
+def test_window_requests_each_page_once():
+    window = PageWindow('https://x/page/{}/', 1)
+    assert list(window.advance(1, 4)) == [2, 3, 4, 5]
+    assert list(window.advance(2, 4)) == [6]
+    # an older page parsed late does not request again
+    assert list(window.advance(3, 2)) == []
+
+
+def test_closed_window_cancels_later_pages():
+    window = PageWindow('https://x/page/{}/', 1)
+    window.advance(1, 4)
+    window.close(4)
+    window.close(6)
+    assert list(window.advance(3, 4)) == []
+    assert not window.cancelled(4)
+    assert window.cancelled(5)
+
+
+def _parse(response):
+    pass
+
+
+def test_paginator_follows_window_and_cancels():
+    paginator = Paginator()
+    first = Response('https://x/', request=Request('https://x/'))
+    requests = list(paginator.follow(first, 'https://x/page/2/', _parse, size=3))
+    assert [r.url for r in requests] == ['https://x/page/2/', 'https://x/page/3/', 'https://x/page/4/']
+    page3 = requests[1]
+    list(paginator.follow(Response(page3.url, request=page3), 'https://x/page/4/', _parse, size=3, crossed=True))
+    assert paginator.cancelled(requests[2])
+    assert not paginator.cancelled(requests[0])
+
+
+def test_paginator_serial_chain():
+    paginator = Paginator()
+    first = Response('https://x/', request=Request('https://x/'))
+    assert [r.url for r in paginator.follow(first, 'https://x/page/2/', _parse, size=1)] == ['https://x/page/2/']
+    assert list(paginator.follow(first, 'https://x/page/2/', _parse, size=1, stop=True)) == []
+    assert list(paginator.follow(first, None, _parse, size=3)) == []
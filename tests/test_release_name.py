@@ -0,0 +1,31 @@
+import pytest
+
+from release_name import PROVIDERS, Release, parse_release
+
+
+@pytest.mark.parametrize('title, expected', [
+    ('Udemy Learn Django 2 v1 0 BOOKWARE-SOFTiMAGE',
+     Release(group='SOFTiMAGE', tail='BOOKWARE-SOFTiMAGE', version='v1 0', tags=('BOOKWARE',), provider='Udemy')),
+    ('WinImage Pro v10 0 Win64 Incl Keygen-FALLEN',
+     Release(group='FALLEN', tail='Keygen-FALLEN', version='v10 0', platform='Win64', tags=('Keygen',))),
+    ('Pluralsight com Docker Deep Dive-ELOHiM',
+     Release(group='ELOHiM', tail='Dive-ELOHiM', provider='Pluralsight com')),
+    # '-' inside the last word, the group is the last word
+    ('Serato DJ Pro Suite v2 3 8 CSE-V', Release(group='V', tail='CSE-V', version='v2 3 8')),
+    # no group
+    ('Head First PMP 4th Edition PDF', Release(tail='PDF', tags=('PDF',))),
+    ('Daz3D Sci-fi Police Officer', Release(tail='Officer')),
+    ('Tornado Driver-', Release(tail='Driver-')),
+    # surrounding whitespace never gives an empty tail
+    ('Tornado Driver-DARKZER0 ', Release(group='DARKZER0', tail='Driver-DARKZER0')),
+    ('   ', Release()),
+])
+def test_parse_release(title, expected):
+    assert parse_release(title) == expected
+
+
+def test_providers_are_part_of_the_cache_key():
+    title = 'Mixwave Logic Pro 10 5 Explained TUTORiAL-SoSISO'
+    assert parse_release(title).provider is None
+    assert parse_release(title, PROVIDERS | {'Mixwave'}).provider == 'Mixwave'
+    assert parse_release(title).provider is None
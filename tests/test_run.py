@@ -0,0 +1,79 @@
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+import json
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from benchmarks.stand_in_site import StandInSite, make_handler
+from run import SITES
+
+ROOT = Path(__file__).resolve().parent.parent
+# run.main in a fresh process, the reactor runs once per process
+# both SITES spiders pointed at the stand-in site, the settings each crawler ran with dumped to a file
+DRIVER = """
+import argparse, json, sys
+from pathlib import Path
+sys.path[:0] = [{root!r}, {benchmarks!r}]
+import run
+from bench_crawl import bench_spider_class
+
+base, summary, settings_out, metrics_dir = sys.argv[1:]
+run.SITES = {{site: (bench_spider_class(site, base, metrics_dir), site_settings)
+             for site, (_, site_settings) in run.SITES.items()}}
+crawlers = {{}}
+site_crawler = run.site_crawler
+
+
+def recording_site_crawler(process, site, *args, **kwargs):
+    crawlers[site] = site_crawler(process, site, *args, **kwargs)
+    return crawlers[site]
+
+
+run.site_crawler = recording_site_crawler
+status = run.main(argparse.Namespace(sites=[], set=['LOG_LEVEL=WARNING'], summary=Path(summary)))
+Path(settings_out).write_text(json.dumps({{
+    site: {{name: crawler.settings.get(name) for name in (
+        'CONCURRENT_REQUESTS_PER_DOMAIN', 'DOWNLOAD_DELAY', 'AUTOTHROTTLE_MAX_DELAY', 'LOG_LEVEL', 'STORE_PATH')}}
+    for site, crawler in crawlers.items()}}))
+sys.exit(status)
+""".format(root=str(ROOT), benchmarks=str(ROOT / 'benchmarks'))
+
+
+@pytest.fixture
+def stand_in():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(StandInSite(pages=1, per_page=3)))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield "http://127.0.0.1:{}".format(server.server_address[1])
+    server.shutdown()
+    server.server_close()
+
+
+def test_run_crawls_every_site_with_its_settings(stand_in, tmp_path):
+    summary, settings_out = tmp_path / 'out' / 'run_summary.json', tmp_path / 'settings.json'
+    subprocess.run([sys.executable, '-c', DRIVER, stand_in, str(summary), str(settings_out), str(tmp_path)],
+                   check=True, cwd=str(tmp_path), timeout=120)
+
+    settings = json.loads(settings_out.read_text())
+    for site, (_, site_settings) in SITES.items():
+        for name in ('CONCURRENT_REQUESTS_PER_DOMAIN', 'DOWNLOAD_DELAY', 'AUTOTHROTTLE_MAX_DELAY'):
+            assert settings[site][name] == site_settings[name]
+        # -s overrides every site, the spider custom_settings are kept below them
+        assert settings[site]['LOG_LEVEL'] == 'WARNING'
+        assert settings[site]['STORE_PATH'] == ''
+
+    report = json.loads(summary.read_text())
+    assert set(report['spiders']) == {'learningdl', 'scene_rls'}
+    learningdl, scene_rls = report['spiders']['learningdl'], report['spiders']['scene_rls']
+    assert learningdl['finish_reason'] == scene_rls['finish_reason'] == 'finished'
+    # one list page and its three articles, one list page per category
+    assert learningdl['response_received_count'] == 4
+    assert learningdl.get('item_scraped_count', 0) + learningdl.get('item_dropped_count', 0) == 3
+    assert scene_rls['response_received_count'] == 2
+    assert scene_rls.get('item_scraped_count', 0) + scene_rls.get('item_dropped_count', 0) == 6
+    assert learningdl['status'] == {'200': 4}
+    assert scene_rls['status'] == {'200': 2}
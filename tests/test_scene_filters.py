@@ -0,0 +1,83 @@
+import json
+import os
+
+import pytest
+
+from scene_filters import RuleSet
+
+RULES = {
+    'learning_platforms': ['Udemy', 'Ask Video'],
+    'keywords': ['keygen', 'WAV-EXPANSION ', '-ROBOTS'],
+    'group_whitelist': ['ADSR'],
+    'group_blacklist': ['rG', 'CSE-V', 'ADSR'],
+}
+
+
+def _rules(tmp_path, rules=RULES):
+    path = tmp_path / 'scene_rules.json'
+    path.write_text(json.dumps(rules), encoding='utf8')
+    return RuleSet(path, reload_interval=0)
+
+
+@pytest.mark.parametrize('title, expected', [
+    ('Udemy Learn Django 2 for Beginners BOOKWARE-SOFTiMAGE', ('learning_platforms', 'Udemy')),
+    ('ask video Logic Pro 101 TUTORiAL-SoSISO', ('learning_platforms', 'Ask Video')),
+    ('A Short Hike v1 7 7 Linux-rG', ('group_blacklist', 'rG')),
+    # groups containing '-' match on the last word
+    ('Serato DJ Pro Suite v2 3 8 CSE-V', ('group_blacklist', 'CSE-V')),
+    # group rules are case sensitive
+    ('A Short Hike v1 7 7 Linux-RG', None),
+    ('WinImage Pro v10 0 Win64 Incl KEYGEN-XCODE', ('keywords', 'keygen')),
+    # a trailing space in a keyword also matches the end of the title
+    ('Soundbox Jackin House and Tech WAV-EXPANSION', ('keywords', 'WAV-EXPANSION ')),
+    ('Soundbox Jackin House and Tech WAV-EXPANSIONS', None),
+    # a whitelisted group skips the group blacklist only
+    ('Arturia V 103 The Buchla Easel V Explored TUTORiAL-ADSR', None),
+    ('Arturia Keygen TUTORiAL-ADSR', ('keywords', 'keygen')),
+    ('Pluralsight com Docker Deep Dive-ELOHiM', None),
+])
+def test_evaluate(tmp_path, title, expected):
+    assert _rules(tmp_path).evaluate(title) == expected
+
+
+def test_empty_rule_lists(tmp_path):
+    assert _rules(tmp_path, {}).evaluate('Udemy Learn Django 2 Keygen-rG') is None
+
+
+def test_reload_on_change(tmp_path):
+    rules = _rules(tmp_path)
+    assert rules.evaluate('Tornado Driver-DARKZER0') is None
+    path = tmp_path / 'scene_rules.json'
+    path.write_text(json.dumps(dict(RULES, group_blacklist=['DARKZER0'])), encoding='utf8')
+    os.utime(path, (rules.mtime + 1, rules.mtime + 1))
+    assert rules.evaluate('Tornado Driver-DARKZER0') == ('group_blacklist', 'DARKZER0')
+
+
+def test_broken_rules_file_keeps_previous_rules(tmp_path):
+    rules = _rules(tmp_path)
+    path = tmp_path / 'scene_rules.json'
+    path.write_text('{"group_blacklist": [', encoding='utf8')
+    os.utime(path, (rules.mtime + 1, rules.mtime + 1))
+    assert rules.evaluate('A Short Hike v1 7 7 Linux-rG') == ('group_blacklist', 'rG')
+
+
+@pytest.mark.parametrize('title, expected', [
+    ('Learn Docker with Udemy-XCODE', ('learning_platforms', 'Udemy')),
+    ('Synth Programming 101 from ask video TUTORiAL-SoSISO', ('learning_platforms', 'Ask Video')),
+    # whole words only
+    ('Udemyx Learn Docker-XCODE', None),
+    ('Learn Docker with MyUdemy-XCODE', None),
+])
+def test_learning_platform_anywhere_in_the_title(tmp_path, title, expected):
+    assert _rules(tmp_path).evaluate(title) == expected
+
+
+def test_learning_platforms_are_providers_of_their_rule_set_only(tmp_path):
+    title = 'Mixwave Drum Mixing Masterclass TUTORiAL-SoSISO'
+    rules = _rules(tmp_path, dict(RULES, learning_platforms=['Mixwave']))
+    assert rules.release(title).provider == 'Mixwave'
+    path = tmp_path / 'scene_rules.json'
+    path.write_text(json.dumps(RULES), encoding='utf8')
+    os.utime(path, (rules.mtime + 1, rules.mtime + 1))
+    assert rules.release(title).provider is None
+    assert _rules(tmp_path).release(title).provider is None
@@ -0,0 +1,75 @@
+from datetime import timedelta
+
+from lxml import html
+from scrapy import Request
+from scrapy.http import HtmlResponse
+from scrapy.settings import Settings
+
+from benchmarks.stand_in_site import StandInSite, TITLES
+from common import Article, size_to_bytes
+from scene_rls import SceneRlsSpider, post_id
+
+BASE = 'http://127.0.0.1:8000'
+LIST_URL = BASE + '/scene/?cat=51'
+
+
+def _spider(window=4):
+    spider = SceneRlsSpider()
+    spider.settings = Settings(dict(SceneRlsSpider.custom_settings, PAGINATION_WINDOW=window))
+    return spider
+
+
+def _parse(spider, site, page=1):
+    body = site.scene_list(BASE, '51', page)
+    response = HtmlResponse(LIST_URL, body=body.encode('utf8'), encoding='utf8', request=Request(LIST_URL))
+    output = list(spider.parse(response))
+    return [o for o in output if isinstance(o, Article)], [o for o in output if isinstance(o, Request)]
+
+
+def test_parse_fields_and_window_requests():
+    site = StandInSite(pages=3, per_page=10)
+    items, requests = _parse(_spider(), site)
+    assert [item.id for item in items] == [str(100000 + i) for i in range(10)]
+    first = items[0]
+    assert first.url == BASE + '/scene/100000/'
+    assert first.title == TITLES[0]
+    assert first.cat == 'Apps'
+    assert first.size == size_to_bytes('50 MB')
+    assert first.tags == ('Tutorial', 'eLearning')
+    slug = TITLES[0].replace(' ', '.')
+    assert first.links == ('https://rapidgator.net/file/186a0/{}.rar.html'.format(slug),
+                           'https://nitroflare.com/view/186A0/{}.rar'.format(slug))
+    assert [r.url for r in requests] == [BASE + '/scene/?cat=51&paged={}'.format(n) for n in (2, 3, 4, 5)]
+
+
+def test_parse_serial_follows_next_page():
+    site = StandInSite(pages=3, per_page=10)
+    _, requests = _parse(_spider(window=1), site)
+    assert [r.url for r in requests] == [BASE + '/scene/?cat=51&paged=2']
+
+
+def test_parse_stops_at_cutoff():
+    # one post every 1.5 day: the 8th post of the page is past MAX_TIMEDELTA
+    site = StandInSite(pages=3, per_page=10, span=timedelta(days=45))
+    spider = _spider()
+    items, requests = _parse(spider, site)
+    assert [item.id for item in items] == [str(100000 + i) for i in range(7)]
+    assert spider.too_old_article == 3
+    assert requests == []
+
+
+def test_parse_skips_unchanged_page():
+    site = StandInSite(pages=3, per_page=10)
+    body = site.scene_list(BASE, '51', 1).encode('utf8')
+    response = HtmlResponse(LIST_URL, body=body, request=Request(LIST_URL), flags=['not_modified'])
+    assert list(_spider().parse(response)) == []
+
+
+def test_post_id():
+    post = html.fromstring('<div class="post" id="post-4242"></div>')
+    assert post_id(post, 'http://apps.scene-rls.net/?p=7') == '4242'
+    post = html.fromstring('<div class="post"></div>')
+    assert post_id(post, 'http://apps.scene-rls.net/?p=7') == '7'
+    assert post_id(post, 'http://apps.scene-rls.net/scene/123/') == '123'
+    assert post_id(post, 'http://apps.scene-rls.net/some-release-name/') is None
+    assert post_id(post, None) is None
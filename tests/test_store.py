@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta, timezone
+import json
+
+import pytest
+
+from common import Article
+from store import ItemStore, ingest, item_row
+
+# as written by the baseline spiders: 'data_%(name)s_%(time)s_.json' feeds in the jsonlines format
+BASELINE_ITEMS = [
+    {'title': 'Pluralsight com Docker Deep Dive-ELOHiM', 'links': ['https://rapidgator.net/file/a'],
+     'date': '2021-03-01T10:00:00+00:00', 'url': 'https://www.learningdl.net/docker-deep-dive/', 'id': 'post-1'},
+    {'title': 'Packt Kubernetes Fundamentals-XCODE', 'links': ['https://rapidgator.net/file/b'],
+     'date': '2021-03-02T08:30:00+02:00', 'url': 'https://www.learningdl.net/kubernetes/', 'id': 'post-2'},
+]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ItemStore.open(str(tmp_path / 'items.sqlite'))
+    yield store
+    store.close()
+
+
+def test_ingest_baseline_jsonlines_feed(tmp_path, store):
+    feed = tmp_path / 'data_learningdl_2021-03-02T09-00-00_.json'
+    feed.write_text("".join(json.dumps(item) + "\n" for item in BASELINE_ITEMS), encoding='utf8')
+    assert ingest(store, [feed]) == 2
+    rows = {row['id']: row for row in store.search(site='learningdl')}
+    assert rows['post-1']['title'] == 'Pluralsight com Docker Deep Dive-ELOHiM'
+    assert rows['post-1']['date'] == '2021-03-01 10:00:00'
+    # in UTC
+    assert rows['post-2']['date'] == '2021-03-02 06:30:00'
+    assert [row['id'] for row in store.search('docker')] == ['post-1']
+
+
+def test_ingest_json_array_feed(tmp_path, store):
+    feed = tmp_path / 'data_learningdl_2021-03-02T09-00-00_.json'
+    feed.write_text(json.dumps(BASELINE_ITEMS, indent=2), encoding='utf8')
+    assert ingest(store, [feed]) == 2
+
+
+def test_feed_and_crawled_dates_match():
+    published = datetime(2021, 3, 2, 8, 30, tzinfo=timezone(timedelta(hours=2)))
+    crawled = item_row(Article(url=BASELINE_ITEMS[1]['url'], date=published), 'learningdl')
+    fed = item_row(BASELINE_ITEMS[1], 'learningdl')
+    assert crawled['key'] == fed['key']
+    assert crawled['date'] == fed['date'] == '2021-03-02 06:30:00'
+
+
+def test_naive_dates_are_kept_as_published():
+    # scene_rls dates carry no offset
+    row = item_row(Article(url='http://apps.scene-rls.net/x/', date=datetime(2021, 3, 2, 8, 30)), 'scene_rls')
+    assert row['date'] == '2021-03-02 08:30:00'
+    assert item_row({'url': 'http://apps.scene-rls.net/x/', 'date': '2021-03-02 08:30:00'}, 'scene_rls')['date'] \
+        == '2021-03-02 08:30:00'
@@ -0,0 +1,333 @@
+from concurrent.futures import Future
+from pathlib import Path
+import errno
+import os
+import zipfile
+
+import pytest
+
+from archive_backends import open_archive
+import unrar_batch
+from unrar_batch import (ExtractionPool, Job, SetTracker, SpacePlanner, copy_file, extract_verified, index_sets,
+                         move_path, mv_list, process_set, rar_volume_follows, run_serial, volume_key)
+
+
+ALL_FORMATS = ('rar', 'zip', '7z', 'tar')
+
+
+@pytest.mark.parametrize('filename, expected', [
+    ('set.part1.rar', (('part', 'set'), 0)),
+    ('set.part02.rar', (('part', 'set'), 1)),
+    ('Set.PART10.RAR', (('part', 'Set'), 9)),
+    ('set.rar', (('old', 'set'), 0)),
+    ('set.r00', (('old', 'set'), 1)),
+    ('set.r99', (('old', 'set'), 100)),
+    ('set.s00', (('old', 'set'), 101)),
+    ('set.z01', (('old', 'set'), 802)),
+    ('set.txt', None),
+    ('set.r0', None),
+    # other formats only when asked for
+    ('set.zip', None),
+    ('set.7z', None),
+    ('set.tar.gz', None),
+])
+def test_volume_key(filename, expected):
+    assert volume_key(filename) == expected
+
+
+@pytest.mark.parametrize('filename, formats, expected', [
+    ('set.zip', ALL_FORMATS, (('single', 'set.zip'), 0)),
+    ('set.part1.zip', ALL_FORMATS, (('single', 'set.part1.zip'), 0)),
+    ('set.tar.gz', ('rar', 'tar'), (('single', 'set.tar.gz'), 0)),
+    ('set.tar.gz', ('rar', 'zip'), None),
+    ('set.7z', ('7z',), (('single', 'set.7z'), 0)),
+    ('set.part1.rar', ('zip',), None),
+    ('set.r00', ('zip',), None),
+])
+def test_volume_key_formats(filename, formats, expected):
+    assert volume_key(filename, formats) == expected
+
+
+def _index(names, formats=ALL_FORMATS, size=100):
+    """ {set name: (volume names, missing volume numbers)} of index_sets over names in one directory """
+    sets = index_sets(((Path('in', name), size) for name in names), formats)
+    return {vs.name: ([p.name for p in vs.volumes], vs.missing) for vs in sets}
+
+
+@pytest.mark.parametrize('names, expected', [
+    # new style volumes, in volume order whatever the listing order
+    (['a.part2.rar', 'a.part1.rar', 'a.part3.rar'],
+     {'a': (['a.part1.rar', 'a.part2.rar', 'a.part3.rar'], [])}),
+    (['a.part1.rar', 'a.part3.rar'], {'a': (['a.part1.rar', 'a.part3.rar'], [1])}),
+    # old style volumes follow their .rar head
+    (['b.r01', 'b.rar', 'b.r00'], {'b': (['b.rar', 'b.r00', 'b.r01'], [])}),
+    (['b.r00', 'b.r01'], {'b': (['b.r00', 'b.r01'], [0])}),
+    # split zip volumes are no old style RAR set
+    (['c.z01', 'c.z02', 'c.zip'], {'c.zip': (['c.zip'], [])}),
+    (['c.z01', 'c.z02'], {}),
+    # single files, and two sets side by side
+    (['d.rar'], {'d': (['d.rar'], [])}),
+    (['e.7z', 'a.part1.rar', 'notes.txt'], {'a': (['a.part1.rar'], []), 'e.7z': (['e.7z'], [])}),
+])
+def test_index_sets(names, expected):
+    assert _index(names) == expected
+
+
+def test_index_sets_rar_only_by_default():
+    sets = index_sets((Path('in', name), 100) for name in ('a.part1.rar', 'c.zip', 'c.z01', 'e.7z', 'f.tar'))
+    assert [vs.name for vs in sets] == ['a']
+
+
+def _zip(path, files, compression=zipfile.ZIP_STORED):
+    with zipfile.ZipFile(path, 'w', compression) as zf:
+        for name, data in files.items():
+            zf.writestr(name, data)
+    return path
+
+
+def test_extract_verified_promotes_the_output(tmp_path):
+    path = _zip(tmp_path / 'course.zip', {'course/01.txt': b'one', 'course/02.txt': b'two'})
+    out = tmp_path / 'out'
+    with open_archive(path) as archive:
+        assert extract_verified(archive, out)
+    assert sorted(str(p.relative_to(out)) for p in out.rglob('*')) == ['course', 'course/01.txt', 'course/02.txt']
+
+
+def test_extract_verified_discards_a_bad_crc(tmp_path):
+    path = _zip(tmp_path / 'course.zip', {'course/01.txt': b'one' * 100, 'course/02.txt': b'abcdefgh' * 100})
+    path.write_bytes(path.read_bytes().replace(b'abcdefgh', b'abcdefgX', 1))
+    out = tmp_path / 'out'
+    with open_archive(path) as archive:
+        assert not extract_verified(archive, out)
+    # neither the members extracted before the bad one nor the staging directory
+    assert list(out.iterdir()) == []
+
+
+def test_extract_verified_never_overwrites(tmp_path):
+    path = _zip(tmp_path / 'course.zip', {'course/01.txt': b'new'})
+    out = tmp_path / 'out'
+    out.joinpath('course').mkdir(parents=True)
+    out.joinpath('course', '01.txt').write_bytes(b'old')
+    with open_archive(path) as archive:
+        assert not extract_verified(archive, out)
+    assert out.joinpath('course', '01.txt').read_bytes() == b'old'
+    assert [p.name for p in out.iterdir()] == ['course']
+
+
+@pytest.fixture
+def free_space(monkeypatch):
+    """ free bytes of the target volume, as seen by SpacePlanner """
+    free = {'bytes': 1000}
+    monkeypatch.setattr(unrar_batch, 'get_Available_space', lambda path_obj: free['bytes'])
+    return free
+
+
+def test_space_planner_reservations(tmp_path, free_space):
+    planner = SpacePlanner(tmp_path)
+    assert planner.reserve('a', 600)
+    # 400 left for the others
+    assert not planner.reserve('b', 500)
+    assert planner.reserve('c', 400)
+    assert planner.available() == 0
+    planner.release('a')
+    assert planner.reserve('b', 500)
+    planner.release('unknown')
+    free_space['bytes'] = 800
+    assert planner.available() == -100
+
+
+def test_run_serial_skips_sets_that_do_not_fit(tmp_path, free_space, monkeypatch):
+    ran = []
+    monkeypatch.setattr(unrar_batch, 'process_set', lambda path_elem, *args: ran.append(path_elem) or 'success')
+    planner = SpacePlanner(tmp_path)
+    jobs = [Job(Path('small.part1.rar'), [], tmp_path, uncompressed=500),
+            Job(Path('big.part1.rar'), [], tmp_path, uncompressed=5000)]
+    assert list(run_serial(jobs, planner)) == [(Path('small.part1.rar'), 'success'), (Path('big.part1.rar'), None)]
+    assert ran == [Path('small.part1.rar')]
+    assert planner.reserved == {}
+
+
+class _Executor:
+    """ stands in for the process pool, the test ends the jobs """
+
+    def __init__(self):
+        self.futures = {}
+
+    def submit(self, fn, path_elem, *args):
+        future = self.futures[path_elem.name] = Future()
+        return future
+
+    def shutdown(self):
+        pass
+
+
+def _pool(workers, planner, per_device, monkeypatch):
+    # the device is the first letter of the set name
+    monkeypatch.setattr(unrar_batch, 'device_of', lambda path_obj: path_obj.name[0])
+    pool = ExtractionPool(workers, planner, per_device)
+    pool.executor.shutdown()
+    pool.executor = _Executor()
+    return pool
+
+
+def _job(name, uncompressed=100):
+    return Job(Path(name), [Path(name)], Path('_peon'), uncompressed=uncompressed)
+
+
+def test_pool_caps_extractions_per_device(tmp_path, free_space, monkeypatch):
+    pool = _pool(4, SpacePlanner(tmp_path), 1, monkeypatch)
+    for name in ('a1.rar', 'a2.rar', 'b1.rar'):
+        pool.submit(_job(name))
+    # one per device
+    assert sorted(pool.executor.futures) == ['a1.rar', 'b1.rar']
+    assert len(pool) == 3
+    pool.executor.futures['a1.rar'].set_result('success')
+    assert pool.results(timeout=0) == [(Path('a1.rar'), 'success')]
+    assert sorted(pool.executor.futures) == ['a1.rar', 'a2.rar', 'b1.rar']
+    pool.executor.futures['b1.rar'].set_exception(RuntimeError("worker died"))
+    assert pool.results(timeout=0) == [(Path('b1.rar'), 'error')]
+    assert len(pool) == 1
+
+
+def test_pool_waits_for_free_space(tmp_path, free_space, monkeypatch):
+    planner = SpacePlanner(tmp_path)
+    pool = _pool(4, planner, None, monkeypatch)
+    # smallest first, the second does not fit next to the first
+    pool.submit(_job('a1.rar', 600))
+    pool.submit(_job('b1.rar', 700))
+    pool.submit(_job('c1.rar', 5000))
+    assert list(pool.executor.futures) == ['a1.rar']
+    pool.executor.futures['a1.rar'].set_result('success')
+    assert pool.results(timeout=0) == [(Path('a1.rar'), 'success')]
+    assert list(pool.executor.futures) == ['a1.rar', 'b1.rar']
+    pool.executor.futures['b1.rar'].set_result('success')
+    assert pool.results(timeout=0) == [(Path('b1.rar'), 'success')]
+    # never fits, even with nothing running
+    assert pool.results(timeout=0) == [(Path('c1.rar'), None)]
+    assert len(pool) == 0 and planner.reserved == {}
+
+
+@pytest.fixture
+def cross_device(monkeypatch):
+    """ os.rename failing like across filesystems """
+    def rename(src, dst):
+        raise OSError(errno.EXDEV, "Invalid cross-device link")
+    monkeypatch.setattr(os, 'rename', rename)
+
+
+def test_copy_file(tmp_path):
+    src = tmp_path / 'a.part1.rar'
+    src.write_bytes(os.urandom(300000))
+    os.utime(src, (1600000000, 1600000000))
+    dst = copy_file(src, tmp_path / 'copy.rar')
+    assert dst.read_bytes() == src.read_bytes()
+    assert dst.stat().st_mtime == 1600000000
+
+
+def test_move_path_renames(tmp_path):
+    src = tmp_path / 'a.part1.rar'
+    src.write_bytes(b'volume')
+    inode = src.stat().st_ino
+    dst_dir = tmp_path / '_peon'
+    dst_dir.mkdir()
+    dst = move_path(src, dst_dir)
+    assert dst == dst_dir / 'a.part1.rar' and not src.exists()
+    assert dst.stat().st_ino == inode
+
+
+def test_move_path_copies_across_devices(tmp_path, cross_device):
+    src = tmp_path / 'a.part1.rar'
+    src.write_bytes(b'volume' * 1000)
+    folder = tmp_path / 'course'
+    folder.joinpath('sub').mkdir(parents=True)
+    folder.joinpath('sub', '01.txt').write_bytes(b'one')
+    dst_dir = tmp_path / '_peon'
+    dst_dir.mkdir()
+    assert move_path(src, dst_dir).read_bytes() == b'volume' * 1000
+    assert move_path(folder, dst_dir).joinpath('sub', '01.txt').read_bytes() == b'one'
+    assert not src.exists() and not folder.exists()
+    assert sorted(p.name for p in dst_dir.iterdir()) == ['a.part1.rar', 'course']
+
+
+def test_move_path_never_overwrites(tmp_path, cross_device):
+    src = tmp_path / 'a.part1.rar'
+    src.write_bytes(b'new')
+    dst_dir = tmp_path / '_peon'
+    dst_dir.mkdir()
+    dst_dir.joinpath('a.part1.rar').write_bytes(b'old')
+    with pytest.raises(FileExistsError):
+        move_path(src, dst_dir)
+    assert src.read_bytes() == b'new' and dst_dir.joinpath('a.part1.rar').read_bytes() == b'old'
+    assert mv_list([src], dst_dir) == [False]
+
+
+def test_delete_parts(tmp_path):
+    path = _zip(tmp_path / 'course.zip', {'course/01.txt': b'one'})
+    working_path = tmp_path / '_peon'
+    working_path.mkdir()
+    assert process_set(path, [path], working_path, delete_parts=True) == 'success'
+    assert not path.exists()
+    assert [p.name for p in working_path.iterdir()] == ['course']
+
+
+RAR5_HEAD = b'Rar!\x1a\x07\x01\x00' + b'\0' * 64
+RAR4_HEAD = b'Rar!\x1a\x07\x00' + b'\0' * 64
+
+
+@pytest.mark.parametrize('content, expected', [
+    # RAR 5 end of archive: CRC32, size 3, type 5, header flags 0, end flags
+    (RAR5_HEAD + b'\x1d\x77\x56\x51\x03\x05\x00\x01', True),
+    (RAR5_HEAD + b'\x1d\x77\x56\x51\x03\x05\x00\x00', False),
+    # RAR 1.5-4 end of archive: CRC16, type 0x7b, flags, size 7
+    (RAR4_HEAD + b'\xc4\x3d\x7b\x01\x40\x07\x00', True),
+    (RAR4_HEAD + b'\xc4\x3d\x7b\x00\x40\x07\x00', False),
+    # still being written
+    (RAR5_HEAD, None),
+])
+def test_rar_volume_follows(tmp_path, content, expected):
+    path = tmp_path / 'a.part1.rar'
+    path.write_bytes(content)
+    assert rar_volume_follows(path) is expected
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(unrar_batch.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_set_tracker_polling(tmp_path, clock):
+    for name in ('a.part1.rar', 'a.part2.rar'):
+        tmp_path.joinpath(name).write_bytes(RAR5_HEAD)
+    # never complete
+    for name in ('b.part1.rar', 'b.part3.rar'):
+        tmp_path.joinpath(name).write_bytes(RAR5_HEAD)
+    tracker = SetTracker(settle=10.0)
+    tracker.scan(tmp_path)
+    clock[0] += 5
+    assert tracker.ready() == []
+    clock[0] += 5
+    assert [vs.name for vs in tracker.ready()] == ['a']
+    # once until one of its files changes
+    assert tracker.ready() == []
+    tmp_path.joinpath('a.part2.rar').write_bytes(RAR5_HEAD + b'more')
+    tracker.scan(tmp_path)
+    clock[0] += 9
+    assert tracker.ready() == []
+    clock[0] += 1
+    assert [vs.name for vs in tracker.ready()] == ['a']
+
+
+def test_set_tracker_waits_for_the_last_volume(tmp_path, clock):
+    tmp_path.joinpath('a.part1.rar').write_bytes(RAR5_HEAD + b'\x1d\x77\x56\x51\x03\x05\x00\x01')
+    last = tmp_path.joinpath('a.part2.rar')
+    # announces a third volume
+    last.write_bytes(RAR5_HEAD + b'\x1d\x77\x56\x51\x03\x05\x00\x01')
+    tracker = SetTracker(settle=0.0)
+    tracker.scan(tmp_path)
+    assert tracker.ready() == []
+    # rewritten as the last one
+    last.write_bytes(RAR5_HEAD + b'\x1d\x77\x56\x51\x03\x05\x00\x00')
+    tracker.scan(tmp_path)
+    assert [vs.name for vs in tracker.ready()] == ['a']
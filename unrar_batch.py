@@ -1,91 +1,232 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-from unrar import rarfile
-from unrar.unrarlib import MissingPassword, UnrarException
 from hurry.filesize import size
 #import patoolib, pyunpack
+from bisect import insort
+from collections import Counter
+from itertools import count
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
 from pathlib import Path
 from pprint import pprint
+from typing import NamedTuple, Optional
 import argparse
 import colorlog
+import errno
+import json
 import logging
+import os
 import shutil
-import time
 import re
-
-
-def get_rar_list_from_dir(path=".", g="*.rar"):
-    if isinstance(path,Path):
-        p = path
-    elif isinstance(path,str):
-        p = Path(path)
-    files = sorted((path.glob('*.rar')))
-    return files
-
-
-def filterMultiPart(path_list):
-    regex = r"^(?!.*part0*(?:[2-9]\d*|[1-9]\d+)\.rar)(.+)\.rar$"
-    r = re.compile(regex, re.MULTILINE)
-    return list(filter(lambda x: r.match(x.name), path_list))
-
-
-def getAllParts(path_list, path_obj):
-    TEXTO = re.compile(r"^(.*?)(?:part\d*)?\.rar$", re.MULTILINE).match(path_obj.name).groups()[0]
-    pattern = rf"({re.escape(TEXTO)})(?:part\d*)?\.rar"
-    logger.debug("regex", pattern)
-    r = re.compile(pattern)
-    return list(filter(lambda x: r.match(x.name), path_list))
-
-
-def get_RarFile(path_obj):
-    p = str(path_obj.absolute())
-    if rarfile.is_rarfile(p):
-        try:
-            return rarfile.RarFile(p)
-        except (MissingPassword, RuntimeError, UnrarException) as e:
-            logger.exception(f"RuntimeError {type(e)} {str(e)} {p}")
-        except Exception as e:
-            logger.exception(f"Exception {type(e)} {str(e)} {p}")
-    logger.error(f"Not a RAR file {path_obj.absolute()}")
+import signal
+import sys
+import tempfile
+import threading
+import time
+try:
+    from watchdog.observers import Observer
+except ImportError:
+    # --watch polls the input directory instead
+    Observer = None
+
+from archive_backends import BACKENDS, BUFFER_SIZE, FORMAT_BACKENDS, ArchiveError, open_archive
+from archive_meta import ArchiveMeta, MetaCache
+from batch_profile import (PROFILERS, PhaseRecorder, ProfileOptions, append_trace, format_summary, profiled,
+                           start_trace, write_summary)
+from extract_journal import Journal
+
+logger = logging.getLogger(__name__)
+
+
+PART_RE = re.compile(r"^(?P<name>.+)\.part(?P<number>\d+)\.rar$", re.IGNORECASE)
+# name.rar, then name.r00 .. name.r99, name.s00 ..
+OLD_STYLE_RE = re.compile(r"^(?P<name>.+)\.(?:(?P<rar>rar)|(?P<letter>[r-z])(?P<number>\d\d))$", re.IGNORECASE)
+# volume number of name.z00, from there on the old style names are also those of split zip volumes
+OLD_STYLE_Z00 = 1 + (ord('z') - ord('r')) * 100
+# single file archives of the other backends, picked up only when their format is asked for
+SINGLE_RE = re.compile(r"^(?P<name>.+)\.(?P<ext>zip|7z|tar|tgz|tar\.gz|tar\.bz2|tar\.xz)$", re.IGNORECASE)
+SINGLE_FORMATS = {'zip': 'zip', '7z': '7z', 'tar': 'tar', 'tgz': 'tar', 'tar.gz': 'tar', 'tar.bz2': 'tar',
+                  'tar.xz': 'tar'}
+FORMATS = ('rar',)
+
+
+def volume_key(filename, formats=FORMATS):
+    """ ((naming, set name), volume number from 0) of an archive volume file name, None for other files
+    formats: the archive formats to pick up, 'rar' volume sets and 'zip', '7z', 'tar' single files """
+    if 'rar' in formats:
+        m = PART_RE.match(filename)
+        if m:
+            return ('part', m['name']), int(m['number']) - 1
+        m = OLD_STYLE_RE.match(filename)
+        if m:
+            if m['rar']:
+                return ('old', m['name']), 0
+            return ('old', m['name']), 1 + (ord(m['letter'].lower()) - ord('r')) * 100 + int(m['number'])
+    m = SINGLE_RE.match(filename)
+    if m and SINGLE_FORMATS[m['ext'].lower()] in formats:
+        return ('single', filename), 0
+    return None
+
+
+@dataclass
+class VolumeSet:
+    """ volumes of one archive set, in volume order, with what is wrong with them """
+    name: str
+    volumes: list
+    sizes: list
+    # volume numbers absent from the sequence, the first volume included
+    missing: list = field(default_factory=list)
+    empty: list = field(default_factory=list)
+    # volumes before the last one smaller than the first, which all RAR volumes but the last match
+    short: list = field(default_factory=list)
+
+    @classmethod
+    def from_volumes(cls, name, numbered):
+        """ numbered: {volume number: (path, size)} """
+        numbers = sorted(numbered)
+        vs = cls(name, [numbered[n][0] for n in numbers], [numbered[n][1] for n in numbers])
+        vs.missing = sorted(set(range(numbers[-1] + 1)) - set(numbers))
+        vs.empty = [path for path, size in zip(vs.volumes, vs.sizes) if size == 0]
+        vs.short = [path for path, size in zip(vs.volumes[1:-1], vs.sizes[1:-1]) if 0 < size < vs.sizes[0]]
+        return vs
+
+    @property
+    def first(self):
+        return self.volumes[0]
+
+    @property
+    def complete(self):
+        return not (self.missing or self.empty or self.short)
+
+    def problems(self):
+        return ", ".join(f"{label} {values}" for label, values in (
+            ('missing volumes', [n + 1 for n in self.missing]), ('empty', [p.name for p in self.empty]),
+            ('short', [p.name for p in self.short])) if values)
+
+
+def index_sets(paths, formats=FORMATS):
+    """ group RAR volume paths into VolumeSets sorted by name, each path name parsed once
+    old style volumes without a name.rar head holding a .zNN are split zip volumes, not a RAR set """
+    groups = {}
+    for path, size in paths:
+        key = volume_key(path.name, formats)
+        if key is not None:
+            groups.setdefault((path.parent, key[0]), {})[key[1]] = (path, size)
+    return [VolumeSet.from_volumes(name, numbered)
+            for (_, (naming, name)), numbered in sorted(groups.items(), key=lambda kv: (kv[0][0], kv[0][1][1]))
+            if not (naming == 'old' and 0 not in numbered and max(numbered) >= OLD_STYLE_Z00)]
+
+
+def scan_sets(path=".", formats=FORMATS):
+    """ VolumeSets of a directory, from a single os.scandir pass """
+    with os.scandir(path) as it:
+        return index_sets(((Path(entry.path), entry.stat().st_size) for entry in it if entry.is_file()), formats)
+
+
+def get_RarFile(path_obj, archive_options=None, progress=None):
+    """ the set opened by an archive_backends backend, archive_options: open_archive backends / buffer_size """
+    try:
+        return open_archive(path_obj.absolute(), progress=progress, **(archive_options or {}))
+    except (ArchiveError, OSError) as e:
+        logger.error(f"Cannot open {path_obj.absolute()}: {e}")
 
 
 def checkRAR(rarf, path):
+    """ None when the set tests fine, else the failing member or the exception """
     try:
-        logger.info(f"Trying  testrar() {rarf.filename}")
-        ko = rarf.testrar()
+        logger.info(f"Trying  testall() {rarf.filename} with {rarf.backend}")
+        ko = rarf.testall()
         if ko is not None:
-            logger.error(f"Problem testrar() {rarf.filename} ==> {str(ko)}")
+            logger.error(f"Problem testall() {rarf.filename} ==> {str(ko)}")
             return ko
-    except (MissingPassword, RuntimeError, UnrarException) as e:
+    except (ArchiveError, OSError) as e:
         logger.exception(f"{type(e)} {str(e)} {rarf.filename}", exc_info=True)
+        return e
 
 
 def extract_rar(rarfilz, path_obj=Path(".")):
     extract_dir = path_obj
     try:
-        logger.info(f"Trying  extractall() {rarfilz.filename}")
-        ret = rarfilz.extractall(path=str(extract_dir.absolute()))
-        # pyunpack.Archive(archive_file).extractall(extract_dir)
-        if ret is None:
-            logger.info(f"extractall OK: {rarfilz.filename}")
-        else:
-            logger.info(f"extractall KO: {ret}")
-    except (MissingPassword, RuntimeError, UnrarException) as e:
-        logger.exception(f"MissingPassword {type(e)} {str(e)} {rarfilz.filename}", exc_info=True)
+        logger.info(f"Trying  extractall() {rarfilz.filename} with {rarfilz.backend}")
+        rarfilz.extractall(path=extract_dir.absolute())
+        logger.info(f"extractall OK: {rarfilz.filename}")
+        return True
+    except (ArchiveError, OSError) as e:
+        logger.exception(f"extractall KO {type(e)} {str(e)} {rarfilz.filename}", exc_info=True)
+    return False
+
+
+def promote(staging, path_obj):
+    """ rename every top level entry of staging into path_obj, none when one of them already exists there """
+    entries = list(staging.iterdir())
+    existing = [entry.name for entry in entries if path_obj.joinpath(entry.name).exists()]
+    if existing:
+        raise FileExistsError(f"Already in {path_obj}: {existing}")
+    for entry in entries:
+        os.rename(entry, path_obj.joinpath(entry.name))
+
+
+def extract_verified(rarfilz, path_obj=Path(".")):
+    """ single pass test and extraction: the backend checks every member CRC (tar has none) while extracting
+    into a staging directory inside path_obj, the output is renamed into path_obj only when the whole set
+    verified """
+    path_obj.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(prefix=f'.staging-{os.getpid()}-', dir=path_obj))
+    try:
+        logger.info(f"Trying  extractall() {rarfilz.filename} with {rarfilz.backend} verifying into {staging.name}")
+        rarfilz.extractall(path=staging.absolute())
+        promote(staging, path_obj)
+        logger.info(f"extractall OK: {rarfilz.filename}")
+        return True
+    except (ArchiveError, OSError) as e:
+        logger.exception(f"Discarding partial output {type(e)} {str(e)} {rarfilz.filename}")
+        return False
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
 
 
-def get_Archive_Compress_Size(rarfilz):
-    return sum([r.compress_size for r in rarfilz.infolist()])
+def clean_stale_staging(path_obj):
+    """ remove the staging directories left by extract_verified in processes that died """
+    for staging in path_obj.glob('.staging-*-*'):
+        pid = int(staging.name.split('-')[1])
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            logger.info(f"Removing stale staging directory {staging}")
+            shutil.rmtree(staging, ignore_errors=True)
+        except PermissionError:
+            pass
+
+
+def read_meta(path_elem, archive_options=None):
+    """ ArchiveMeta of a set from one infolist() pass over its headers, None when no backend can read them """
+    rarf = get_RarFile(path_elem, archive_options)
+    if rarf is None:
+        return None
+    try:
+        with rarf:
+            return ArchiveMeta.from_infolist(rarf.infolist())
+    except ArchiveError as e:
+        logger.error(f"Cannot read the headers of {path_elem}: {e}")
 
 
-def get_Archive_Uncompress_Size(rarfilz):
-    return sum([r.file_size for r in rarfilz.infolist()])
+def set_stamp(vs):
+    """ (total size, latest mtime_ns) of the volumes of a set, what its cached ArchiveMeta is valid for """
+    return sum(vs.sizes), max(p.stat().st_mtime_ns for p in vs.volumes)
 
 
-def get_rootfolder(rarfilz):
-    rootfolder = rarfilz.namelist()[-1]
-    return rootfolder
+def set_meta(vs, cache=None, archive_options=None):
+    """ ArchiveMeta of a VolumeSet, from the cache while its volumes are unchanged """
+    if cache is None:
+        return read_meta(vs.first, archive_options)
+    stamp = set_stamp(vs)
+    meta = cache.get(vs.first, *stamp)
+    if meta is None:
+        meta = read_meta(vs.first, archive_options)
+        if meta is not None:
+            cache.put(vs.first, *stamp, meta)
+    return meta
 
 
 def get_Available_space(path_obj):
@@ -93,64 +234,620 @@ def get_Available_space(path_obj):
     return shutil.disk_usage(path_obj.absolute()).free
 
 
-def is_enough_space_available(rarfilz, path_obj):
-    if get_Archive_Uncompress_Size(rarfilz) < get_Available_space(path_obj):
-        return True
+# bytes per copy_file_range/sendfile call
+COPY_CHUNK = 64 * 1024 * 1024
+
+
+def copy_file(src, dst):
+    """ copy done by the kernel: copy_file_range (server side copy on NFS 4.2 and SMB, reflink on btrfs/XFS),
+    sendfile when the filesystems do not support it, then the permissions and times """
+    copy_range = getattr(os, 'copy_file_range', None)
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        remaining = os.fstat(fsrc.fileno()).st_size
+        offset = 0
+        while remaining > 0:
+            if copy_range is not None:
+                try:
+                    n = copy_range(fsrc.fileno(), fdst.fileno(), min(COPY_CHUNK, remaining), offset)
+                except OSError as e:
+                    if e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+                        raise
+                    copy_range = None
+                    continue
+            else:
+                n = os.sendfile(fdst.fileno(), fsrc.fileno(), offset, min(COPY_CHUNK, remaining))
+            if n == 0:
+                raise OSError(errno.EIO, f"{src} shrank while copied")
+            offset += n
+            remaining -= n
+    shutil.copystat(src, dst)
+    return dst
+
+
+def move_path(src, dst_dir):
+    """ rename src into dst_dir, copy_file then delete across devices, never over an existing entry """
+    dst = dst_dir.joinpath(src.name)
+    if dst.exists():
+        raise FileExistsError(errno.EEXIST, "Destination exists", str(dst))
+    try:
+        os.rename(src, dst)
+        return dst
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+    if src.is_dir() and not src.is_symlink():
+        shutil.copytree(src, dst, symlinks=True, copy_function=copy_file)
+        shutil.rmtree(src)
+        return dst
+    # copied under a temporary name, dst only ever appears complete
+    tmp = dst.with_name(f".{dst.name}.moving")
+    try:
+        copy_file(src, tmp)
+        os.replace(tmp, dst)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    src.unlink()
+    return dst
 
 
 def mv(path_obj_src, path_obj_dst):
-    # shutil.rmtree
-    path_s = str(path_obj_src.absolute())
-    path_d = path_obj_dst
     try:
-        ret = shutil.move(path_s, path_d)
-        tmp = str(Path(ret).absolute())
-        shouldbe = str(path_d.joinpath(path_obj_src.name).absolute())
-        if tmp == shouldbe:
-            return True
-        logger.error(f"{ret} {path_s} to {path_d}")
+        move_path(path_obj_src, path_obj_dst)
+        return True
+    except OSError as e:
+        logger.exception(f"Exception {type(e)} {str(e)} {path_obj_src.absolute()}")
         return False
-    except shutil.Error as e:
-        logger.exception(f"Exception {type(e)} {str(e)} {path_s}")
 
 
-def mv_list(path_obj_list, path_obj_dst):
-    lst = list(map(lambda x: mv(x, path_obj_dst), path_obj_list))
+def rm(path_obj):
+    try:
+        path_obj.unlink()
+        return True
+    except OSError as e:
+        logger.exception(f"Exception {type(e)} {str(e)} {path_obj.absolute()}")
+        return False
+
+
+def mv_list(path_obj_list, path_obj_dst, delete=False, threads=4):
+    """ move, or delete, the files in parallel """
+    with ThreadPoolExecutor(max_workers=max(1, min(threads, len(path_obj_list)))) as pool:
+        if delete:
+            lst = list(pool.map(rm, path_obj_list))
+        else:
+            lst = list(pool.map(lambda x: mv(x, path_obj_dst), path_obj_list))
     if not all(lst):
-        logger.error(f"{path_obj_list} to {path_obj_dst}")
+        logger.error(f"{path_obj_list} {'delete' if delete else 'to ' + str(path_obj_dst)}")
     return lst
 
 
-def main(crt_dir, wrk_dir="_peon/"):
-    PATH = crt_dir
+def device_of(path_obj):
+    """ st_dev of path_obj, or of its closest existing parent """
+    for p in (path_obj, *path_obj.absolute().parents):
+        try:
+            return p.stat().st_dev
+        except FileNotFoundError:
+            continue
+
+
+class Job(NamedTuple):
+    """ process_set arguments """
+    path_elem: Path
+    rar_parts: list
+    working_path: Path
+    single_pass: bool = False
+    uncompressed: Optional[int] = None
+    delete_parts: bool = False
+    journal: Optional[str] = None
+    state: str = 'queued'
+    archive_options: Optional[dict] = None
+    profile: Optional[ProfileOptions] = None
+
+
+class ExtractProgress:
+    """ progress callback of an archive backend, logged every interval seconds """
+
+    def __init__(self, name, total, interval=5.0):
+        self.name = name
+        self.total = total
+        self.interval = interval
+        self.done = 0
+        self.last = time.monotonic()
+
+    def __call__(self, member, nbytes):
+        self.done += nbytes
+        now = time.monotonic()
+        if now - self.last >= self.interval:
+            self.last = now
+            logger.info(f"{self.name}: {size(self.done)}/{size(self.total or 0)} {member.filename}")
+
+
+def process_set(path_elem, rar_parts, working_path, single_pass=False, uncompressed=None, delete_parts=False,
+                journal=None, state='queued', archive_options=None, profile=None):
+    """ test, extract then move (or delete) one archive set: 'success', 'error' or None when skipped
+    single_pass tests while extracting, see extract_verified
+    uncompressed is the size a SpacePlanner already reserved, the free space is checked here without it
+    journal is the path of the Journal recording each step, state the step to resume from
+    archive_options are the open_archive backends / buffer_size
+    profile are the ProfileOptions of --profile, the phases of the set are appended to its trace """
+    jr = Journal(journal) if journal else None
+    rec = PhaseRecorder(str(path_elem), enabled=profile is not None)
+    status = None
+    try:
+        with profiled(profile, path_elem.name, worker=True):
+            status = _process_set(path_elem, rar_parts, working_path, single_pass, uncompressed, delete_parts,
+                                  jr, state, archive_options, rec)
+        return status
+    finally:
+        if jr is not None:
+            jr.close()
+        if profile is not None:
+            append_trace(profile, rec.to_dict(status=status, uncompressed=uncompressed, volumes=len(rar_parts)))
+
+
+def _process_set(path_elem, rar_parts, working_path, single_pass, uncompressed, delete_parts, jr, state,
+                 archive_options, rec):
+    def record(new_state, started=None, error=None):
+        if jr is not None:
+            jr.update(path_elem, new_state, None if started is None else time.monotonic() - started, error)
+
+    if state != 'extracted':
+        with rec.phase('open'):
+            rarf = get_RarFile(path_elem, archive_options)
+        if rarf is None:
+            record('error', error="cannot open the set")
+            return 'error'
+        with rarf:
+            if not single_pass and state == 'queued':
+                started = time.monotonic()
+                rarf.progress = ExtractProgress(f"testing {path_elem.name}", uncompressed)
+                with rec.phase('test', uncompressed or 0):
+                    ok = checkRAR(rarf, path_elem)
+                if ok is not None:
+                    record('error', started, error=f"testall: {ok}")
+                    return 'error'
+                record('verified', started)
+            if uncompressed is None:
+                try:
+                    with rec.phase('headers'):
+                        meta = ArchiveMeta.from_infolist(rarf.infolist())
+                except ArchiveError as e:
+                    record('error', error=str(e))
+                    return 'error'
+                uncompressed = meta.uncompressed
+                logger.info(f"roots={list(meta.roots)} Uncompress={size(uncompressed)}")
+                if not uncompressed < get_Available_space(working_path):
+                    logger.error(f"Not enough space available {path_elem.absolute()}")
+                    return None
+            record('extracting')
+            started = time.monotonic()
+            rarf.progress = ExtractProgress(f"extracting {path_elem.name}", uncompressed)
+            with rec.phase('extract', uncompressed):
+                if single_pass:
+                    extracted = extract_verified(rarf, working_path)
+                else:
+                    extracted = extract_rar(rarf, working_path)
+        if not extracted:
+            record('error', started, error="extraction failed")
+            return 'error'
+        record('extracted', started)
+    logger.info(f"Files to {'delete' if delete_parts else 'move'}: {rar_parts}")
+    started = time.monotonic()
+    with rec.phase('delete' if delete_parts else 'move') as phase:
+        if rec.enabled:
+            phase['payload_bytes'] = sum(p.stat().st_size for p in rar_parts if p.exists())
+        moved = mv_list(rar_parts, working_path, delete=delete_parts)
+    if all(moved):
+        record('moved', started)
+    else:
+        # extracted all right, the next run retries the move
+        failed = [str(p) for p, ok in zip(rar_parts, moved) if not ok]
+        record('extracted', started, error=f"not moved: {failed}")
+    return 'success'
+
+
+class SpacePlanner:
+    """ reservation ledger of the target volume: a set extracts only if its uncompressed size fits in
+    the free space minus what the sets in flight reserved """
+
+    def __init__(self, target):
+        self.target = target
+        self.reserved = {}
+
+    def available(self):
+        return get_Available_space(self.target) - sum(self.reserved.values())
+
+    def reserve(self, key, nbytes):
+        if nbytes > self.available():
+            return False
+        self.reserved[key] = nbytes
+        return True
+
+    def release(self, key):
+        self.reserved.pop(key, None)
+
+
+def plan_jobs(volume_sets, working_path, single_pass=False, delete_parts=False, journal=None, cache=None,
+              archive_options=None, profile=None):
+    """ process_set jobs of the complete sets, smallest uncompressed size first, and (path_elem, status) of the
+    sets skipped: unreadable, or done or failed according to the journal while unchanged since
+    cache is a MetaCache, the headers of a set are read once across runs """
+    jobs, skipped = [], []
+    for vs in volume_sets:
+        state, row = 'queued', None
+        if journal is not None:
+            state, row = journal.resume_state(vs.first, sum(vs.sizes))
+            if state is None:
+                logger.info(f"Skipping {vs.first.name}, {row['state']} in the journal {row['error'] or ''}")
+                skipped.append((vs.first, 'error' if row['state'] == 'error' else None))
+                continue
+        if state != 'queued':
+            uncompressed = row['uncompressed']
+            logger.info(f"Resuming {vs.first.name} after {row['state']}")
+        else:
+            meta = set_meta(vs, cache, archive_options)
+            if meta is None:
+                # not journaled, read again by the next run
+                skipped.append((vs.first, 'error'))
+                continue
+            uncompressed = meta.uncompressed
+            logger.info(f"{vs.first.name}: {meta.entries} entries, roots={list(meta.roots)} "
+                        f"Uncompress={size(uncompressed)}")
+            if journal is not None:
+                journal.queue(vs.first, vs.volumes, sum(vs.sizes), uncompressed)
+        jobs.append(Job(vs.first, vs.volumes, working_path, single_pass, uncompressed, delete_parts,
+                        journal and str(journal.path), state, archive_options, profile))
+    jobs.sort(key=lambda job: job.uncompressed)
+    return jobs, skipped
+
+
+def run_serial(jobs, planner):
+    """ yield (path_elem, status) of process_set jobs, one after the other """
+    for job in jobs:
+        if not planner.reserve(job.path_elem, job.uncompressed):
+            logger.error(f"Not enough space available {job.path_elem.absolute()}")
+            yield job.path_elem, None
+            continue
+        try:
+            status = process_set(*job)
+        finally:
+            planner.release(job.path_elem)
+        yield job.path_elem, status
+
+
+def _ignore_sigint():
+    # Ctrl-C stops the parent, which lets the running extractions end
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+class ExtractionPool:
+    """ process_set jobs on a process pool, smallest first, at most per_device of them reading volumes from the
+    same device at once, and only when the SpacePlanner finds room for them """
+
+    def __init__(self, workers, planner, per_device=None):
+        self.workers = workers
+        self.planner = planner
+        self.per_device = per_device or workers
+        # (uncompressed size, submit order, job, device), sorted
+        self.pending = []
+        self.seq = count()
+        self.running = {}
+        self.busy = Counter()
+        self.executor = ProcessPoolExecutor(max_workers=workers, initializer=_ignore_sigint)
+
+    def __len__(self):
+        return len(self.pending) + len(self.running)
+
+    def submit(self, job):
+        source = job.rar_parts[0] if job.rar_parts else job.path_elem
+        insort(self.pending, (job.uncompressed, next(self.seq), job, device_of(source)))
+        self._dispatch()
+
+    def _dispatch(self):
+        # jobs for a busy device wait for one of its extractions to end, jobs too big for free space for a release
+        for entry in list(self.pending):
+            if len(self.running) >= self.workers:
+                break
+            _, _, job, device = entry
+            if self.busy[device] >= self.per_device or not self.planner.reserve(job.path_elem, job.uncompressed):
+                continue
+            self.pending.remove(entry)
+            self.busy[device] += 1
+            self.running[self.executor.submit(process_set, *job)] = (job.path_elem, device)
+
+    def results(self, timeout=None):
+        """ (path_elem, status) of the jobs ending within timeout, status None for the jobs
+        that cannot fit in the free space even with nothing else running """
+        self._dispatch()
+        if not self.running:
+            results = []
+            for _, _, job, _ in self.pending:
+                logger.error(f"Not enough space available {job.path_elem.absolute()}")
+                results.append((job.path_elem, None))
+            self.pending.clear()
+            return results
+        done, _ = wait(self.running, timeout=timeout, return_when=FIRST_COMPLETED)
+        results = []
+        for future in done:
+            path_elem, device = self.running.pop(future)
+            self.busy[device] -= 1
+            self.planner.release(path_elem)
+            try:
+                status = future.result()
+            except Exception as e:
+                logger.exception(f"Worker failed {type(e)} {str(e)} {path_elem.absolute()}")
+                status = 'error'
+            results.append((path_elem, status))
+        self._dispatch()
+        return results
+
+    def close(self):
+        self.executor.shutdown()
+
+
+def run_pool(jobs, workers, planner, per_device=None):
+    """ yield (path_elem, status) of process_set jobs run by an ExtractionPool """
+    pool = ExtractionPool(workers, planner, per_device)
+    try:
+        for job in jobs:
+            pool.submit(job)
+        while pool:
+            yield from pool.results()
+    finally:
+        pool.close()
+
+
+def rar_volume_follows(path_obj):
+    """ True when the end of archive header says another volume follows, False on the last volume,
+    None when the file does not end with a RAR end of archive header """
+    with open(path_obj, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(0, f.tell() - 16))
+        tail = f.read()
+    # RAR 5: CRC32, header size 3, type 5, header flags 0, end of archive flags (0x01 not last volume)
+    if tail[-4:-1] == b'\x03\x05\x00':
+        return bool(tail[-1] & 0x01)
+    # RAR 1.5-4: CRC16, type 0x7b, flags (0x0001 next volume), size including the optional CRC32/volume number
+    for start in range(len(tail) - 7, -1, -1):
+        if tail[start + 2] == 0x7b and start + int.from_bytes(tail[start + 5:start + 7], 'little') == len(tail):
+            return bool(tail[start + 3] & 0x01)
+    return None
+
+
+class SetTracker:
+    """ archive sets of a directory, ready once complete and none of their volumes changed for settle seconds """
+
+    def __init__(self, settle=10.0, formats=FORMATS):
+        self.settle = settle
+        self.formats = formats
+        # path -> (size, mtime_ns, monotonic time of the last change)
+        self.files = {}
+        self.queued = set()
+        self.lock = threading.Lock()
+
+    def touch(self, path):
+        """ record a created, modified, moved or deleted file, a change makes its set ready again """
+        key = volume_key(path.name, self.formats)
+        if key is None:
+            return
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            with self.lock:
+                self.files.pop(path, None)
+            return
+        with self.lock:
+            known = self.files.get(path)
+            if known is None or known[:2] != (st.st_size, st.st_mtime_ns):
+                self.files[path] = (st.st_size, st.st_mtime_ns, time.monotonic())
+                self.queued.discard((path.parent, key[0]))
+
+    def scan(self, path):
+        """ touch every file of the directory, the polling fallback of the filesystem events """
+        with os.scandir(path) as it:
+            seen = {Path(entry.path) for entry in it if entry.is_file()}
+        for p in seen | (set(self.files) - seen):
+            self.touch(p)
+
+    @staticmethod
+    def _complete(vs):
+        """ complete by names and sizes, and the last volume does not announce another one """
+        try:
+            return vs.complete and rar_volume_follows(vs.volumes[-1]) is not True
+        except OSError:
+            return False
+
+    def ready(self):
+        """ VolumeSets complete and stable, each returned once until one of its files changes """
+        now = time.monotonic()
+        with self.lock:
+            groups = {}
+            for path, (size, _, changed) in self.files.items():
+                groups.setdefault((path.parent, volume_key(path.name, self.formats)[0]), []).append(
+                    (path, size, changed))
+            candidates = [(path, size) for key, files in groups.items()
+                          if key not in self.queued and all(now - changed >= self.settle for _, _, changed in files)
+                          for path, size, _ in files]
+        ready = []
+        for vs in index_sets(candidates, self.formats):
+            if self._complete(vs):
+                with self.lock:
+                    self.queued.add((vs.first.parent, volume_key(vs.first.name, self.formats)[0]))
+                ready.append(vs)
+        return ready
+
+
+class _TouchHandler:
+    """ watchdog event handler feeding a SetTracker """
+
+    def __init__(self, tracker):
+        self.tracker = tracker
+
+    def dispatch(self, event):
+        if event.is_directory:
+            return
+        for path in (event.src_path, getattr(event, 'dest_path', '')):
+            if path:
+                self.tracker.touch(Path(os.fsdecode(path)))
+
+
+def watch(crt_dir, wrk_dir="_peon/", workers=1, per_device=None, settle=10.0, poll=2.0, single_pass=False,
+          delete_parts=False, journal=None, cache=None, archive_options=None, profile=None, formats=FORMATS):
+    """ extract archive sets as soon as they are complete and stable, until interrupted """
+    crt_dir = Path(crt_dir)
+    working_path = crt_dir.joinpath(wrk_dir)
+    dic = {"success": [], "error": []}
+    working_path.mkdir(parents=True, exist_ok=True)
+    clean_stale_staging(working_path)
+    tracker = SetTracker(settle, formats)
+    tracker.scan(crt_dir)
+    observer = None
+    if Observer is not None:
+        observer = Observer()
+        observer.schedule(_TouchHandler(tracker), str(crt_dir), recursive=False)
+        observer.start()
+        logger.info(f"Watching {crt_dir.absolute()} for complete archive sets")
+    else:
+        logger.info(f"watchdog not installed, polling {crt_dir.absolute()} every {poll}s")
+    pool = ExtractionPool(max(1, workers), SpacePlanner(working_path), per_device)
+    run = PhaseRecorder('watch', enabled=profile is not None)
+    if profile is not None:
+        start_trace(profile)
+    try:
+        with profiled(profile, 'watch'):
+            while True:
+                if observer is None:
+                    with run.phase('scan'):
+                        tracker.scan(crt_dir)
+                with run.phase('plan'):
+                    jobs, skipped = plan_jobs(tracker.ready(), working_path, single_pass, delete_parts, journal,
+                                              cache, archive_options, profile)
+                for path_elem, status in skipped:
+                    if status is not None:
+                        dic[status].append(path_elem)
+                for job in jobs:
+                    logger.info(f"Complete set {job.path_elem.name} "
+                                f"({len(job.rar_parts)} volumes, {size(job.uncompressed)})")
+                    pool.submit(job)
+                if not pool:
+                    with run.phase('sleep'):
+                        time.sleep(poll)
+                    continue
+                with run.phase('wait'):
+                    results = pool.results(timeout=poll)
+                for path_elem, status in results:
+                    if status is not None:
+                        dic[status].append(path_elem)
+    except KeyboardInterrupt:
+        logger.info("Interrupted, waiting for the running extractions")
+    finally:
+        if observer is not None:
+            observer.stop()
+            observer.join()
+        pool.close()
+        if profile is not None:
+            log_profile(profile, run)
+    return dic
+
+
+def log_profile(profile, run):
+    for line in format_summary(write_summary(profile, run)):
+        logger.info(line)
+    logger.info(f"Profile written to {Path(profile.directory).absolute()}")
+
+
+def main(crt_dir, wrk_dir="_peon/", workers=1, per_device=None, single_pass=False, delete_parts=False,
+         journal=None, cache=None, archive_options=None, profile=None, formats=FORMATS):
     working_path = Path(crt_dir).joinpath(wrk_dir)
     dic = {"success": [], "error": []}
+    working_path.mkdir(parents=True, exist_ok=True)
+    clean_stale_staging(working_path)
+    run = PhaseRecorder('main', enabled=profile is not None)
+    if profile is not None:
+        start_trace(profile)
+
+    with profiled(profile, 'main'):
+        complete = []
+        with run.phase('scan'):
+            volume_sets = scan_sets(crt_dir, formats)
+        for vs in volume_sets:
+            if vs.complete:
+                complete.append(vs)
+            else:
+                # never opened by unrar
+                logger.error(f"Incomplete set {vs.name}: {vs.problems()}")
+                dic['error'].append(vs.first)
+        with run.phase('plan'):
+            jobs, skipped = plan_jobs(complete, working_path, single_pass, delete_parts, journal, cache,
+                                      archive_options, profile)
+        for path_elem, status in skipped:
+            if status is not None:
+                dic[status].append(path_elem)
+        logger.info(f"{[job.path_elem for job in jobs]}")
+        planner = SpacePlanner(working_path)
+        with run.phase('run', sum(job.uncompressed for job in jobs)):
+            if workers > 1:
+                results = run_pool(jobs, workers, planner, per_device)
+            else:
+                results = run_serial(jobs, planner)
+            for path_elem, status in results:
+                if status is not None:
+                    dic[status].append(path_elem)
+    if profile is not None:
+        log_profile(profile, run)
+    return dic
+
 
-    path_list = get_rar_list_from_dir(crt_dir, "*.rar")
-    path_files = filterMultiPart(path_list)
-    logger.info(f"{path_files}")
-    for path_elem in path_files:
-        rarf = get_RarFile(path_elem)
-        if rarf is not None:
-            ok = checkRAR(rarf, path_elem)
-            if ok is not None:
-                dic['error'].append(path_elem)
+def inventory(crt_dir, cache=None, threads=8, archive_options=None, formats=FORMATS):
+    """ summary of every archive set of a tree, the headers of a set read only when the cache misses it """
+    rows, misses = [], []
+    for dirpath, dirnames, _ in os.walk(crt_dir):
+        dirnames.sort()
+        for vs in scan_sets(dirpath, formats):
+            row = {'set': str(vs.first), 'volumes': len(vs.volumes), 'volume_bytes': sum(vs.sizes),
+                   'problems': vs.problems() or None, 'meta': None}
+            rows.append(row)
+            # unrar never opens incomplete sets
+            if not vs.complete:
                 continue
-            time.sleep(5)
-            logger.info(f"rootfolder?={get_rootfolder(rarf)} Uncompress={size(get_Archive_Uncompress_Size(rarf))}")
-            if is_enough_space_available(rarf, working_path):
-                extract_rar(rarf, working_path)
-                dic['success'].append(path_elem)
-                rar_parts = getAllParts(path_list, path_elem)
-                logger.info(f"Files to move: {rar_parts}")
-                time.sleep(5)
-                mv_list(rar_parts, working_path)
+            stamp = set_stamp(vs)
+            meta = cache.get(vs.first, *stamp) if cache is not None else None
+            if meta is None:
+                misses.append((row, vs, stamp))
             else:
-                logger.error(f"Not enough space available {path_elem.absolute()}")
-        else:
-            logger.error(f"RAR file {path_elem.absolute()}")
-        time.sleep(10)
-    return dic
+                row['meta'] = meta.to_dict()
+    # header parsing happens in the unrar library, outside the GIL
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for (row, vs, stamp), meta in zip(misses, pool.map(lambda miss: read_meta(miss[1].first, archive_options), misses)):
+            if meta is None:
+                row['problems'] = "unreadable headers"
+                continue
+            if cache is not None:
+                cache.put(vs.first, *stamp, meta)
+            row['meta'] = meta.to_dict()
+    metas = [row['meta'] for row in rows if row['meta'] is not None]
+    return {
+        'sets': rows,
+        'totals': {'sets': len(rows), 'readable': len(metas), 'entries': sum(m['entries'] for m in metas),
+                   'compressed': sum(m['compressed'] for m in metas),
+                   'uncompressed': sum(m['uncompressed'] for m in metas),
+                   'single_root': sum(m['single_root'] for m in metas)},
+        'headers_read': len(misses),
+    }
+
+
+def print_inventory(report):
+    for row in report['sets']:
+        meta = row['meta']
+        if meta is None:
+            print(f"{'-':>9} {'-':>7}  {row['problems']:<24} {row['set']}")
+            continue
+        roots = meta['roots'][0] if meta['single_root'] else f"{len(meta['roots'])} roots, {meta['loose']} loose"
+        print(f"{size(meta['uncompressed']):>9} {meta['entries']:>7}  {roots[:24]:<24} {row['set']}")
+    totals = report['totals']
+    print(f"{totals['sets']} sets, {totals['readable']} readable, {totals['entries']} entries, "
+          f"{size(totals['compressed'])} -> {size(totals['uncompressed'])}, {totals['single_root']} single root, "
+          f"headers read for {report['headers_read']}")
 
 
 if __name__ == "__main__":
@@ -170,15 +867,82 @@ if __name__ == "__main__":
         #'%(log_color)[%(asctime)s] [%(levelname)s]  [%(funcName)s_(l%(lineno)-3s\t%(message)s'
         ))
 
-    logger = colorlog.getLogger('__name__')
-    logger.setLevel(logging.INFO)
-    logger.addHandler(handler)
+    for name in (__name__, 'archive_backends'):
+        logging.getLogger(name).setLevel(logging.INFO)
+        logging.getLogger(name).addHandler(handler)
 
     parser = argparse.ArgumentParser()
     parser.add_argument('-i',"--input", type=Path, action="store", nargs='?', help="input path",  default=".")
-    parser.add_argument('--json', action='store_true')
+    parser.add_argument('--json', action='store_true', help="print the journal as JSON instead of the result dict")
+    parser.add_argument("--journal", type=Path, help="state journal, <input>/_peon/.unrar_batch.sqlite by default")
+    parser.add_argument("--retry-errors", action='store_true',
+                        help="retry the sets in error in the journal, skipped until their volumes change otherwise")
+    parser.add_argument("--backend", action='append', default=[], metavar='FORMAT=NAME[,NAME]',
+                        help="archive backends tried for a format, e.g. --backend zip=libarchive,zip")
+    parser.add_argument("--formats", default=",".join(FORMATS), metavar='FORMAT[,FORMAT]',
+                        help="archive formats picked up among rar, zip, 7z and tar, RAR volume sets only by default")
+    parser.add_argument("--buffer-size", type=int, default=BUFFER_SIZE, help="read size of streaming backends")
+    parser.add_argument("--meta-cache", type=Path,
+                        help="archive header cache, <input>/_peon/.unrar_meta.sqlite by default")
+    parser.add_argument("--inventory", action='store_true',
+                        help="only print the size, entries and root folders of every set of the tree")
+    parser.add_argument("--profile", type=Path, nargs='?', const=True, metavar='DIR',
+                        help="time, cpu and bytes of every phase of every set, to <input>/_peon/profile by default")
+    parser.add_argument("--profiler", choices=PROFILERS,
+                        help="also run cProfile or the stack sampler, in the parent and in each pool worker")
+    parser.add_argument('-w', "--workers", type=int, default=1, help="archive sets processed in parallel")
+    parser.add_argument("--per-device", type=int, default=0,
+                        help="max concurrent extractions per source device (where the volumes are), 0 for no cap")
+    parser.add_argument("--single-pass", action='store_true',
+                        help="verify CRCs while extracting to a staging directory instead of testing first")
+    parser.add_argument("--delete-parts", action='store_true',
+                        help="delete the volumes of an extracted set instead of moving them to the working directory")
+    parser.add_argument("--watch", action='store_true',
+                        help="keep running, extract each set once complete (inotify via watchdog, else polling)")
+    parser.add_argument("--settle", type=float, default=10.0, help="seconds a set must stay unchanged with --watch")
+    parser.add_argument("--poll", type=float, default=2.0, help="polling interval with --watch, in seconds")
     args = parser.parse_args()
 
 
-    dic = main(args.input)
-    pprint(dic)
+    backends = {fmt: names.split(',') for fmt, names in (kv.split('=', 1) for kv in args.backend)}
+    unknown = sorted({fmt for fmt in backends if fmt not in FORMAT_BACKENDS}
+                     | {name for names in backends.values() for name in names if name not in BACKENDS})
+    if unknown:
+        parser.error(f"unknown archive format or backend: {', '.join(unknown)}")
+    archive_options = {'backends': backends, 'buffer_size': args.buffer_size}
+    formats = tuple(fmt.strip() for fmt in args.formats.split(',') if fmt.strip())
+    if not formats or not set(formats) <= set(FORMAT_BACKENDS):
+        parser.error(f"--formats: comma separated among {', '.join(FORMAT_BACKENDS)}")
+    profile = None
+    if args.profile or args.profiler:
+        directory = args.input.joinpath("_peon/", "profile") if args.profile in (None, True) else args.profile
+        profile = ProfileOptions(str(directory.absolute()), args.profiler, os.getpid())
+    cache = MetaCache(args.meta_cache or args.input.joinpath("_peon/", ".unrar_meta.sqlite"))
+    if args.inventory:
+        try:
+            report = inventory(args.input, cache, archive_options=archive_options, formats=formats)
+        finally:
+            cache.close()
+        if args.json:
+            print(json.dumps(report, indent=2))
+        else:
+            print_inventory(report)
+        sys.exit(0)
+
+    journal = Journal(args.journal or args.input.joinpath("_peon/", ".unrar_batch.sqlite"), args.retry_errors)
+    try:
+        if args.watch:
+            dic = watch(args.input, workers=args.workers, per_device=args.per_device, settle=args.settle,
+                        poll=args.poll, single_pass=args.single_pass, delete_parts=args.delete_parts, journal=journal,
+                        cache=cache, archive_options=archive_options, profile=profile, formats=formats)
+        else:
+            dic = main(args.input, workers=args.workers, per_device=args.per_device, single_pass=args.single_pass,
+                       delete_parts=args.delete_parts, journal=journal, cache=cache,
+                       archive_options=archive_options, profile=profile, formats=formats)
+        if args.json:
+            print(json.dumps(journal.report(), indent=2, default=str))
+        else:
+            pprint(dic)
+    finally:
+        journal.close()
+        cache.close()